@@ -0,0 +1,5 @@
+"""
+Benchmarks for loading, filtering and listing servers from large KeePass databases.
+
+Run with ``python -m benchmarks``, see ``python -m benchmarks --help``.
+"""
@@ -0,0 +1,65 @@
+"""Command line entry point of the benchmarks."""
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+from .generate import KDF_PROFILES, ensure_database, leaf_group
+from .suite import compare, environment, format_table, run_database, write_results
+
+DEFAULT_SIZES = (100, 1000, 10000)
+
+def parse_arguments(argv=None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Time loading, filtering and listing servers from generated KeePass databases'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='Numbers of entries of the generated databases (default 100 1000 10000)')
+    parser.add_argument('--kdf', nargs='+', choices=sorted(KDF_PROFILES), default=['fast'],
+                        help='Key derivation settings of the generated databases (default fast)')
+    parser.add_argument('--depth', type=int, default=2, help='Levels of groups below the Servers group')
+    parser.add_argument('--history', type=int, default=1, help='History items per entry')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark')
+    parser.add_argument('--cache-dir', default=os.path.join(tempfile.gettempdir(), 'keepass-ssh-bench'),
+                        help='Directory keeping generated databases between runs')
+    parser.add_argument('-o', '--output', default='benchmark-results.json',
+                        help="JSON file to write results to, '-' for stdout")
+    parser.add_argument('--compare', metavar='FILE', help='Previous results to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Slowdown factor of the median reported as regression (default 1.2)')
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    """Run the benchmarks and return the exit status."""
+    args = parse_arguments(argv)
+    group = leaf_group(args.depth)
+
+    results = []
+    for kdf in args.kdf:
+        for size in args.sizes:
+            print(f"Benchmarking {size} entries, {kdf} KDF", file=sys.stderr)
+            db_path, key_path = ensure_database(args.cache_dir, size, kdf, args.depth, args.history)
+            for name, timing in run_database(db_path, key_path, group, args.repeat).items():
+                results.append({'name': name, 'entries': size, 'kdf': kdf, **timing})
+
+    data = {
+        'environment': environment(),
+        'parameters': {'depth': args.depth, 'history': args.history, 'repeat': args.repeat, 'group': group},
+        'results': results,
+    }
+    write_results(args.output, data)
+    print(format_table(results), file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), data, args.threshold)
+        for line in regressions:
+            print(f"Regression: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
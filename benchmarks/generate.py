@@ -0,0 +1,107 @@
+"""Synthetic KeePass database generation."""
+import os
+import random
+from typing import Dict, List, Tuple
+
+ARGON2ID_UUID = bytes.fromhex('9e298b1956db4773b23dfc3ec6f0a1e6')
+
+# Argon2 parameters per profile, 'default' keeps the pykeepass template values
+KDF_PROFILES: Dict[str, Dict[str, object]] = {
+    'fast': {'I': 1, 'M': 1 << 20, 'P': 1},
+    'default': {},
+    'strong': {'I': 20, 'M': 128 << 20, 'P': 2},
+    'argon2id': {'$UUID': ARGON2ID_UUID, 'I': 2, 'M': 64 << 20, 'P': 2},
+}
+
+ROLES = ('web', 'db', 'cache', 'proxy', 'mail', 'build', 'vpn', 'backup', 'monitor', 'kafka', 'redis', 'postgres')
+ENVIRONMENTS = ('production', 'staging', 'dev', 'qa')
+USERS = ('root', 'admin', 'deploy', 'ubuntu', 'ops')
+
+def database_name(entries: int, kdf: str, depth: int, history: int, seed: int) -> str:
+    """Get the file name of a generated database."""
+    return f'bench-{entries}-{kdf}-d{depth}-h{history}-s{seed}.kdbx'
+
+def group_paths(depth: int, fanout: int = 4) -> List[List[str]]:
+    """List the leaf group paths of a tree below a Servers group."""
+    paths = [['Servers']]
+    for level in range(depth):
+        names = ENVIRONMENTS if level == 0 else [f'{ROLES[i % len(ROLES)]}-{level}' for i in range(fanout)]
+        paths = [path + [name] for path in paths for name in names]
+    return paths
+
+def generate_database(
+    path: str,
+    entries: int,
+    kdf: str = 'fast',
+    depth: int = 2,
+    history: int = 1,
+    seed: int = 0
+) -> Tuple[str, str]:
+    """
+    Create a database with entries spread over nested groups.
+
+    Every entry gets history items, a password, notes and tags. The key file
+    is written next to the database, both paths are returned.
+    """
+    from pykeepass import create_database
+    from pykeepass.entry import Entry
+
+    rng = random.Random(seed)
+    key_path = os.path.splitext(path)[0] + '.keyx'
+    with open(key_path, 'wb') as f:
+        f.write(rng.randbytes(32) if hasattr(rng, 'randbytes') else os.urandom(32))
+
+    kp = create_database(path, keyfile=key_path)
+    parameters = kp.kdbx.header.value.dynamic_header.kdf_parameters.data.dict
+    for name, value in KDF_PROFILES[kdf].items():
+        parameters[name].value = value
+
+    leaves = []
+    for names in group_paths(depth):
+        group = kp.root_group
+        for name in names:
+            group = next((sub for sub in group.subgroups if sub.name == name), None) or kp.add_group(group, name)
+        leaves.append((group, names[1] if len(names) > 1 else ENVIRONMENTS[0]))
+
+    for i in range(entries):
+        group, environment = leaves[i % len(leaves)]
+        role = rng.choice(ROLES)
+        port = rng.choice((22, 22, 22, 2222))
+        host = f'{role}{i}.{environment}.example.com'
+        # Built directly, add_entry scans the group for duplicates on every call
+        entry = Entry(
+            title=f'{role}-{environment}-{i:06d}',
+            username=rng.choice(USERS),
+            password=f'old-{rng.getrandbits(64):016x}',
+            url=host if port == 22 else f'{host}:{port}',
+            notes=f'{environment} {role} server in rack {i % 300}',
+            tags=[environment, role],
+            kp=kp
+        )
+        group.append(entry)
+        for revision in range(history):
+            entry.save_history()
+            entry.password = f'{revision}-{rng.getrandbits(64):016x}'
+
+    kp.save()
+    return path, key_path
+
+def ensure_database(
+    directory: str,
+    entries: int,
+    kdf: str = 'fast',
+    depth: int = 2,
+    history: int = 1,
+    seed: int = 0
+) -> Tuple[str, str]:
+    """Get a generated database from the directory, creating it if missing."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, database_name(entries, kdf, depth, history, seed))
+    key_path = os.path.splitext(path)[0] + '.keyx'
+    if os.path.exists(path) and os.path.exists(key_path):
+        return path, key_path
+    return generate_database(path, entries, kdf, depth, history, seed)
+
+def leaf_group(depth: int) -> str:
+    """Get the path of the first leaf group."""
+    return '/'.join(group_paths(depth)[0])
@@ -0,0 +1,134 @@
+"""Benchmark cases and result handling."""
+import io
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+from keepass_ssh.cli import KeePassSSHCLI
+from keepass_ssh.database import KeePassDatabase, stream_records
+from keepass_ssh.index import MetadataIndex
+from keepass_ssh.server import ServerManager
+
+RESULTS_VERSION = 1
+
+def measure(function: Callable[[], object], repeat: int = 3, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """Time a function, setup runs untimed before every call."""
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return {'best': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+def read_fields(servers: List) -> None:
+    """Read the fields shown when listing servers."""
+    for server in servers:
+        server.title, server.username, server.hostname, server.port
+
+def run_database(db_path: str, key_path: str, group: str, repeat: int = 3) -> Dict[str, Dict]:
+    """Run every benchmark against one database, keyed by benchmark name."""
+    results = {'open': measure(lambda: KeePassDatabase(db_path, key_path), repeat)}
+
+    db = KeePassDatabase(db_path, key_path)
+
+    def reset_groups():
+        db._group_entries = None
+        db._group_records = {}
+
+    # The group index is built by the first lookup after a load, so every run starts cold
+    for mode, group_path in (('all', None), ('root', 'root'), ('group', group)):
+        results[f'get_entries[{mode}]'] = measure(lambda: db.get_entries(group_path), repeat, reset_groups)
+    results['get_records[group]'] = measure(lambda: db.get_records(group), repeat, reset_groups)
+    results['stream_records[group]'] = measure(lambda: stream_records(db_path, key_path, group), repeat)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        MetadataIndex(db_path, cache_dir).save(db.get_records(), db.get_group_paths())
+        results['index_entries[group]'] = measure(
+            lambda: MetadataIndex(db_path, cache_dir).get_entries(group), repeat
+        )
+
+    # Fields are read as listing does, entries are resolved lazily otherwise
+    entries = db.get_entries()
+    results['from_keepass_entry'] = measure(
+        lambda: read_fields([ServerManager.from_keepass_entry(entry) for entry in entries]), repeat
+    )
+    results['from_keepass_entries'] = measure(
+        lambda: read_fields(ServerManager.from_keepass_entries(entries)), repeat
+    )
+
+    servers = ServerManager.from_keepass_entries(entries)
+    title = servers[len(servers) // 2].title if servers else ''
+    for name, query in (('exact', title), ('terms', 'web production'), ('typo', 'prodution'), ('miss', 'qwerty')):
+        results[f'filter_servers[{name}]'] = measure(lambda: KeePassSSHCLI()._filter_servers(servers, query), repeat)
+
+    def render():
+        with contextlib.redirect_stdout(io.StringIO()):
+            ServerManager.list_servers(servers)
+    results['list_servers'] = measure(render, repeat)
+    return results
+
+def environment() -> Dict:
+    """Describe the code version and machine the results were measured on."""
+    try:
+        from importlib.metadata import version
+        package_version = version('keepass-ssh-connect')
+    except Exception:
+        package_version = None
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'results_version': RESULTS_VERSION,
+        'version': package_version,
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+def compare(previous: Dict, current: Dict, threshold: float = 1.2) -> List[str]:
+    """Describe benchmarks whose median got slower than threshold times the previous one."""
+    before = {(r['name'], r['entries'], r['kdf']): r['median'] for r in previous['results']}
+    regressions = []
+    for result in current['results']:
+        old = before.get((result['name'], result['entries'], result['kdf']))
+        if old and result['median'] > old * threshold:
+            regressions.append(
+                f"{result['name']} ({result['entries']} entries, {result['kdf']}): "
+                f"{old * 1000:.2f} ms -> {result['median'] * 1000:.2f} ms"
+            )
+    return regressions
+
+def format_table(results: List[Dict]) -> str:
+    """Format results as a plain text table of median times."""
+    lines = [f"{'benchmark':<28} {'entries':>8} {'kdf':>9} {'median ms':>11} {'best ms':>10}"]
+    for result in results:
+        lines.append(
+            f"{result['name']:<28} {result['entries']:>8} {result['kdf']:>9} "
+            f"{result['median'] * 1000:>11.2f} {result['best'] * 1000:>10.2f}"
+        )
+    return '\n'.join(lines)
+
+def write_results(path: str, data: Dict) -> None:
+    """Write results as JSON, '-' writes to stdout."""
+    text = json.dumps(data, indent=2)
+    if path == '-':
+        sys.stdout.write(text + '\n')
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text + '\n')
@@ -0,0 +1,295 @@
+"""Unlock agent module."""
+import os
+import json
+import time
+import socket
+import struct
+import select
+import logging
+import tempfile
+import socketserver
+from typing import List, Optional, Tuple
+
+from .database import KeePassDatabase, DatabaseChanges, EntryRecord, DatabaseError, GroupNotFoundError
+from .index import MetadataIndex
+from .search import Matches, SearchIndex
+from .watch import FileWatcher, DEFAULT_DEBOUNCE
+
+DEFAULT_IDLE_TTL = 900
+
+def default_socket_path() -> str:
+    """Return the agent socket path for the current user."""
+    path = os.environ.get('KEEPASS_AGENT_SOCKET')
+    if path:
+        return path
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'keepass-ssh', 'agent.sock')
+    user_dir = f'keepass-ssh-{os.getuid()}' if hasattr(os, 'getuid') else 'keepass-ssh'
+    return os.path.join(tempfile.gettempdir(), user_dir, 'agent.sock')
+
+class _AgentServer(socketserver.UnixStreamServer):
+    """Unix socket server accepting requests from the current user only."""
+
+    agent = None
+
+    def verify_request(self, request, client_address) -> bool:
+        """Reject peers running as a different user."""
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return True
+        creds = request.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', creds)
+        return uid == os.getuid()
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    """Handle a single JSON request line."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            response = {'ok': False, 'error': 'Malformed request'}
+        else:
+            response = self.server.agent.handle_request(request)
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+class KeePassAgent:
+    """Keep an opened database resident and serve its entries over a Unix socket."""
+
+    def __init__(
+        self,
+        database: KeePassDatabase,
+        socket_path: Optional[str] = None,
+        idle_ttl: float = DEFAULT_IDLE_TTL,
+        watch: bool = True,
+        debounce: float = DEFAULT_DEBOUNCE
+    ):
+        """Initialize agent for an opened database."""
+        self.database = database
+        self.socket_path = socket_path or default_socket_path()
+        self.idle_ttl = idle_ttl
+        self.watch = watch
+        self.debounce = debounce
+        self.search_index = None
+        self.last_activity = time.monotonic()
+        self._stopping = False
+
+    def _serves(self, db_path: Optional[str]) -> bool:
+        """Check whether the request targets the loaded database."""
+        return bool(db_path) and os.path.realpath(db_path) == os.path.realpath(self.database.db_path)
+
+    def handle_request(self, request: dict) -> dict:
+        """Answer a decoded client request."""
+        self.last_activity = time.monotonic()
+        op = request.get('op')
+
+        if op == 'ping':
+            return {'ok': True, 'database': os.path.realpath(self.database.db_path)}
+
+        if op == 'entries':
+            if not self._serves(request.get('database')):
+                return {'ok': False, 'error': 'Database not loaded by agent'}
+            try:
+                records = self.database.get_records(request.get('group'))
+            except GroupNotFoundError as e:
+                return {'ok': False, 'error': str(e), 'group_not_found': True}
+            # Passwords are only sent for the selected entry, through the entry op
+            return {'ok': True, 'entries': [record._replace(password=None)._asdict() for record in records]}
+
+        if op == 'entry':
+            if not self._serves(request.get('database')):
+                return {'ok': False, 'error': 'Database not loaded by agent'}
+            try:
+                record = EntryRecord.from_entry(self.database.find_entry(request.get('uuid')))
+            except (DatabaseError, ValueError) as e:
+                return {'ok': False, 'error': str(e)}
+            return {'ok': True, 'entry': record._asdict()}
+
+        if op == 'search':
+            if not self._serves(request.get('database')):
+                return {'ok': False, 'error': 'Database not loaded by agent'}
+            search_index = self._get_search_index()
+            query = request.get('query') or ''
+            matches = search_index.match(query)
+            return {
+                'ok': True,
+                'exact': search_index.exact(query),
+                'matches': list(matches.scores.items()),
+                'typos': matches.typos
+            }
+
+        if op == 'stop':
+            self._stopping = True
+            return {'ok': True}
+
+        return {'ok': False, 'error': f"Unknown operation: {op}"}
+
+    def _get_search_index(self) -> SearchIndex:
+        """Get the search index of the loaded database, read or built on first use."""
+        if self.search_index is None:
+            self.search_index = MetadataIndex(self.database.db_path).get_search_index()
+        if self.search_index is None:
+            self.search_index = SearchIndex.from_records(self.database.get_records())
+        return self.search_index
+
+    def reload(self) -> Optional[DatabaseChanges]:
+        """Reload the changed database file, keeping the loaded version when it cannot be opened."""
+        try:
+            changes = self.database.reload()
+        except DatabaseError as e:
+            logging.warning(f"Reload failed, serving the previous version: {e}")
+            return None
+
+        logging.info(
+            f"Reloaded {self.database.db_path}: {len(changes.added)} added, "
+            f"{len(changes.changed)} changed, {len(changes.removed)} removed"
+        )
+        if changes:
+            self._update_index(changes)
+        return changes
+
+    def _update_index(self, changes: DatabaseChanges) -> None:
+        """Patch the search index with changed entries and rewrite the metadata index."""
+        search_index = self.search_index
+        if search_index is not None:
+            search_index.remove(changes.removed + [record.uuid for record in changes.changed])
+            search_index.add_records(changes.added + changes.changed)
+            # Rebuilt once removed entries leave more empty positions than entries
+            if 2 * search_index.removed > len(search_index.keys):
+                search_index = None
+
+        try:
+            self.search_index = MetadataIndex(self.database.db_path).save(
+                self.database.get_records(), self.database.get_group_paths(), search_index,
+                group_uuids=self.database.get_group_uuids()
+            )
+        except OSError as e:
+            logging.warning(f"Could not write metadata index: {e}")
+            self.search_index = None
+
+    def serve_forever(self) -> None:
+        """Serve requests until stopped or idle for longer than the TTL."""
+        socket_dir = os.path.dirname(self.socket_path)
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        old_umask = os.umask(0o177)
+        try:
+            server = _AgentServer(self.socket_path, _AgentHandler)
+        finally:
+            os.umask(old_umask)
+
+        server.agent = self
+        server.timeout = min(1.0, self.idle_ttl)
+        watcher = FileWatcher(self.database.db_path, self.debounce) if self.watch else None
+        if watcher is not None:
+            # Loaded now, the index on disk is stale once the database changed
+            self.search_index = MetadataIndex(self.database.db_path).get_search_index()
+        self.last_activity = time.monotonic()
+        logging.info(f"Agent listening on {self.socket_path}")
+
+        try:
+            while not self._stopping and time.monotonic() - self.last_activity < self.idle_ttl:
+                if watcher is None:
+                    server.handle_request()
+                    continue
+                self._wait(server, watcher)
+                if watcher.changed():
+                    self.reload()
+        finally:
+            if watcher is not None:
+                watcher.close()
+            server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            logging.info("Agent stopped")
+
+    def _wait(self, server: _AgentServer, watcher: FileWatcher) -> None:
+        """Wait for a request or a file event, handling whichever arrives."""
+        timeout = server.timeout
+        settle = watcher.timeout()
+        if settle is not None:
+            timeout = min(timeout, settle)
+        sources = [server] if watcher.fileno() is None else [server, watcher]
+        readable, _, _ = select.select(sources, [], [], timeout)
+        if watcher in readable:
+            watcher.read_events()
+        if server in readable:
+            server.handle_request()
+
+class AgentClient:
+    """Client for a running unlock agent."""
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = 2.0):
+        """Initialize client for the given agent socket."""
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+
+    def request(self, payload: dict) -> Optional[dict]:
+        """Send a request, returning None when no agent answers."""
+        if not hasattr(socket, 'AF_UNIX') or not os.path.exists(self.socket_path):
+            return None
+
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+                with sock.makefile('rb') as stream:
+                    return json.loads(stream.readline())
+        except (OSError, ValueError) as e:
+            logging.info(f"Agent unavailable: {e}")
+            return None
+
+    def get_entries(self, db_path: Optional[str], group_path: Optional[str] = None) -> Optional[List[EntryRecord]]:
+        """Get entry records from the agent, or None to fall back to a direct open."""
+        if not db_path:
+            return None
+
+        response = self.request({
+            'op': 'entries',
+            'database': os.path.abspath(db_path),
+            'group': group_path
+        })
+        if response is None:
+            return None
+        if not response.get('ok'):
+            if response.get('group_not_found'):
+                raise GroupNotFoundError(response['error'])
+            return None
+        return [EntryRecord(**entry) for entry in response['entries']]
+
+    def get_entry(self, db_path: Optional[str], entry_uuid: str) -> Optional[EntryRecord]:
+        """Get a single entry record by UUID, or None when the agent cannot serve it."""
+        if not db_path:
+            return None
+
+        response = self.request({
+            'op': 'entry',
+            'database': os.path.abspath(db_path),
+            'uuid': entry_uuid
+        })
+        if not response or not response.get('ok'):
+            return None
+        return EntryRecord(**response['entry'])
+
+    def search(self, db_path: Optional[str], query: str) -> Optional[Tuple[List[str], Matches]]:
+        """Get UUIDs of entries titled like the query and the matches of all entries, or None when the agent cannot serve it."""
+        if not db_path:
+            return None
+
+        response = self.request({
+            'op': 'search',
+            'database': os.path.abspath(db_path),
+            'query': query
+        })
+        if not response or not response.get('ok'):
+            return None
+        return response['exact'], Matches(dict(response['matches']), response['typos'])
+
+    def stop(self) -> bool:
+        """Ask the agent to shut down."""
+        response = self.request({'op': 'stop'})
+        return bool(response and response.get('ok'))
@@ -0,0 +1,144 @@
+"""Parallel remote command module."""
+import sys
+import time
+import select
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, TextIO
+
+import paramiko
+
+from .server import ServerEntry
+from .pool import SSHConnectionPool
+
+DEFAULT_WORKERS = 32
+DEFAULT_TIMEOUT = 60.0
+READ_SIZE = 32768
+
+class ExecResult(NamedTuple):
+    """Outcome of running a command on one server."""
+    server: ServerEntry
+    exit_code: Optional[int]
+    elapsed: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the command ran and exited with status 0."""
+        return self.error is None and self.exit_code == 0
+
+class OutputPrinter:
+    """Print remote output line by line, prefixed with the server title."""
+
+    def __init__(self, stdout: Optional[TextIO] = None, stderr: Optional[TextIO] = None):
+        """Initialize printer writing to the given streams."""
+        self.stdout = stdout or sys.stdout
+        self.stderr = stderr or sys.stderr
+        self._lock = threading.Lock()
+
+    def __call__(self, server: ServerEntry, line: str, is_stderr: bool = False) -> None:
+        """Print a single line of remote output."""
+        stream = self.stderr if is_stderr else self.stdout
+        with self._lock:
+            stream.write(f"[{server.title}] {line}\n")
+            stream.flush()
+
+class _LineSplitter:
+    """Split a byte stream into decoded lines."""
+
+    def __init__(self, emit: Callable[[str], None]):
+        self.emit = emit
+        self.buffer = b''
+
+    def feed(self, data: bytes) -> None:
+        """Emit every complete line of the data."""
+        *lines, self.buffer = (self.buffer + data).split(b'\n')
+        for line in lines:
+            self.emit(line.rstrip(b'\r').decode('utf-8', errors='replace'))
+
+    def close(self) -> None:
+        """Emit a trailing line without newline."""
+        if self.buffer:
+            self.emit(self.buffer.decode('utf-8', errors='replace'))
+            self.buffer = b''
+
+class BatchExecutor:
+    """Run a command on many servers over paramiko on a bounded worker pool."""
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT,
+        output: Optional[Callable[..., None]] = None,
+        pool: Optional[SSHConnectionPool] = None,
+        resolver=None,
+        finished: Optional[Callable[[ExecResult], None]] = None
+    ):
+        """Initialize executor with a per-host timeout in seconds.
+
+        Connections of a given pool are kept open for later commands,
+        otherwise each connection is closed once its command finished
+        and jump hosts once all commands finished.
+        The finished callback gets every result as soon as it is known.
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.output = output or OutputPrinter()
+        self.finished = finished
+        self._own_pool = pool is None
+        self.pool = pool if pool is not None else SSHConnectionPool(
+            max_connections=0, keepalive=0, timeout=timeout, resolver=resolver
+        )
+
+    def _stream(self, server: ServerEntry, channel, deadline: float) -> int:
+        """Forward channel output until the command exits and return its status."""
+        stdout = _LineSplitter(lambda line: self.output(server, line))
+        stderr = _LineSplitter(lambda line: self.output(server, line, is_stderr=True))
+
+        while True:
+            if channel.recv_ready():
+                stdout.feed(channel.recv(READ_SIZE))
+            elif channel.recv_stderr_ready():
+                stderr.feed(channel.recv_stderr(READ_SIZE))
+            elif channel.exit_status_ready():
+                break
+            elif time.monotonic() >= deadline:
+                raise TimeoutError(f"Command timed out after {self.timeout:g}s")
+            else:
+                select.select([channel], [], [], min(0.5, max(deadline - time.monotonic(), 0)))
+
+        stdout.close()
+        stderr.close()
+        return channel.recv_exit_status()
+
+    def run_on(self, server: ServerEntry, command: str) -> ExecResult:
+        """Run the command on a single server."""
+        start = time.monotonic()
+        try:
+            with self.pool.session(server) as channel:
+                channel.exec_command(command)
+                exit_code = self._stream(server, channel, start + self.timeout)
+            result = ExecResult(server, exit_code, time.monotonic() - start)
+        except (paramiko.SSHException, EOFError, OSError) as e:
+            result = ExecResult(server, None, time.monotonic() - start, str(e) or e.__class__.__name__)
+        if self.finished is not None:
+            self.finished(result)
+        return result
+
+    def run(self, servers: List[ServerEntry], command: str) -> List[ExecResult]:
+        """Run the command on every server, results are in server order."""
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(servers)))) as pool:
+                return list(pool.map(lambda server: self.run_on(server, command), servers))
+        finally:
+            if self._own_pool:
+                self.pool.close()
+
+def format_summary(results: List[ExecResult]) -> str:
+    """Summarize results with the servers that failed."""
+    failed = [result for result in results if not result.ok]
+    lines = [f"{len(results) - len(failed)} succeeded, {len(failed)} failed"]
+    for result in failed:
+        reason = result.error or f"exit code {result.exit_code}"
+        lines.append(f"  {result.server.title} ({result.server.hostname}): {reason}")
+    return '\n'.join(lines)
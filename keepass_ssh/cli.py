@@ -1,15 +1,24 @@
 import os
 import sys
 import glob
+import time
 import logging
 import argparse
+import contextlib
 
-from dotenv import load_dotenv
-from colorama import init as init_colorama
 
-from .database import KeePassDatabase, DatabaseError, GroupNotFoundError
+from . import timing
+from .database import KeePassDatabase, DatabaseError, GroupNotFoundError, stream_records
 from .server import ServerManager
-from .ssh import SSHConnector, SSHConnectionError
+from .ssh import SSHConnector, SSHConnectionError, managed_known_hosts
+from .multiplex import ControlMasters, DEFAULT_PERSIST
+from .agent import KeePassAgent, AgentClient, DEFAULT_IDLE_TTL
+from .index import MetadataIndex, refresh_index, write_private_file
+from .multidb import DatabaseSource, load_databases, fetch_passwords
+from .search import Matches, SearchIndex, rank, scan
+from .history import History
+from .output import FORMATS, RecordWriter, ExecRecorder, server_record, transfer_record, scan_record
+from .keycache import KeyCache, BACKENDS as KEY_CACHE_BACKENDS, DEFAULT_TTL as DEFAULT_KEY_CACHE_TTL
 
 # Constants
 DEFAULT_GROUP_PATH = 'root'
@@ -30,6 +39,17 @@ def __init__(self, verbose=False):
             verbose (bool, optional): Enable verbose logging. Defaults to False.
         """
         self.verbose = verbose
+        self.key_cache = None
+        self.stream = False
+        self.metadata_index = None
+        self.agent_database = None
+        self.typo_matches = False
+        self.probe = None
+        self.masters = None
+        self.databases = None
+        self.history = None
+        self.resolver = None
+        self.output = None
         self._setup_logging()
         
     def _setup_logging(self):
@@ -45,16 +65,38 @@ def find_keepass_files():
         """
         Find KeePass database and key files in the current directory.
         
+        Every database is paired with the key file of the same name, or
+        with the only key file not named after another database.
+        
         Returns:
-            tuple: (database_path, key_path)
+            list: (database_path, key_path) tuples
         """
-        database_files = glob.glob('*.kdbx')
-        key_files = glob.glob('*.keyx')
+        database_files = sorted(glob.glob('*.kdbx'))
+        key_files = sorted(glob.glob('*.keyx'))
         
-        database_path = database_files[0] if database_files else None
-        key_path = key_files[0] if key_files else None
+        named_keys = {os.path.splitext(path)[0] + '.keyx' for path in database_files}
+        other_keys = [path for path in key_files if path not in named_keys]
         
-        return database_path, key_path
+        pairs = []
+        for database_path in database_files:
+            key_path = os.path.splitext(database_path)[0] + '.keyx'
+            if key_path not in key_files:
+                key_path = other_keys[0] if len(other_keys) == 1 else None
+            pairs.append((database_path, key_path))
+        return pairs
+    
+    @staticmethod
+    def _split_paths(value):
+        """
+        Split a list of paths from an environment variable.
+        
+        Args:
+            value (str): Paths separated by os.pathsep
+        
+        Returns:
+            list: Non-empty paths
+        """
+        return [path for path in (value or '').split(os.pathsep) if path]
     
     @staticmethod
     def validate_file_path(path):
@@ -88,17 +130,26 @@ def parse_arguments(self):
         default_db = os.environ.get('KEEPASS_DB_PATH')
         default_key = os.environ.get('KEEPASS_KEY_PATH')
         default_group = os.environ.get('KEEPASS_GROUP_PATH')
+        default_agent_ttl = os.environ.get('KEEPASS_AGENT_TTL')
+        default_key_cache = os.environ.get('KEEPASS_KEY_CACHE')
+        default_key_cache_ttl = os.environ.get('KEEPASS_KEY_CACHE_TTL')
+        default_multiplex = os.environ.get('KEEPASS_SSH_MULTIPLEX', '').lower() in ('1', 'true', 'yes')
+        default_persist = os.environ.get('KEEPASS_SSH_CONTROL_PERSIST')
+        default_timings_file = os.environ.get('KEEPASS_SSH_TIMINGS_FILE')
+        default_dns_cache = os.environ.get('KEEPASS_SSH_DNS_CACHE', '').lower() in ('1', 'true', 'yes')
+        default_dns_ttl = os.environ.get('KEEPASS_SSH_DNS_TTL')
+        default_format = os.environ.get('KEEPASS_SSH_FORMAT')
         
         parser.add_argument(
             '-d', '--database', 
-            help='Path to the KeePass database file',
-            default=default_db
+            action='append',
+            help='Path to the KeePass database file, repeat to merge servers of several databases'
         )
         
         parser.add_argument(
             '-k', '--key-file', 
-            help='Path to the KeePass key file (optional)',
-            default=default_key
+            action='append',
+            help='Path to the KeePass key file (optional), one per database or one for all'
         )
         
         parser.add_argument(
@@ -109,7 +160,10 @@ def parse_arguments(self):
         
         parser.add_argument(
             '-s', '--server', 
-            help='Specific server name or partial match to connect to'
+            nargs='?',
+            const='',
+            help='Specific server name or partial match to connect to, '
+                 'without a value the server connected to most often and recently'
         )
         
         parser.add_argument(
@@ -118,26 +172,254 @@ def parse_arguments(self):
             help='List available servers without connecting'
         )
         
+        parser.add_argument(
+            '--format', 
+            choices=FORMATS,
+            help='Output format of --list, --exec, --put, --get and --scan-keys, '
+                 'other than text written as one record per server'
+        )
+        
         parser.add_argument(
             '-v', '--verbose', 
             action='store_true', 
             help='Enable verbose output'
         )
         
+        parser.add_argument(
+            '--no-history', 
+            action='store_true', 
+            help='Neither record connections nor rank servers by past connections'
+        )
+        
+        parser.add_argument(
+            '--timings', 
+            action='store_true', 
+            help='Print the time spent in each phase, e.g. key derivation, parsing and connecting'
+        )
+        
+        parser.add_argument(
+            '--timings-file', 
+            metavar='FILE',
+            help='Append the time spent in each phase to FILE as a JSON line',
+            default=default_timings_file
+        )
+        
+        parser.add_argument(
+            '--agent', 
+            action='store_true', 
+            help='Run an unlock agent keeping the database open for later calls'
+        )
+        
+        parser.add_argument(
+            '--agent-ttl', 
+            type=float,
+            help='Seconds the agent stays alive without requests',
+            default=float(default_agent_ttl) if default_agent_ttl else DEFAULT_IDLE_TTL
+        )
+        
+        parser.add_argument(
+            '--no-watch', 
+            action='store_true', 
+            help='Do not reload the agent database when its file changes'
+        )
+        
+        parser.add_argument(
+            '--stop-agent', 
+            action='store_true', 
+            help='Stop a running unlock agent'
+        )
+        
+        parser.add_argument(
+            '--stream', 
+            action='store_true', 
+            help='Extract only the selected group without loading the whole database'
+        )
+        
+        parser.add_argument(
+            '--exec', 
+            dest='command',
+            metavar='COMMAND',
+            help='Run a command on every matching server instead of connecting'
+        )
+        
+        parser.add_argument(
+            '--exec-workers', 
+            type=int,
+            help='Maximum number of servers running the command at once (default 32)'
+        )
+        
+        parser.add_argument(
+            '--exec-timeout', 
+            type=float,
+            help='Seconds allowed per server for --exec (default 60)'
+        )
+        
+        parser.add_argument(
+            '--scan-keys', 
+            action='store_true', 
+            help='Fetch the host keys of every matching server into a hashed known_hosts file'
+        )
+        
+        parser.add_argument(
+            '--scan-workers', 
+            type=int,
+            help='Maximum number of servers scanned at once (default 64)'
+        )
+        
+        parser.add_argument(
+            '--put', 
+            nargs=2,
+            metavar=('SRC', 'DST'),
+            help='Upload a local file to every matching server'
+        )
+        
+        parser.add_argument(
+            '--get', 
+            nargs=2,
+            metavar=('SRC', 'DST'),
+            help='Download a remote file from every matching server, into DST/<title>/ for several servers'
+        )
+        
+        parser.add_argument(
+            '--transfer-workers', 
+            type=int,
+            help='Maximum number of servers transferring at once (default 32)'
+        )
+        
+        parser.add_argument(
+            '--transfer-timeout', 
+            type=float,
+            help='Seconds a transfer may stall before it fails (default 60)'
+        )
+        
+        parser.add_argument(
+            '--multiplex', 
+            action='store_true', 
+            help='Reuse a persistent master connection per server',
+            default=default_multiplex
+        )
+        
+        parser.add_argument(
+            '--control-persist', 
+            type=int,
+            help='Seconds an idle master connection stays open',
+            default=int(default_persist) if default_persist else DEFAULT_PERSIST
+        )
+        
+        parser.add_argument(
+            '--masters', 
+            nargs='?',
+            const='list',
+            choices=('list', 'close'),
+            help='List open master connections, or close them (matching --server if given)'
+        )
+        
+        parser.add_argument(
+            '--export-ssh-config', 
+            nargs='?',
+            const='',
+            metavar='FILE',
+            help='Write a Host block per matching server without password to FILE '
+                 '(default ~/.ssh/keepass-ssh.conf) for ~/.ssh/config to Include'
+        )
+        
+        parser.add_argument(
+            '--warm', 
+            action='store_true', 
+            help='Open master connections to the matching servers in the background'
+        )
+        
+        parser.add_argument(
+            '--probe', 
+            action='store_true', 
+            help='Check which servers are reachable and show their latency'
+        )
+        
+        parser.add_argument(
+            '--probe-timeout', 
+            type=float,
+            help='Seconds to wait for each probed server (default 2)'
+        )
+        
+        parser.add_argument(
+            '--probe-concurrency', 
+            type=int,
+            help='Maximum number of servers probed at the same time (default 500)'
+        )
+        
+        parser.add_argument(
+            '--dns-cache', 
+            action='store_true', 
+            help='Resolve the hostnames of listed servers concurrently and cache the addresses on disk',
+            default=default_dns_cache
+        )
+        
+        parser.add_argument(
+            '--dns-ttl', 
+            type=float,
+            help='Seconds resolved addresses are cached for (default 300)',
+            default=float(default_dns_ttl) if default_dns_ttl else None
+        )
+        
+        parser.add_argument(
+            '--sort-latency', 
+            action='store_true', 
+            help='Sort probed servers by latency, unreachable servers last'
+        )
+        
+        parser.add_argument(
+            '--key-cache', 
+            choices=('off',) + KEY_CACHE_BACKENDS,
+            help='Cache the transformed database key to skip the KDF on later calls',
+            default=default_key_cache or 'off'
+        )
+        
+        parser.add_argument(
+            '--key-cache-ttl', 
+            type=float,
+            help='Seconds a cached database key stays valid',
+            default=float(default_key_cache_ttl) if default_key_cache_ttl else DEFAULT_KEY_CACHE_TTL
+        )
+        
         # Parse arguments first
         args = parser.parse_args()
+        databases = args.database or self._split_paths(default_db)
+        key_files = args.key_file or self._split_paths(default_key)
+        
+        # The environment default only applies to modes with records, an explicit flag has to
+        formatted = args.list or args.command or args.put or args.get or args.scan_keys
+        if args.format is None:
+            args.format = default_format if formatted and default_format else 'text'
+        elif args.format != 'text' and not formatted:
+            parser.error('--format needs --list, --exec, --put, --get or --scan-keys')
         
         # Only auto-discover if no env vars, no arguments, and no server specified
-        if not any([args.database, default_db]):
-            found_db, found_key = self.find_keepass_files()
-            
-            if found_db:
-                print(f"Using local database file: {found_db}")
-                args.database = found_db
-                
+        if not databases:
+            # Records own standard output in machine-readable formats
+            notices = sys.stdout if args.format == 'text' else sys.stderr
+            found = self.find_keepass_files()
+            for found_db, found_key in found:
+                print(f"Using local database file: {found_db}", file=notices)
                 if found_key:
-                    print(f"Using local key file: {found_key}")
-                    args.key_file = found_key
+                    print(f"Using local key file: {found_key}", file=notices)
+            
+            databases = [found_db for found_db, _ in found]
+            if any(found_key for _, found_key in found):
+                key_files = [found_key for _, found_key in found]
+        
+        if len(key_files) == 1:
+            key_files = key_files * len(databases)
+        elif key_files and len(key_files) != len(databases):
+            parser.error('give one key file for all databases or one per database')
+        
+        args.databases = [
+            DatabaseSource(database, key_files[i] if key_files else None)
+            for i, database in enumerate(databases)
+        ]
+        
+        # The first database is used by single database operations
+        args.database = databases[0] if databases else None
+        args.key_file = args.databases[0].key_path if databases else None
         
         return args
     
@@ -185,7 +467,8 @@ def _select_server(self, servers):
         ServerManager.list_servers(servers)
         
         try:
-            selection = input("\nSelect server (enter number): ")
+            with timing.span('prompt'):
+                selection = input("\nSelect server (enter number): ")
             selected_server = servers[int(selection) - 1]
             
             if self.verbose:
@@ -199,11 +482,285 @@ def _select_server(self, servers):
             print("Invalid selection. Exiting.")
             sys.exit(1)
     
+    def _open_database(self, db_path=None, key_path=None):
+        """
+        Open the KeePass database, using the key cache when enabled.
+        
+        Args:
+            db_path (str, optional): Path to the KeePass database
+            key_path (str, optional): Path to the key file
+        
+        Returns:
+            KeePassDatabase: Opened database
+        """
+        return KeePassDatabase(db_path, key_path, key_cache=self.key_cache)
+    
+    def _init_environment(self):
+        """
+        Initialize terminal colors and load the .env file.
+        
+        Imported here so --help and agent calls skip dotenv and colorama,
+        machine-readable output skips colorama as well.
+        """
+        with timing.span('environment'):
+            from dotenv import load_dotenv
+            
+            if self.output is None:
+                from colorama import init as init_colorama
+                init_colorama()
+            load_dotenv()
+    
+    def _stream_entries(self, db_path=None, group_path=None, key_path=None):
+        """
+        Extract group entries with the streaming loader.
+        
+        Args:
+            db_path (str, optional): Path to the KeePass database
+            group_path (str, optional): Path to the server group
+            key_path (str, optional): Path to the key file
+        
+        Returns:
+            list: List of entry records
+        """
+        with timing.span('stream'):
+            records, stats = stream_records(db_path, key_path, group_path, key_cache=self.key_cache)
+        
+        if self.verbose:
+            peak = f"{stats.peak_memory / 2**20:.1f} MiB" if stats.peak_memory else "unknown"
+            logging.info(f"Streamed {stats.entries} entries in {stats.elapsed:.3f}s, peak memory {peak}")
+        
+        return records
+    
+    def _load_servers(self, db_path=None, group_path=None, key_path=None, use_index=True):
+        """
+        Load server entries from the metadata index, the unlock agent or the database.
+        
+        Entries read from the index or the agent carry no password and
+        have needs_password set, it is fetched with _fetch_password once
+        a server is selected.
+        
+        Args:
+            db_path (str, optional): Path to the KeePass database
+            group_path (str, optional): Path to the server group
+            key_path (str, optional): Path to the key file
+            use_index (bool, optional): Read the metadata index first. Defaults to True.
+        
+        Returns:
+            list: List of server entries
+        """
+        group_path = group_path or DEFAULT_GROUP_PATH
+        keepass_entries = None
+        
+        self.metadata_index = None
+        self.agent_database = None
+        without_passwords = True
+        if self.databases:
+            return self._load_merged_servers(group_path, use_index)
+        
+        if use_index and db_path and os.path.exists(db_path):
+            index = MetadataIndex(db_path)
+            with timing.span('index'):
+                keepass_entries = index.get_entries(group_path)
+            if keepass_entries is not None:
+                self.metadata_index = index
+                if self.verbose:
+                    logging.info("Entries served by metadata index")
+        
+        if keepass_entries is None:
+            with timing.span('agent'):
+                keepass_entries = AgentClient().get_entries(db_path, group_path)
+            if keepass_entries is not None:
+                self.agent_database = db_path
+                if self.verbose:
+                    logging.info("Entries served by unlock agent")
+        
+        if keepass_entries is None:
+            without_passwords = False
+        
+        if keepass_entries is None and self.stream:
+            keepass_entries = self._stream_entries(db_path, group_path, key_path)
+        
+        if keepass_entries is None:
+            # No agent serving this database, open it directly
+            with timing.span('database'):
+                db = self._open_database(db_path, key_path)
+                refresh_index(db, db_path)
+                keepass_entries = db.get_entries(group_path)
+        
+        servers = ServerManager.from_keepass_entries(keepass_entries)
+        for server in servers:
+            server.needs_password = without_passwords
+        return servers
+    
+    def _load_merged_servers(self, group_path, use_index=True):
+        """
+        Load and merge the server entries of several databases.
+        
+        Databases not served by their metadata index or the unlock agent
+        are opened in parallel worker processes. Every server is tagged
+        with the path of its database.
+        
+        Args:
+            group_path (str): Path to the server group in every database
+            use_index (bool, optional): Read the metadata indexes first. Defaults to True.
+        
+        Returns:
+            list: Server entries in the order of the databases
+        
+        Raises:
+            DatabaseError: If no database could be loaded
+        """
+        entries = {}
+        failures = []
+        for source in self.databases:
+            try:
+                if use_index and os.path.exists(source.path):
+                    with timing.span('index'):
+                        entries[source] = MetadataIndex(source.path).get_entries(group_path)
+                if entries.get(source) is None:
+                    with timing.span('agent'):
+                        entries[source] = AgentClient().get_entries(source.path, group_path)
+            except GroupNotFoundError as e:
+                # Reported like a database that failed to load, the others still count
+                entries[source] = []
+                failures.append((source, str(e)))
+        
+        pending = [source for source in self.databases if entries[source] is None]
+        # Databases opened here carry their passwords, the index and agent do not
+        loaded_sources = set(pending)
+        for result in load_databases(pending, group_path, self.key_cache, self.stream):
+            entries[result.source] = result.records
+            if result.error:
+                failures.append((result.source, result.error))
+            elif self.verbose:
+                logging.info(f"Loaded {result.source.path} in {result.elapsed:.3f}s")
+        
+        errors = []
+        for source, error in failures:
+            errors.append(f"{source.path}: {error}")
+            logging.error(f"Database error: {source.path}: {error}")
+            print(f"Error: {source.path}: {error}", file=sys.stderr)
+        
+        if len(errors) == len(self.databases):
+            raise DatabaseError('; '.join(errors))
+        
+        servers = []
+        for source in self.databases:
+            loaded = ServerManager.from_keepass_entries(entries[source])
+            for server in loaded:
+                server.database = source.path
+                server.needs_password = source not in loaded_sources
+            servers.extend(loaded)
+        return servers
+    
+    def _fetch_password(self, server, db_path=None, key_path=None):
+        """
+        Fetch the password of a server loaded from the metadata index.
+        
+        Args:
+            server (ServerEntry): Selected server
+            db_path (str, optional): Path to the KeePass database
+            key_path (str, optional): Path to the key file
+        """
+        self._fetch_passwords([server], db_path, key_path)
+    
+    def _fetch_passwords(self, servers, db_path=None, key_path=None):
+        """
+        Fetch the passwords of servers loaded from the metadata index.
+        
+        The agent is asked first, the database is opened at most once.
+        
+        Args:
+            servers (list): Servers without password
+            db_path (str, optional): Path to the KeePass database
+            key_path (str, optional): Path to the key file
+        """
+        if self.databases:
+            return self._fetch_merged_passwords(servers)
+        
+        client = AgentClient()
+        db = None
+        with timing.span('passwords'):
+            for server in servers:
+                record = client.get_entry(db_path, server.uuid) if db is None else None
+                if record is None:
+                    if db is None:
+                        db = self._open_database(db_path, key_path)
+                    record = db.find_entry(server.uuid)
+                server.password = record.password
+                server.needs_password = False
+    
+    def _fetch_merged_passwords(self, servers):
+        """
+        Fetch the passwords of servers from their databases.
+        
+        The agent is asked first, the remaining databases are opened in
+        parallel worker processes.
+        
+        Args:
+            servers (list): Servers without password, tagged with their database
+        """
+        sources = {source.path: source for source in self.databases}
+        client = AgentClient()
+        pending = {}
+        with timing.span('passwords'):
+            for server in servers:
+                record = client.get_entry(server.database, server.uuid) if server.database not in pending else None
+                if record is None:
+                    pending.setdefault(server.database, []).append(server)
+                else:
+                    server.password = record.password
+                    server.needs_password = False
+            
+            requests = [(sources[path], [server.uuid for server in waiting]) for path, waiting in pending.items()]
+            for waiting, passwords in zip(pending.values(), fetch_passwords(requests, self.key_cache)):
+                for server in waiting:
+                    server.password = passwords[server.uuid]
+                    server.needs_password = False
+    
+    def _load_targets(self, db_path=None, group_path=None, key_path=None, server_filter=None, passwords=True):
+        """
+        Load the servers matching a filter together with their passwords.
+        
+        Args:
+            db_path (str, optional): Path to the KeePass database
+            group_path (str, optional): Path to the server group
+            key_path (str, optional): Path to the key file
+            server_filter (str, optional): Filter servers by title
+            passwords (bool, optional): Whether passwords missing from the index are read
+        
+        Returns:
+            list: Matching servers
+        
+        Raises:
+            SystemExit: If no server matches or the database cannot be read
+        """
+        try:
+            servers = self._filter_servers(self._load_servers(db_path, group_path, key_path), server_filter)
+            if not servers:
+                print("No server entries found")
+                sys.exit(1)
+            
+            # Resolve every host at once instead of one per connection
+            if self.resolver is not None:
+                self.resolver.prefetch(server.hostname for server in servers if not server.jump)
+            
+            missing = [server for server in servers if server.needs_password]
+            if missing and passwords:
+                self._fetch_passwords(missing, db_path, key_path)
+            return servers
+        
+        except (DatabaseError, GroupNotFoundError) as e:
+            logging.error(f"Database error: {e}")
+            print(f"Error: {e}")
+            sys.exit(1)
+    
     def list_servers(
         self,
         db_path=None, 
         group_path=None, 
-        key_path=None
+        key_path=None,
+        server_filter=None
     ):
         """
         List available servers from KeePass database.
@@ -212,65 +769,198 @@ def list_servers(
             db_path (str, optional): Path to the KeePass database
             group_path (str, optional): Path to the server group
             key_path (str, optional): Path to the key file
+            server_filter (str, optional): Only list servers matching this
         
         Returns:
             list: List of available servers
         """
-        init_colorama()
-        load_dotenv()
+        self._init_environment()
         
         try:
-            # Initialize database connection
-            db = KeePassDatabase(db_path, key_path)
-            
             # Get server entries
-            keepass_entries = db.get_entries(group_path or 'root')
-            servers = [ServerManager.from_keepass_entry(entry) for entry in keepass_entries]
+            servers = self._load_servers(db_path, group_path, key_path)
+            if server_filter:
+                servers = self._filter_servers(servers, server_filter)
             
             if not servers:
                 print("No server entries found")
                 return []
             
             # Use ServerManager to list servers
-            ServerManager.list_servers(servers)
-            
-            return servers
+            return self._show_servers(servers)
         
         except (DatabaseError, GroupNotFoundError) as e:
             logging.error(f"Database error: {e}")
             print(f"Error: {e}")
             sys.exit(1)
 
+    def _search_servers(self, servers, server_filter):
+        """
+        Match servers against a filter, with a prebuilt search index when there is one.
+        
+        The index saved with the metadata index, or the one held by the
+        unlock agent, is used when the servers came from it. Otherwise the
+        servers are scanned, which is quicker than building an index for a
+        single query, but matches filter terms as typed only.
+        
+        Args:
+            servers (list): List of servers to search
+            server_filter (str): Filter to match
+        
+        Returns:
+            tuple: Positions of servers titled like the filter, and matches keyed by position
+        """
+        search_index = self.metadata_index.get_search_index() if self.metadata_index else None
+        if search_index is not None:
+            result = search_index.exact(server_filter), search_index.match(server_filter)
+        elif self.agent_database:
+            result = AgentClient().search(self.agent_database, server_filter)
+        else:
+            result = None
+        
+        if result is None:
+            title = server_filter.lower()
+            exact = [i for i, server in enumerate(servers) if (server.title or '').lower() == title]
+            return exact, scan(map(SearchIndex.server_row, servers), server_filter)
+        
+        # The prebuilt indexes are keyed by UUID and also cover other groups
+        positions = {server.uuid: i for i, server in enumerate(servers)}
+        exact, matches = result
+        scores = {positions[key]: score for key, score in matches.scores.items() if key in positions}
+        return [positions[key] for key in exact if key in positions], Matches(scores, matches.typos)
+    
     def _filter_servers(self, servers, server_filter=None):
         """
         Filter servers based on a given filter.
         
+        Servers with a title equal to the filter are returned alone,
+        otherwise servers matching every filter term in their title,
+        hostname, username, tags or notes are ranked best first. Equally
+        ranked servers are ordered by frecency. An empty filter selects
+        the server with the highest frecency. Filters only matched with
+        typos set typo_matches.
+        
         Args:
             servers (list): List of servers to filter
-            server_filter (str, optional): Filter to apply to server titles
+            server_filter (str, optional): Filter to apply to servers
         
         Returns:
             list: Filtered list of servers
         """
-        if server_filter:
-            # First, try exact match
-            exact_matches = [
-                server for server in servers 
-                if server_filter.lower() == server.title.lower()
-            ]
+        self.typo_matches = False
+        if server_filter == '' and self.history is not None:
+            server = self.history.most_likely(servers)
+            return [server] if server else servers
+        if not server_filter:
+            return servers
+        
+        with timing.span('filter'):
+            exact, matches = self._search_servers(servers, server_filter)
             
-            # If exact match found, use it
-            if exact_matches:
-                return exact_matches
+            # First, try exact match
+            if exact:
+                exact = [servers[i] for i in exact]
+                return self.history.rank(exact) if self.history is not None else exact
             
-            # If no exact match, try partial match
-            return [
-                server for server in servers 
-                if server_filter.lower() in server.title.lower()
-            ]
+            self.typo_matches = matches.typos
+            if self.history is None:
+                positions = rank(matches.scores)
+            else:
+                positions = rank(matches.scores, tiebreak=lambda i: self.history.score(servers[i]))
+            return [servers[i] for i in positions]
+    
+    def _show_servers(self, servers):
+        """
+        Print servers, probing them first when requested.
         
+        Args:
+            servers (list): List of servers to show
+        
+        Returns:
+            list: Servers in the order they were shown
+        """
+        servers, probes = self._order_servers(servers)
+        self._render_servers(servers, probes)
         return servers
-
+    
+    def _order_servers(self, servers):
+        """
+        Rank servers and probe them when requested.
+        
+        Args:
+            servers (list): List of servers to show
+        
+        Returns:
+            tuple: Servers in the order to show them and their probe results, or None
+        """
+        if self.history is not None:
+            servers = self.history.rank(servers)
+        
+        # Resolve while the list is read, the chosen server is then known already
+        if self.resolver is not None:
+            self.resolver.prefetch(server.hostname for server in servers if not server.jump)
+        
+        if self.probe is None:
+            return servers, None
+        
+        # Imported here, asyncio adds noticeably to the startup time
+        from .probe import probe_servers, sort_by_latency
+        
+        options = {name: value for name, value in self.probe.items() if name != 'sort' and value is not None}
+        if self.resolver is not None:
+            options['resolver'] = self.resolver
+        with timing.span('probe'):
+            probes = probe_servers(servers, **options)
+        if self.probe['sort']:
+            servers, probes = sort_by_latency(servers, probes)
+        return servers, probes
+    
+    def _render_servers(self, servers, probes=None, selecting=False):
+        """
+        Print servers as text or write them as records.
+        
+        Lists longer than the terminal are shown a page at a time. The
+        answer to a page prompt other than Enter stops paging, as do EOF
+        and Ctrl-C, which also end a selection with EOFError.
+        
+        Args:
+            servers (list): List of servers to show
+            probes (list, optional): Probe result of every server
+            selecting (bool, optional): Whether a server number may be typed at a page prompt
+        
+        Returns:
+            str: Answer given at a page prompt, None when the list was shown entirely
+        """
+        if self.output is not None:
+            with timing.span('render'):
+                for i, server in enumerate(servers):
+                    self.output.write(server_record(server, probes[i] if probes else None))
+            return None
+        
+        size = ServerManager.terminal_size() if sys.stdin.isatty() else None
+        page_size = max(size.lines - 2, 1) if size else len(servers)
+        if len(servers) <= page_size:
+            ServerManager.list_servers(servers, probes)
+            return None
+        
+        hint = "Enter for more, a number to select" if selecting else "Enter for more, q to stop"
+        for start in range(0, len(servers), page_size):
+            end = start + page_size
+            ServerManager.list_servers(servers[start:end], probes[start:end] if probes else None, start + 1)
+            if end >= len(servers):
+                break
+            try:
+                with timing.span('prompt'):
+                    answer = input(f"-- {end} of {len(servers)}, {hint} -- ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                if selecting:
+                    raise EOFError("No server selected")
+                return None
+            if answer:
+                return answer
+        return None
+    
     def _list_and_select_server(self, servers, server_filter=None):
         """
         Select a server from the list.
@@ -282,16 +972,19 @@ def _list_and_select_server(self, servers, server_filter=None):
         Returns:
             object: Selected server or None
         """
-        # Always list servers
-        ServerManager.list_servers(servers)
-        
-        # If server_filter is provided and only one server matches, return it
-        if server_filter and len(servers) == 1:
+        # If server_filter is provided and only one server matches, return it unlisted,
+        # unless it was only matched with typos
+        if server_filter is not None and len(servers) == 1 and not self.typo_matches:
             return servers[0]
         
+        servers, probes = self._order_servers(servers)
+        
         # Prompt for server selection
         try:
-            selection = input("\nSelect server (enter number): ")
+            selection = self._render_servers(servers, probes, selecting=True)
+            if selection is None:
+                with timing.span('prompt'):
+                    selection = input("\nSelect server (enter number): ")
             return ServerManager.select_server(servers, selection)
         except Exception:
             print("Invalid selection")
@@ -313,16 +1006,11 @@ def connect_to_server(
             key_path (str, optional): Path to the key file
             server_filter (str, optional): Filter servers by title
         """
-        init_colorama()
-        load_dotenv()
+        self._init_environment()
         
         try:
-            # Initialize database connection
-            db = KeePassDatabase(db_path, key_path)
-            
-            # Get server entries
-            keepass_entries = db.get_entries(group_path or 'root')
-            servers = [ServerManager.from_keepass_entry(entry) for entry in keepass_entries]
+            # Get server entries, streaming reads passwords in the same pass
+            servers = self._load_servers(db_path, group_path, key_path, use_index=not self.stream)
             
             if not servers:
                 print("No server entries found")
@@ -342,14 +1030,315 @@ def connect_to_server(
                 print("Invalid selection")
                 sys.exit(1)
             
+            # Servers listed from the metadata index or the agent need their password
+            if server.needs_password:
+                self._fetch_password(server, db_path, key_path)
+            
             # Connect to server
-            SSHConnector.connect(server)
+            started = time.monotonic()
+            options = {}
+            # Hosts behind a jump host are resolved by the jump host
+            if self.resolver is not None and not server.jump:
+                with timing.span('dns'):
+                    options['address'] = self.resolver.address(server.hostname)
+            if os.path.exists(managed_known_hosts()):
+                options['known_hosts'] = managed_known_hosts()
+            if self.masters is not None:
+                SSHConnector.connect(server, self.masters, **options)
+            else:
+                SSHConnector.connect(server, **options)
+            self._record_connection(server, time.monotonic() - started)
         
         except (DatabaseError, GroupNotFoundError, SSHConnectionError) as e:
             logging.error(f"Connection error: {e}")
             print(f"Error: {e}")
             sys.exit(1)
 
+    def _record_connection(self, server, duration):
+        """
+        Add a finished session to the connection history.
+        
+        Args:
+            server (ServerEntry): Server connected to
+            duration (float): Seconds the session lasted
+        """
+        if self.history is None or not server.uuid:
+            return
+        try:
+            self.history.record(server.uuid, duration)
+        except OSError as e:
+            logging.warning(f"Could not record connection history: {e}")
+
+    def run_command(
+        self,
+        command,
+        db_path=None,
+        group_path=None,
+        key_path=None,
+        server_filter=None,
+        workers=None,
+        timeout=None
+    ):
+        """
+        Run a command on every matching server in parallel.
+        
+        Args:
+            command (str): Command to run on each server
+            db_path (str, optional): Path to the KeePass database
+            group_path (str, optional): Path to the server group
+            key_path (str, optional): Path to the key file
+            server_filter (str, optional): Filter servers by title
+            workers (int, optional): Maximum number of concurrent connections
+            timeout (float, optional): Seconds allowed per server
+        
+        Returns:
+            list: Results per server
+        """
+        # Imported here, paramiko is only needed for remote commands
+        from .batch import BatchExecutor, format_summary
+        
+        self._init_environment()
+        
+        servers = self._load_targets(db_path, group_path, key_path, server_filter)
+        
+        options = {'workers': workers, 'timeout': timeout}
+        if self.resolver is not None:
+            options['resolver'] = self.resolver
+        if self.output is not None:
+            # Records are written as servers finish, with their output
+            recorder = ExecRecorder(self.output)
+            options.update(output=recorder, finished=recorder.finished)
+        executor = BatchExecutor(**{name: value for name, value in options.items() if value is not None})
+        with timing.span('exec'):
+            results = executor.run(servers, command)
+        print(format_summary(results))
+        return results
+
+    def transfer_files(
+        self,
+        direction,
+        source,
+        destination,
+        db_path=None,
+        group_path=None,
+        key_path=None,
+        server_filter=None,
+        workers=None,
+        timeout=None
+    ):
+        """
+        Upload a file to or download a file from every matching server in parallel.
+        
+        Args:
+            direction (str): Either 'put' or 'get'
+            source (str): Local file to upload or remote file to download
+            destination (str): Remote path to upload to or local path to download to
+            db_path (str, optional): Path to the KeePass database
+            group_path (str, optional): Path to the server group
+            key_path (str, optional): Path to the key file
+            server_filter (str, optional): Filter servers by title
+            workers (int, optional): Maximum number of concurrent transfers
+            timeout (float, optional): Seconds a transfer may stall
+        
+        Returns:
+            list: Results per server
+        """
+        # Imported here, paramiko is only needed for transfers
+        from .transfer import FanoutTransfer, ProgressPrinter, format_summary
+        
+        self._init_environment()
+        
+        if direction == 'put' and not os.path.isfile(source):
+            print(f"Error: File not found at {source}")
+            sys.exit(1)
+        
+        servers = self._load_targets(db_path, group_path, key_path, server_filter)
+        
+        progress = ProgressPrinter()
+        options = {'workers': workers, 'timeout': timeout}
+        if self.resolver is not None:
+            options['resolver'] = self.resolver
+        transfer = FanoutTransfer(progress=progress, **{name: value for name, value in options.items() if value is not None})
+        try:
+            with timing.span(direction):
+                results = getattr(transfer, direction)(servers, source, destination)
+        finally:
+            progress.close()
+        if self.output is not None:
+            for result in results:
+                self.output.write(transfer_record(result))
+        print(format_summary(results))
+        return results
+
+    def scan_keys(self, db_path=None, group_path=None, key_path=None, server_filter=None, workers=None):
+        """
+        Fetch the host keys of every matching server into the managed known_hosts file.
+        
+        Args:
+            db_path (str, optional): Path to the KeePass database
+            group_path (str, optional): Path to the server group
+            key_path (str, optional): Path to the key file
+            server_filter (str, optional): Filter servers by title
+            workers (int, optional): Maximum number of concurrent scans
+        
+        Returns:
+            list: Results per host
+        """
+        # Imported here, paramiko is only needed for key scans
+        from .keyscan import KeyScanner, format_summary
+        
+        self._init_environment()
+        
+        servers = self._load_targets(db_path, group_path, key_path, server_filter, passwords=False)
+        
+        options = {'workers': workers, 'resolver': self.resolver}
+        scanner = KeyScanner(**{name: value for name, value in options.items() if value is not None})
+        with timing.span('scan'):
+            results = scanner.scan(servers)
+        for result in results:
+            if self.output is not None:
+                self.output.write(scan_record(result))
+            elif result.ok:
+                print(f"{result.host}: {result.status} {result.key[0]}")
+        print(format_summary(results))
+        return results
+    
+    def export_ssh_config(
+        self,
+        path=None,
+        db_paths=None,
+        db_path=None,
+        group_path=None,
+        key_path=None,
+        server_filter=None,
+        persist=DEFAULT_PERSIST
+    ):
+        """
+        Write an ssh_config file with a Host block per matching server.
+        
+        Servers with a password are left out, plain ssh could not log in
+        without a prompt. The file is only rewritten when a database or
+        the export options changed.
+        
+        Args:
+            path (str, optional): File to write, defaults to ~/.ssh/keepass-ssh.conf
+            db_paths (list, optional): Paths of every database servers are read from
+            db_path (str, optional): Path to the KeePass database
+            group_path (str, optional): Path to the server group
+            key_path (str, optional): Path to the key file
+            server_filter (str, optional): Filter servers by title
+            persist (int, optional): Seconds an idle master connection stays open
+        
+        Returns:
+            bool: Whether the file was written
+        """
+        from .sshconfig import config_stamp, default_config_path, read_stamp, render_config
+        
+        path = os.path.expanduser(path or default_config_path())
+        db_paths = db_paths or [db_path]
+        if not all(db and os.path.exists(db) for db in db_paths):
+            print("Error: No KeePass database found")
+            sys.exit(1)
+        
+        # Hashing the files is much cheaper than deriving the key
+        with timing.span('stamp'):
+            stamp = config_stamp(db_paths, group_path, server_filter, persist, managed_known_hosts())
+        if read_stamp(path) == stamp:
+            print(f"{path} is up to date")
+            return False
+        
+        self._init_environment()
+        servers = self._load_targets(db_path, group_path, key_path, server_filter)
+        exported = [server for server in servers if not server.password]
+        
+        masters = ControlMasters(persist=persist)
+        text = render_config(exported, stamp, masters.directory, persist, managed_known_hosts())
+        try:
+            write_private_file(path, text.encode('utf-8'))
+        except OSError as e:
+            print(f"Error: Could not write {path}: {e}")
+            sys.exit(1)
+        
+        print(f"Wrote {len(exported)} hosts to {path}")
+        if len(exported) < len(servers):
+            print(f"Skipped {len(servers) - len(exported)} servers with a password")
+        return True
+    
+    def warm_masters(self, db_path=None, group_path=None, key_path=None, server_filter=None):
+        """
+        Open master connections to every matching server.
+        
+        Args:
+            db_path (str, optional): Path to the KeePass database
+            group_path (str, optional): Path to the server group
+            key_path (str, optional): Path to the key file
+            server_filter (str, optional): Filter servers by title
+        
+        Returns:
+            bool: Whether every master was opened
+        """
+        self._init_environment()
+        
+        servers = self._load_targets(db_path, group_path, key_path, server_filter)
+        
+        with timing.span('warm'):
+            errors = self.masters.warm(servers)
+        for title, error in errors.items():
+            print(f"{title}: {error or 'ready'}")
+        return not any(errors.values())
+
+    def manage_masters(self, action='list', server_filter=None):
+        """
+        List or close open master connections.
+        
+        Args:
+            action (str, optional): Either 'list' or 'close'
+            server_filter (str, optional): Only handle masters whose title or host contains this
+        
+        Returns:
+            list: Masters that were alive
+        """
+        masters = [master for master in self.masters.list() if master.alive]
+        if server_filter:
+            needle = server_filter.lower()
+            masters = [
+                master for master in masters
+                if needle in master.title.lower() or needle in master.destination.lower()
+            ]
+        
+        if not masters:
+            print("No master connections open")
+            return masters
+        
+        for master in masters:
+            line = f"{master.title} | {master.destination}:{master.port}"
+            if action == 'close':
+                line += " | closed" if self.masters.close(master) else " | close failed"
+            print(line)
+        return masters
+
+    def run_agent(self, db_path=None, key_path=None, idle_ttl=DEFAULT_IDLE_TTL, watch=True):
+        """
+        Open the database once and serve it to later invocations.
+        
+        Args:
+            db_path (str, optional): Path to the KeePass database
+            key_path (str, optional): Path to the key file
+            idle_ttl (float, optional): Seconds to stay alive without requests
+            watch (bool, optional): Reload the database when its file changes
+        """
+        try:
+            db = self._open_database(db_path, key_path)
+        except DatabaseError as e:
+            logging.error(f"Database error: {e}")
+            print(f"Error: {e}")
+            sys.exit(1)
+        
+        refresh_index(db, db_path)
+        agent = KeePassAgent(db, idle_ttl=idle_ttl, watch=watch)
+        print(f"Agent listening on {agent.socket_path} (idle TTL {idle_ttl:g}s)")
+        agent.serve_forever()
+
     def run(self):
         """
         Main entry point for CLI application.
@@ -358,6 +1347,151 @@ def run(self):
         # Parse arguments
         args = self.parse_arguments()
         
+        # Enable logging when verbose output is requested
+        if args.verbose and not self.verbose:
+            self.verbose = True
+            self._setup_logging()
+        
+        self.stream = args.stream
+        if args.probe or args.sort_latency:
+            self.probe = {
+                'timeout': args.probe_timeout,
+                'concurrency': args.probe_concurrency,
+                'sort': args.sort_latency
+            }
+        if args.key_cache != 'off':
+            self.key_cache = KeyCache(args.key_cache, args.key_cache_ttl)
+        if args.multiplex or args.masters or args.warm:
+            self.masters = ControlMasters(persist=args.control_persist)
+        if args.timings or args.timings_file:
+            timing.enable()
+        if len(args.databases) > 1:
+            self.databases = args.databases
+        if not args.no_history:
+            self.history = History()
+        if args.dns_cache:
+            # Imported here, the resolver starts worker threads
+            from .resolver import Resolver
+            
+            options = {'ttl': args.dns_ttl} if args.dns_ttl is not None else {}
+            self.resolver = Resolver(**options)
+        
+        # Messages go to standard error while records are written to standard output
+        messages = contextlib.nullcontext()
+        if args.format != 'text':
+            sys.stdout.flush()
+            self.output = RecordWriter(args.format)
+            messages = contextlib.redirect_stdout(sys.stderr)
+        
+        try:
+            with messages:
+                self._dispatch(args)
+        finally:
+            if self.output is not None:
+                self.output.close()
+            self._close_resolver()
+            self._report_timings(args)
+    
+    def _close_resolver(self):
+        """Wait for pending lookups and save the resolved addresses."""
+        if self.resolver is None:
+            return
+        try:
+            self.resolver.close()
+        except OSError as e:
+            logging.warning(f"Could not write DNS cache: {e}")
+    
+    @staticmethod
+    def _action(args):
+        """
+        Name the action requested by the arguments.
+        
+        Args:
+            args (argparse.Namespace): Parsed arguments
+        
+        Returns:
+            str: Action name recorded with the timings
+        """
+        if args.masters:
+            return f"masters-{args.masters}"
+        if args.export_ssh_config is not None:
+            return 'export-ssh-config'
+        for name in ('warm', 'stop_agent', 'agent', 'list', 'scan_keys', 'command', 'put', 'get'):
+            if getattr(args, name):
+                return {'stop_agent': 'stop-agent', 'scan_keys': 'scan-keys', 'command': 'exec'}.get(name, name)
+        return 'connect'
+    
+    def _report_timings(self, args):
+        """
+        Print the recorded timings and append them to the timings file.
+        
+        Args:
+            args (argparse.Namespace): Parsed arguments
+        """
+        timings = timing.disable()
+        if timings is None:
+            return
+        
+        if args.timings:
+            timings.write()
+        if args.timings_file:
+            try:
+                timings.append(args.timings_file, self._action(args))
+            except OSError as e:
+                logging.warning(f"Could not write timings: {e}")
+    
+    def _dispatch(self, args):
+        """
+        Run the action requested by the arguments.
+        
+        Args:
+            args (argparse.Namespace): Parsed arguments
+        """
+        # List or close master connections
+        if args.masters:
+            self.manage_masters(args.masters, args.server)
+            sys.exit(0)
+        
+        # Open master connections ahead of time
+        if args.warm:
+            sys.exit(0 if self.warm_masters(
+                db_path=args.database,
+                key_path=args.key_file,
+                group_path=args.group,
+                server_filter=args.server
+            ) else 1)
+        
+        # Write the ssh_config file of the matching servers
+        if args.export_ssh_config is not None:
+            self.export_ssh_config(
+                path=args.export_ssh_config,
+                db_paths=[source.path for source in args.databases],
+                db_path=args.database,
+                key_path=args.key_file,
+                group_path=args.group,
+                server_filter=args.server,
+                persist=args.control_persist
+            )
+            sys.exit(0)
+        
+        # Stop a running agent if requested
+        if args.stop_agent:
+            if AgentClient().stop():
+                print("Agent stopped")
+                sys.exit(0)
+            print("No agent running")
+            sys.exit(1)
+        
+        # Run the unlock agent if requested
+        if args.agent:
+            self.run_agent(
+                db_path=args.database,
+                key_path=args.key_file,
+                idle_ttl=args.agent_ttl,
+                watch=not args.no_watch
+            )
+            sys.exit(0)
+        
         # List servers if requested
         if args.list:
             # Attempt to list servers
@@ -365,13 +1499,55 @@ def run(self):
                 self.list_servers(
                     db_path=args.database, 
                     key_path=args.key_file, 
-                    group_path=args.group
+                    group_path=args.group,
+                    server_filter=args.server
                 )
                 sys.exit(0)
             except Exception as e:
                 print(f"Error: {e}")
                 sys.exit(1)
         
+        # Fetch host keys of all matching servers
+        if args.scan_keys:
+            results = self.scan_keys(
+                db_path=args.database,
+                key_path=args.key_file,
+                group_path=args.group,
+                server_filter=args.server,
+                workers=args.scan_workers
+            )
+            sys.exit(0 if all(result.ok for result in results) else 1)
+        
+        # Run a command on all matching servers
+        if args.command:
+            results = self.run_command(
+                args.command,
+                db_path=args.database,
+                key_path=args.key_file,
+                group_path=args.group,
+                server_filter=args.server,
+                workers=args.exec_workers,
+                timeout=args.exec_timeout
+            )
+            sys.exit(0 if all(result.ok for result in results) else 1)
+        
+        # Copy files to or from all matching servers
+        if args.put or args.get:
+            direction = 'put' if args.put else 'get'
+            source, destination = args.put or args.get
+            results = self.transfer_files(
+                direction,
+                source,
+                destination,
+                db_path=args.database,
+                key_path=args.key_file,
+                group_path=args.group,
+                server_filter=args.server,
+                workers=args.transfer_workers,
+                timeout=args.transfer_timeout
+            )
+            sys.exit(0 if all(result.ok for result in results) else 1)
+        
         # Connect to server
         try:
             self.connect_to_server(
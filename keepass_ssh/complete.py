@@ -0,0 +1,163 @@
+"""Shell completion module.
+
+The completer runs on every completion request, so it reads a plain text
+list of titles and groups written next to the metadata index and imports
+nothing beyond the standard library modules Python starts with. Type
+hints are left unevaluated, so typing is not imported either.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import hashlib
+
+COMPLETION_VERSION = 1
+KINDS = ('servers', 'groups')
+SHELLS = ('bash', 'zsh', 'fish')
+ROOT_GROUP = 'root'
+
+def default_cache_dir() -> str:
+    """Return the per-user cache directory."""
+    path = os.environ.get('KEEPASS_SSH_CACHE_DIR')
+    if path:
+        return path
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'keepass-ssh')
+
+def cache_name(db_path: str) -> str:
+    """Name the cache files of a database after its resolved path."""
+    return hashlib.sha256(os.path.realpath(db_path).encode('utf-8')).hexdigest()[:16]
+
+def completion_path(db_path: str, cache_dir: str | None = None) -> str:
+    """Get the completion list of a database."""
+    return os.path.join(cache_dir or default_cache_dir(), f'complete-{cache_name(db_path)}.txt')
+
+def _line(value: str | None) -> str:
+    """Keep a value on one line of one column."""
+    return (value or '').replace('\t', ' ').replace('\r', ' ').replace('\n', ' ')
+
+def format_completions(records: list, groups: list[str]) -> str:
+    """Format group paths and entry titles, one tab separated group and title per line."""
+    lines = [f'keepass-ssh-complete\t{COMPLETION_VERSION}']
+    lines.extend(f'{_line(group)}\t' for group in sorted(groups))
+    lines.extend(f'{_line(record.group)}\t{_line(record.title)}' for record in records if record.title)
+    return '\n'.join(lines) + '\n'
+
+def read_completions(path: str) -> dict[str, list[str]] | None:
+    """Read titles keyed by group path, None when missing or outdated."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except (OSError, ValueError):
+        return None
+    if not lines or lines[0] != f'keepass-ssh-complete\t{COMPLETION_VERSION}':
+        return None
+
+    titles: dict[str, list[str]] = {}
+    for line in lines[1:]:
+        group, _, title = line.partition('\t')
+        group_titles = titles.setdefault(group, [])
+        if title:
+            group_titles.append(title)
+    return titles
+
+def _is_subsequence(needle: str, text: str) -> bool:
+    """Check whether the characters of needle appear in order in text."""
+    position = 0
+    for char in needle:
+        position = text.find(char, position) + 1
+        if not position:
+            return False
+    return True
+
+def match(candidates: list[str], word: str) -> list[str]:
+    """
+    Match candidates against the word being completed, ignoring case.
+
+    Prefix matches are returned when there are any, as shells replace
+    the word with the common prefix of the candidates. Otherwise
+    candidates containing the word come before those containing its
+    characters in order.
+    """
+    needle = word.lower()
+    prefixed, contained, fuzzy = [], [], []
+    for candidate in dict.fromkeys(candidates):
+        text = candidate.lower()
+        if text.startswith(needle):
+            prefixed.append(candidate)
+        elif needle in text:
+            contained.append(candidate)
+        elif _is_subsequence(needle, text):
+            fuzzy.append(candidate)
+    if prefixed:
+        return sorted(prefixed, key=str.lower)
+    return sorted(contained, key=str.lower) + sorted(fuzzy, key=str.lower)
+
+def _option_values(words: list[str], short: str, long: str) -> list[str]:
+    """Get the values given to an option on the command line being completed."""
+    values = []
+    for i, word in enumerate(words):
+        if word in (short, long) and i + 1 < len(words):
+            values.append(words[i + 1])
+        elif word.startswith(long + '='):
+            values.append(word[len(long) + 1:])
+        elif word.startswith(short) and len(word) > len(short) and not word.startswith('--'):
+            values.append(word[len(short):])
+    return [os.path.expanduser(value) for value in values]
+
+def databases(words: list[str]) -> list[str]:
+    """Get the databases of the command line, as the CLI would pick them."""
+    paths = _option_values(words, '-d', '--database')
+    if paths:
+        return paths
+    paths = [path for path in os.environ.get('KEEPASS_DB_PATH', '').split(os.pathsep) if path]
+    if paths:
+        return paths
+    return sorted(name for name in os.listdir('.') if name.endswith('.kdbx'))
+
+def complete(kind: str, word: str, words: list[str], cache_dir: str | None = None) -> list[str]:
+    """Complete server titles or group paths for the command line words."""
+    titles: dict[str, list[str]] = {}
+    for db_path in databases(words):
+        for group, group_titles in (read_completions(completion_path(db_path, cache_dir)) or {}).items():
+            titles.setdefault(group, []).extend(group_titles)
+
+    if kind == 'groups':
+        return match([group or ROOT_GROUP for group in titles], word)
+
+    groups = _option_values(words, '-g', '--group') or [os.environ.get('KEEPASS_GROUP_PATH') or ROOT_GROUP]
+    group = groups[-1]
+    group = '' if group == ROOT_GROUP else '/'.join(name for name in group.split('/') if name)
+    return match(titles.get(group, []), word)
+
+def script(shell: str) -> str:
+    """Read the completion script of a shell."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'completions', f'keepass-ssh-connect.{shell}')
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Print completions, one per line.
+
+    Called by the shell scripts as ``keepass-ssh-complete KIND WORD
+    [WORDS...]`` with the word being completed and the words of the
+    command line, or as ``keepass-ssh-complete --script SHELL`` to print
+    the script of a shell.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 2 and argv[0] == '--script' and argv[1] in SHELLS:
+        sys.stdout.write(script(argv[1]))
+        return 0
+    if len(argv) < 2 or argv[0] not in KINDS:
+        sys.stderr.write(
+            f"usage: keepass-ssh-complete {{{','.join(KINDS)}}} WORD [WORDS...]\n"
+            f"       keepass-ssh-complete --script {{{','.join(SHELLS)}}}\n"
+        )
+        return 2
+    for candidate in complete(argv[0], argv[1], argv[2:]):
+        sys.stdout.write(candidate + '\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
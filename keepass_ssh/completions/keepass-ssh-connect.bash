@@ -0,0 +1,23 @@
+# bash completion for keepass-ssh-connect
+# Load with: eval "$(keepass-ssh-complete --script bash)"
+
+_keepass_ssh_connect() {
+    local cur=${COMP_WORDS[COMP_CWORD]} prev=${COMP_WORDS[COMP_CWORD-1]} kind
+    case $prev in
+        -s|--server) kind=servers ;;
+        -g|--group) kind=groups ;;
+        *) return 1 ;;
+    esac
+
+    # Drop the quoting of the typed word, candidates are quoted below
+    local word=${cur#[\"\']}
+    word=${word//\\/}
+
+    local IFS=$'\n' candidate
+    COMPREPLY=()
+    for candidate in $(keepass-ssh-complete "$kind" "$word" "${COMP_WORDS[@]:1}" 2>/dev/null); do
+        COMPREPLY+=("$(printf '%q' "$candidate")")
+    done
+}
+
+complete -o default -F _keepass_ssh_connect keepass-ssh-connect
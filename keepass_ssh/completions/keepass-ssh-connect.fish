@@ -0,0 +1,12 @@
+# fish completion for keepass-ssh-connect
+# Load with: keepass-ssh-complete --script fish | source
+
+function __keepass_ssh_connect_complete
+    set -l words (commandline -opc)
+    keepass-ssh-complete $argv[1] (commandline -ct) $words[2..-1] 2>/dev/null
+end
+
+complete -c keepass-ssh-connect -s s -l server -x -a '(__keepass_ssh_connect_complete servers)' -d 'Server'
+complete -c keepass-ssh-connect -s g -l group -x -a '(__keepass_ssh_connect_complete groups)' -d 'Group'
+complete -c keepass-ssh-connect -s d -l database -r -F -d 'KeePass database'
+complete -c keepass-ssh-connect -s k -l key-file -r -F -d 'Key file'
@@ -1,41 +1,482 @@
 """Database management module."""
-from typing import Optional, List, Dict
-from pykeepass import PyKeePass
+import re
+import sys
+import time
+import uuid
+import base64
+import hashlib
+import functools
+from typing import TYPE_CHECKING, Optional, List, Dict, NamedTuple, Tuple
+
+from . import timing
+
+if TYPE_CHECKING:
+    from pykeepass import PyKeePass
+
+ROOT_GROUP = 'root'
+
+def __getattr__(name: str):
+    """Import pykeepass on first use, it loads lxml, argon2 and pycryptodome."""
+    if name == 'PyKeePass':
+        from pykeepass import PyKeePass
+        globals()[name] = PyKeePass
+        return PyKeePass
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _keepass_class():
+    """Get the PyKeePass class through the module, so it is imported lazily."""
+    return sys.modules[__name__].PyKeePass
+
+def _timed_kdf(compute_transformed):
+    """Wrap a transformed key computation in a kdf timing span."""
+    @functools.wraps(compute_transformed)
+    def wrapper(context):
+        with timing.span('kdf'):
+            return compute_transformed(context)
+    return wrapper
+
+def _derive_key(db_path: str, key_path: Optional[str]) -> bytes:
+    """Derive the transformed key from the file header alone, timed as kdf."""
+    from construct import Computed, Struct, Switch, this
+    from pykeepass.kdbx_parsing import kdbx3, kdbx4
+    from pykeepass.kdbx_parsing.kdbx import KDBX
+    
+    header_only = Struct(KDBX.subcons[0], "body" / Switch(this.header.value.major_version, {
+        3: Struct("transformed_key" / Computed(_timed_kdf(kdbx3.compute_transformed))),
+        4: Struct("transformed_key" / Computed(_timed_kdf(kdbx4.compute_transformed))),
+    }))
+    parsed = header_only.parse_file(db_path, password=None, keyfile=key_path, transformed_key=None)
+    return parsed.body.transformed_key
+
+def normalize_group_path(group_path: str) -> str:
+    """Normalize a group path to slash-separated names without the root group."""
+    if group_path == ROOT_GROUP:
+        return ''
+    return '/'.join(name for name in group_path.split('/') if name)
+
+# Custom string field naming the jump hosts of an entry, as ssh -J takes them
+JUMP_FIELD = 'ProxyJump'
+
+class EntryRecord(NamedTuple):
+    """Plain snapshot of the entry fields used for SSH connections."""
+    uuid: str
+    title: Optional[str]
+    username: Optional[str]
+    password: Optional[str]
+    url: Optional[str]
+    notes: Optional[str]
+    group: Optional[str] = None
+    tags: Optional[List[str]] = None
+    jump: Optional[str] = None
+
+    @classmethod
+    def from_entry(cls, entry, group: Optional[str] = None) -> 'EntryRecord':
+        """Create EntryRecord from KeePass entry."""
+        if group is None:
+            group = '/'.join(name for name in entry.group.path if name)
+        return cls(
+            uuid=str(entry.uuid),
+            title=entry.title,
+            username=entry.username,
+            password=entry.password,
+            url=entry.url,
+            notes=entry.notes,
+            group=group,
+            tags=entry.tags,
+            jump=entry.get_custom_property(JUMP_FIELD)
+        )
+
+class DatabaseChanges(NamedTuple):
+    """Entries that differ between two loads of a database."""
+    added: List[EntryRecord]
+    changed: List[EntryRecord]
+    removed: List[str]
+
+    def __bool__(self) -> bool:
+        """Check whether any entry differs."""
+        return bool(self.added or self.changed or self.removed)
+
+def _modified(entry) -> Optional[str]:
+    """Get the raw modification time of an entry, read without parsing a datetime."""
+    return entry._element.findtext('Times/LastModificationTime')
 
 class KeePassDatabase:
     """KeePass database handler."""
     
-    def __init__(self, db_path: str, key_path: Optional[str] = None):
+    def __init__(self, db_path: str, key_path: Optional[str] = None, key_cache=None):
         """Initialize database connection."""
         self.db_path = db_path
         self.key_path = key_path
-        self.db = self._load_database()
+        self.key_cache = key_cache
+        with timing.span('open'):
+            self.db = self._load_database()
+        self._group_entries = None
+        self._group_paths_by_uuid = None
+        self._group_records = {}
+        self._stamps = None
     
-    def _load_database(self) -> PyKeePass:
+    def _load_database(self) -> 'PyKeePass':
         """Load the KeePass database."""
         try:
-            return PyKeePass(self.db_path, keyfile=self.key_path)
+            db = self._load_with_cached_key() if self.key_cache else None
+            if db is not None:
+                return db
+            if timing.active() is not None:
+                # Derived beforehand, pykeepass computes it while parsing the file
+                transformed_key = _derive_key(self.db_path, self.key_path)
+                db = _keepass_class()(self.db_path, keyfile=self.key_path, transformed_key=transformed_key)
+            else:
+                db = _keepass_class()(self.db_path, keyfile=self.key_path)
         except Exception as e:
             raise DatabaseError(f"Error opening KeePass database: {e}")
+        
+        if self.key_cache:
+            self.key_cache.put(self.db_path, self.key_path, db.transformed_key)
+        return db
+    
+    def _load_with_cached_key(self) -> Optional['PyKeePass']:
+        """Load the database with a cached transformed key, skipping the KDF."""
+        transformed_key = self.key_cache.get(self.db_path, self.key_path)
+        if transformed_key is None:
+            return None
+        
+        try:
+            return _keepass_class()(self.db_path, keyfile=self.key_path, transformed_key=transformed_key)
+        except Exception:
+            # Stale key, e.g. the key file changed
+            self.key_cache.invalidate(self.db_path, self.key_path)
+            return None
+    
+    def _build_group_index(self) -> None:
+        """Index all groups by path and UUID together with their direct entries."""
+        self._group_entries = {}
+        self._group_paths_by_uuid = {}
+        
+        # Walk groups depth-first, listing entries before subgroups
+        stack = [('', self.db.root_group)]
+        while stack:
+            path, group = stack.pop()
+            self._group_entries.setdefault(path, []).extend(group.entries)
+            self._group_paths_by_uuid[str(group.uuid)] = path
+            prefix = f"{path}/" if path else ''
+            stack.extend((f"{prefix}{subgroup.name or ''}", subgroup) for subgroup in reversed(group.subgroups))
+    
+    @property
+    def _groups(self) -> Dict[str, list]:
+        """Direct entries of every group keyed by path, built once per load."""
+        if self._group_entries is None:
+            with timing.span('groups'):
+                self._build_group_index()
+        return self._group_entries
+    
+    def _resolve_group(self, group_path: str) -> str:
+        """Resolve a group path or UUID to its indexed path."""
+        path = normalize_group_path(group_path)
+        if path in self._groups:
+            return path
+        
+        try:
+            return self._group_paths_by_uuid[str(uuid.UUID(group_path))]
+        except (ValueError, KeyError):
+            raise GroupNotFoundError(f"Group {group_path} not found")
     
     def get_entries(self, group_path: Optional[str] = None) -> List[Dict]:
-        """Get entries from the database."""
-        entries = []
-        
-        if group_path == "root":
-            # Get only root-level entries
-            entries = [e for e in self.db.entries if e.group == self.db.root_group]
-        elif group_path:
-            # Get entries from specific group
-            group = self.db.find_groups(path=group_path, first=True)
-            if not group:
-                raise GroupNotFoundError(f"Group {group_path} not found")
-            entries = group.entries
+        """Get entries of a group given by path or UUID, or all entries."""
+        if group_path:
+            # Get direct entries of the group, "root" being the root group
+            return list(self._groups[self._resolve_group(group_path)])
+        
+        # Get all entries
+        return [entry for entries in self._groups.values() for entry in entries]
+    
+    def _records(self, path: str) -> List[EntryRecord]:
+        """Records of the direct entries of a group, built once per load."""
+        records = self._group_records.get(path)
+        if records is None:
+            records = self._group_records[path] = [
+                EntryRecord.from_entry(entry, path) for entry in self._groups[path]
+            ]
+        return records
+    
+    def get_records(self, group_path: Optional[str] = None) -> List[EntryRecord]:
+        """Get entries from the database as plain records."""
+        if group_path:
+            return list(self._records(self._resolve_group(group_path)))
+        
+        return [record for path in self._groups for record in self._records(path)]
+    
+    def _entry_stamps(self) -> Dict[str, Tuple[Optional[str], str]]:
+        """Modification time and group path of every entry keyed by UUID."""
+        return {
+            str(entry.uuid): (_modified(entry), path)
+            for path, entries in self._groups.items()
+            for entry in entries
+        }
+    
+    def reload(self) -> DatabaseChanges:
+        """
+        Load the database file again and return the entries that changed.
+        
+        Entries are compared by UUID, modification time and group, records
+        of unchanged entries are kept from the previous load. The previous
+        load stays in use when the file cannot be opened.
+        """
+        with timing.span('reload'):
+            previous = self._stamps if self._stamps is not None else self._entry_stamps()
+            old_records = {
+                record.uuid: record for records in self._group_records.values() for record in records
+            }
+            with timing.span('open'):
+                db = self._load_database()
+            
+            self.db = db
+            self._group_entries = None
+            self._group_paths_by_uuid = None
+            self._group_records = {}
+            self._stamps = {}
+            added, changed = [], []
+            for path, entries in self._groups.items():
+                records = self._group_records[path] = []
+                for entry in entries:
+                    entry_uuid = str(entry.uuid)
+                    stamp = self._stamps[entry_uuid] = (_modified(entry), path)
+                    old_stamp = previous.get(entry_uuid)
+                    record = old_records.get(entry_uuid) if old_stamp == stamp else None
+                    if record is None:
+                        record = EntryRecord.from_entry(entry, path)
+                        if old_stamp is None:
+                            added.append(record)
+                        elif old_stamp != stamp:
+                            changed.append(record)
+                    records.append(record)
+            removed = [entry_uuid for entry_uuid in previous if entry_uuid not in self._stamps]
+        return DatabaseChanges(added, changed, removed)
+    
+    def get_group_paths(self) -> List[str]:
+        """Get normalized paths of all groups, the root group being empty."""
+        return sorted(self._groups)
+    
+    def get_group_uuids(self) -> Dict[str, str]:
+        """Get normalized paths of all groups keyed by group UUID."""
+        if self._group_paths_by_uuid is None:
+            with timing.span('groups'):
+                self._build_group_index()
+        return dict(self._group_paths_by_uuid)
+    
+    def find_entry(self, entry_uuid: str):
+        """Find an entry by its UUID."""
+        entry = self.db.find_entries(uuid=uuid.UUID(entry_uuid), first=True)
+        if not entry:
+            raise DatabaseError(f"Entry {entry_uuid} not found")
+        return entry
+
+class StreamStats(NamedTuple):
+    """Statistics of a streaming database load."""
+    entries: int
+    elapsed: float
+    peak_memory: Optional[int]
+
+def _peak_memory() -> Optional[int]:
+    """Return the peak resident set size of the process in bytes."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+@functools.lru_cache(maxsize=None)
+def _raw_kdbx4_struct():
+    """Build a KDBX4 parser that decrypts the payload but keeps the XML as bytes."""
+    from construct import Bytes, Checksum, Computed, GreedyBytes, IfThenElse, Struct, Switch, this
+    from pykeepass.kdbx_parsing import kdbx4
+    from pykeepass.kdbx_parsing.common import Decompressed, Reparsed, compute_master
+    from pykeepass.kdbx_parsing.kdbx import KDBX
+    
+    body = Struct(
+        "transformed_key" / Computed(_timed_kdf(kdbx4.compute_transformed)),
+        "master_key" / Computed(compute_master),
+        "sha256" / Checksum(
+            Bytes(32),
+            lambda data: hashlib.sha256(data).digest(),
+            this._.header.data
+        ),
+        "cred_check" / Checksum(Bytes(32), kdbx4.compute_header_hmac_hash, this),
+        "payload" / Reparsed(
+            Struct("inner_header" / kdbx4.InnerHeader, "xml" / GreedyBytes)
+        )(
+            IfThenElse(
+                this._.header.value.dynamic_header.compression_flags.data.compression,
+                Decompressed(kdbx4.DecryptedPayload),
+                kdbx4.DecryptedPayload
+            )
+        )
+    )
+    return Struct(KDBX.subcons[0], "body" / Switch(this.header.value.major_version, {4: body}))
+
+def _protected_stream_cipher(stream_id: str, stream_key: bytes):
+    """Create the inner stream cipher protecting passwords in the XML."""
+    from Cryptodome.Cipher import ChaCha20, Salsa20
+    
+    if stream_id == 'chacha20':
+        key_hash = hashlib.sha512(stream_key).digest()
+        return ChaCha20.new(key=key_hash[:32], nonce=key_hash[32:44])
+    if stream_id == 'salsa20':
+        return Salsa20.new(key=hashlib.sha256(stream_key).digest(), nonce=b'\xE8\x30\x09\x4B\x97\x20\x5D\x2A')
+    raise DatabaseError(f"Unsupported protected stream cipher: {stream_id}")
+
+# KeePass XML escapes "<" in text, so these tags can be found without parsing
+_STRUCTURE_TAGS = re.compile(rb'<(/?)(Group|Entry|History)>|<Name>[^<]*</Name>|<Name/>')
+_PROTECTED_VALUES = re.compile(rb'Protected="True">([^<]*)<')
+
+def _base64_length(data: bytes) -> int:
+    """Return the decoded length of base64 data without decoding it."""
+    return len(data) // 4 * 3 - data[-2:].count(b'=')
+
+def _split_tags(tags: Optional[str]) -> List[str]:
+    """Split the Tags element text like pykeepass."""
+    return tags.replace(',', ';').split(';') if tags else []
+
+def _iter_stream_records(xml: bytes, cipher, group: Optional[str], seen_groups: set):
+    """
+    Incrementally extract records of a group from the payload XML.
+    
+    Only the group, entry and history tags are scanned. Entries of the
+    requested group are parsed one at a time, all others only advance the
+    protected value stream.
+    """
+    from lxml import etree
+    
+    find_protected = etree.XPath('.//Value[@Protected="True"]')
+    names = []
+    expects_name = False
+    history_depth = 0
+    entry_start = None
+    skipped = 0
+    
+    for match in _STRUCTURE_TAGS.finditer(xml):
+        closing, tag = match.group(1), match.group(2)
+        
+        if tag == b'Group':
+            if closing:
+                names.pop()
+            else:
+                names.append('')
+                expects_name = True
+        elif tag is None:
+            if expects_name:
+                names[-1] = etree.fromstring(match.group(0)).text or ''
+                seen_groups.add('/'.join(names[1:]))
+                expects_name = False
+        elif tag == b'History':
+            history_depth += -1 if closing else 1
+        elif history_depth:
+            # History entries are handled together with the entry owning them
+            continue
+        elif not closing:
+            expects_name = False
+            entry_start = match.start()
         else:
-            # Get all entries
-            entries = self.db.entries
+            path = '/'.join(names[1:])
+            if group is not None and path != group:
+                # Protected values share one key stream, so values of skipped
+                # entries must still be consumed in document order
+                skipped += sum(
+                    _base64_length(value)
+                    for value in _PROTECTED_VALUES.findall(xml, entry_start, match.end())
+                )
+                continue
+            
+            if skipped:
+                cipher.decrypt(bytes(skipped))
+                skipped = 0
             
-        return entries
+            elem = etree.fromstring(xml[entry_start:match.end()])
+            for value in find_protected(elem):
+                plain = cipher.decrypt(base64.b64decode(value.text or ''))
+                if value.getparent().getparent() is elem:
+                    value.text = plain.decode('utf-8', errors='replace') or None
+            
+            # Empty values are None, as with pykeepass
+            fields = {string.findtext('Key'): string.find('Value').text for string in elem.iterfind('String')}
+            yield EntryRecord(
+                uuid=str(uuid.UUID(bytes=base64.b64decode(elem.findtext('UUID')))),
+                title=fields.get('Title'),
+                username=fields.get('UserName'),
+                password=fields.get('Password'),
+                url=fields.get('URL'),
+                notes=fields.get('Notes'),
+                group=path,
+                tags=_split_tags(elem.findtext('Tags')),
+                jump=fields.get(JUMP_FIELD)
+            )
+
+def stream_records(
+    db_path: str,
+    key_path: Optional[str] = None,
+    group_path: Optional[str] = None,
+    key_cache=None
+) -> Tuple[List[EntryRecord], StreamStats]:
+    """
+    Load the records of one group without building the full XML tree.
+    
+    The payload is decrypted whole and its XML kept as bytes. Group,
+    entry and history tags are found by a regular expression scan, and
+    only entries of the group are parsed, so no tree of the database is
+    built and history and binaries are skipped. KDBX 3 databases fall
+    back to a regular load.
+    """
+    started = time.perf_counter()
+    group = normalize_group_path(group_path) if group_path else None
+    transformed_key = key_cache.get(db_path, key_path) if key_cache else None
+    
+    def decrypt(transformed_key):
+        with timing.span('decrypt'):
+            return _raw_kdbx4_struct().parse_file(
+                db_path,
+                password=None,
+                keyfile=key_path,
+                transformed_key=transformed_key,
+                decrypt=True
+            )
+    
+    try:
+        try:
+            kdbx = decrypt(transformed_key)
+        except Exception:
+            if transformed_key is None:
+                raise
+            # Stale key, e.g. the key file changed, the key derived instead is cached below
+            key_cache.invalidate(db_path, key_path)
+            transformed_key = None
+            kdbx = decrypt(None)
+    except Exception as e:
+        raise DatabaseError(f"Error opening KeePass database: {e}")
+    
+    if kdbx.body is None:
+        records = KeePassDatabase(db_path, key_path, key_cache).get_records(group_path)
+    else:
+        if key_cache and transformed_key is None:
+            key_cache.put(db_path, key_path, kdbx.body.transformed_key)
+        inner_header = kdbx.body.payload.inner_header
+        cipher = _protected_stream_cipher(
+            inner_header.protected_stream_id.data,
+            inner_header.protected_stream_key.data
+        )
+        seen_groups = set()
+        with timing.span('scan'):
+            records = list(_iter_stream_records(kdbx.body.payload.xml, cipher, group, seen_groups))
+        
+        if group is not None and group not in seen_groups:
+            raise GroupNotFoundError(f"Group {group_path} not found")
+    
+    stats = StreamStats(
+        entries=len(records),
+        elapsed=time.perf_counter() - started,
+        peak_memory=_peak_memory()
+    )
+    return records, stats
 
 class DatabaseError(Exception):
     """Database operation error."""
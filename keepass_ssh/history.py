@@ -0,0 +1,142 @@
+"""Connection history module."""
+import os
+import time
+import uuid
+import struct
+import contextlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .index import default_cache_dir, write_private_file
+
+# A connection counts half as much after a week
+HALF_LIFE = 7 * 24 * 3600
+# Size in bytes above which the file is compacted, about 1800 connections
+MAX_SIZE = 64 * 1024
+MAX_ENTRIES = 1000
+MIN_SCORE = 0.01
+
+MAGIC = b'KSSHHST1'
+# Entry UUID, time, weight and session duration
+_RECORD = struct.Struct('<16sddf')
+
+class History:
+    """Frecency of connected servers, kept in an append-only file.
+
+    Every connection appends a fixed size record. Its weight decays by
+    half every half-life, so compaction folds all records of an entry
+    into one carrying the decayed sum as weight, and scores are the same
+    before and after. Appends and compaction of concurrent invocations
+    are serialized by a lock file next to the history, so compaction
+    does not drop records appended meanwhile.
+    """
+
+    def __init__(self, path: Optional[str] = None, half_life: float = HALF_LIFE, max_size: int = MAX_SIZE):
+        """Initialize history stored in the cache directory by default."""
+        self.path = path or os.path.join(default_cache_dir(), 'history')
+        self.half_life = half_life
+        self.max_size = max_size
+        self._scores = None
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the lock of the history file, no locking where flock is missing."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', mode=0o700, exist_ok=True)
+        # A separate file, compaction replaces the history file itself
+        fd = os.open(self.path + '.lock', os.O_WRONLY | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _read(self) -> List[Tuple[str, float, float, float]]:
+        """Read the records as (uuid, time, weight, duration)."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return []
+        if not data.startswith(MAGIC):
+            return []
+
+        # A record torn by a crash is ignored
+        end = len(data) - (len(data) - len(MAGIC)) % _RECORD.size
+        return [
+            (str(uuid.UUID(bytes=raw)), timestamp, weight, duration)
+            for raw, timestamp, weight, duration in _RECORD.iter_unpack(data[len(MAGIC):end])
+        ]
+
+    def record(self, entry_uuid, duration: float, timestamp: Optional[float] = None) -> None:
+        """Append a connection, compacting the file once it outgrows its size limit."""
+        try:
+            raw = uuid.UUID(str(entry_uuid)).bytes
+        except ValueError:
+            return
+        data = _RECORD.pack(raw, time.time() if timestamp is None else timestamp, 1.0, duration)
+
+        with self._locked():
+            if not os.path.exists(self.path):
+                write_private_file(self.path, MAGIC)
+            # One write per record, appends of concurrent invocations do not interleave
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, data)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+
+        self._scores = None
+        if size > self.max_size:
+            self.compact()
+
+    def compact(self, now: Optional[float] = None) -> None:
+        """Rewrite the file with one record per entry, dropping entries whose score decayed."""
+        now = time.time() if now is None else now
+        with self._locked():
+            durations = {}
+            for entry_uuid, _, _, duration in self._read():
+                durations[entry_uuid] = duration
+
+            scores = self.scores(now)
+            kept = sorted((key for key, score in scores.items() if score >= MIN_SCORE), key=scores.get, reverse=True)
+            write_private_file(self.path, MAGIC + b''.join(
+                _RECORD.pack(uuid.UUID(entry_uuid).bytes, now, scores[entry_uuid], durations[entry_uuid])
+                for entry_uuid in kept[:MAX_ENTRIES]
+            ))
+        self._scores = None
+
+    def scores(self, now: Optional[float] = None) -> Dict[str, float]:
+        """Get the frecency of every connected entry keyed by UUID."""
+        if now is None and self._scores is not None:
+            return self._scores
+
+        current = time.time() if now is None else now
+        scores: Dict[str, float] = {}
+        for entry_uuid, timestamp, weight, _ in self._read():
+            scores[entry_uuid] = scores.get(entry_uuid, 0.0) + weight * 2 ** ((timestamp - current) / self.half_life)
+        if now is None:
+            self._scores = scores
+        return scores
+
+    def score(self, server) -> float:
+        """Get the frecency of a server, 0 when it was never connected to."""
+        if not server.uuid:
+            return 0.0
+        return self.scores().get(str(server.uuid), 0.0)
+
+    def rank(self, servers: List) -> List:
+        """Order servers by frecency, servers never connected to keep their order."""
+        return sorted(servers, key=self.score, reverse=True)
+
+    def most_likely(self, servers: List):
+        """Get the server with the highest frecency, None when none was connected to."""
+        scored = [server for server in servers if self.score(server) > 0]
+        return max(scored, key=self.score) if scored else None
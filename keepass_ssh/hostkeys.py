@@ -0,0 +1,161 @@
+"""Known hosts module."""
+import os
+import hmac
+import base64
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import paramiko
+
+from .ssh import managed_known_hosts
+from .index import write_private_file
+
+SALT_SIZE = 20
+
+def default_known_hosts() -> List[str]:
+    """Return the known_hosts files read by OpenSSH, after the one written by key scans."""
+    return [managed_known_hosts(), os.path.expanduser('~/.ssh/known_hosts'), '/etc/ssh/ssh_known_hosts']
+
+def host_key_name(hostname: str, port: int = 22) -> str:
+    """Format a host as written in known_hosts."""
+    return hostname if port == 22 else f'[{hostname}]:{port}'
+
+def hash_host(host: str, salt: Optional[bytes] = None) -> str:
+    """Hash a host name as done by ssh-keygen -H."""
+    salt = os.urandom(SALT_SIZE) if salt is None else salt
+    digest = hmac.new(salt, host.encode('utf-8'), hashlib.sha1).digest()
+    return f"|1|{base64.b64encode(salt).decode('ascii')}|{base64.b64encode(digest).decode('ascii')}"
+
+def _matches(pattern: str, host: str) -> bool:
+    """Check whether a host field of known_hosts names the host, patterns aside."""
+    if not pattern.startswith('|1|'):
+        return pattern == host
+    try:
+        salt, digest = (base64.b64decode(part) for part in pattern[3:].split('|'))
+    except ValueError:
+        return False
+    return hmac.compare_digest(hmac.new(salt, host.encode('utf-8'), hashlib.sha1).digest(), digest)
+
+def update_known_hosts(path: str, keys: Dict[str, Tuple[str, str]]) -> Dict[str, str]:
+    """
+    Write scanned (type, base64) keys by host into a hashed known_hosts file.
+
+    Hosts already listed with the key are left alone, lines of hosts
+    whose key changed are replaced and duplicate lines dropped. Returns
+    'added', 'changed' or 'unchanged' per host, the file is only
+    rewritten when a key was added or changed.
+    """
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        lines = []
+
+    known: Dict[str, Set[Tuple[str, str]]] = {host: set() for host in keys}
+    owners: List[Optional[str]] = []
+    for line in lines:
+        fields = line.split()
+        owner = None
+        if len(fields) >= 3 and not fields[0].startswith(('#', '@')):
+            for host in keys:
+                if any(_matches(pattern, host) for pattern in fields[0].split(',')):
+                    owner = host
+                    known[host].add((fields[1], fields[2]))
+                    break
+        owners.append(owner)
+
+    status = {}
+    for host, key in keys.items():
+        if key in known[host]:
+            status[host] = 'unchanged'
+        else:
+            status[host] = 'changed' if known[host] else 'added'
+
+    stale = {host for host, state in status.items() if state == 'changed'}
+    if not stale and all(state == 'unchanged' for state in status.values()):
+        return status
+
+    kept = list(dict.fromkeys(line for line, owner in zip(lines, owners) if owner not in stale))
+    kept.extend(
+        f"{hash_host(host)} {keys[host][0]} {keys[host][1]}"
+        for host, state in status.items() if state != 'unchanged'
+    )
+    write_private_file(path, ('\n'.join(kept) + '\n').encode('utf-8'))
+    return status
+
+class KnownHosts:
+    """Host keys of known_hosts files, indexed once for many lookups.
+
+    Keys are compared by type and base64 text without being parsed, and
+    hashed host names are only checked when no plain entry matches.
+    """
+
+    def __init__(self, paths: Optional[Iterable[str]] = None):
+        """Initialize and read the given known_hosts files."""
+        self._plain: Dict[str, Set[Tuple[str, str]]] = {}
+        self._hashed: List[Tuple[bytes, bytes, Tuple[str, str]]] = []
+        self._revoked: Set[Tuple[str, str]] = set()
+        for path in default_known_hosts() if paths is None else paths:
+            self.load(path)
+
+    def load(self, path: str) -> None:
+        """Read a known_hosts file, missing files are skipped."""
+        try:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    self._add_line(line)
+        except OSError:
+            pass
+
+    def _add_line(self, line: str) -> None:
+        """Index a single known_hosts line."""
+        fields = line.split()
+        if not fields or fields[0].startswith('#'):
+            return
+
+        marker = fields.pop(0) if fields[0].startswith('@') else None
+        if len(fields) < 3 or marker == '@cert-authority':
+            return
+
+        hosts, key = fields[0], (fields[1], fields[2])
+        if marker == '@revoked':
+            self._revoked.add(key)
+            return
+
+        for host in hosts.split(','):
+            if host.startswith('|1|'):
+                try:
+                    salt, digest = (base64.b64decode(part) for part in host[3:].split('|'))
+                except ValueError:
+                    continue
+                self._hashed.append((salt, digest, key))
+            elif not host.startswith('!') and '*' not in host and '?' not in host:
+                self._plain.setdefault(host, set()).add(key)
+
+    def lookup(self, host: str) -> Set[Tuple[str, str]]:
+        """Get the (type, base64) keys known for a host name."""
+        keys = set(self._plain.get(host, ()))
+        for salt, digest, key in self._hashed:
+            if hmac.compare_digest(hmac.new(salt, host.encode('utf-8'), hashlib.sha1).digest(), digest):
+                keys.add(key)
+        return keys
+
+    def check(self, host: str, key: paramiko.PKey) -> bool:
+        """Check a server key against the known keys of a host."""
+        entry = (key.get_name(), key.get_base64())
+        return entry not in self._revoked and entry in self.lookup(host)
+
+class KnownHostsPolicy(paramiko.MissingHostKeyPolicy):
+    """Accept server keys listed in known_hosts and reject all others.
+
+    Used on clients without loaded host keys, so every key is checked here.
+    """
+
+    def __init__(self, known_hosts: Optional[KnownHosts] = None):
+        """Initialize policy with shared known hosts."""
+        self.known_hosts = known_hosts or KnownHosts()
+
+    def missing_host_key(self, client, hostname: str, key: paramiko.PKey) -> None:
+        """Raise unless the key is known for the host."""
+        if not self.known_hosts.check(hostname, key):
+            raise paramiko.SSHException(f"Host key for {hostname} is not known or does not match")
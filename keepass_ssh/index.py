@@ -0,0 +1,186 @@
+"""Metadata index module."""
+import os
+import json
+import uuid
+import struct
+import logging
+import hashlib
+import tempfile
+from typing import Dict, Iterable, List, Optional
+
+from . import timing
+from .complete import cache_name, completion_path, default_cache_dir, format_completions
+from .database import EntryRecord, GroupNotFoundError, normalize_group_path
+from .search import SearchIndex
+
+INDEX_VERSION = 5
+INDEXED_FIELDS = ('uuid', 'title', 'username', 'url', 'notes', 'group', 'tags', 'jump')
+
+def content_hash(path: str) -> str:
+    """Compute the SHA-256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def write_private_file(path: str, data: bytes) -> None:
+    """Atomically write a file readable by the current user only."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class MetadataIndex:
+    """On-disk index of the non-secret entry fields of a database."""
+
+    def __init__(self, db_path: str, cache_dir: Optional[str] = None):
+        """Initialize index for a database file."""
+        self.db_path = os.path.realpath(db_path)
+        name = cache_name(self.db_path)
+        cache_dir = cache_dir or default_cache_dir()
+        self.path = os.path.join(cache_dir, f'index-{name}.json')
+        self.search_path = os.path.join(cache_dir, f'search-{name}.bin')
+        self.completion_path = completion_path(self.db_path, cache_dir)
+        self._data = None
+
+    def _stat(self) -> Optional[os.stat_result]:
+        """Stat the database file, None when missing."""
+        try:
+            return os.stat(self.db_path)
+        except OSError:
+            return None
+
+    def _read(self) -> Optional[dict]:
+        """Read the raw index file."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != INDEX_VERSION or data.get('database') != self.db_path:
+            return None
+        return data
+
+    def _write(self, data: dict) -> None:
+        """Write the raw index file."""
+        write_private_file(self.path, json.dumps(data).encode('utf-8'))
+
+    def load(self) -> Optional[dict]:
+        """Load the index if it matches the current database file."""
+        stat = self._stat()
+        if stat is None:
+            return None
+
+        data = self._read()
+        if data is None:
+            return None
+
+        if data['mtime_ns'] == stat.st_mtime_ns and data['size'] == stat.st_size:
+            self._data = data
+            return data
+
+        # File was touched, only trust the index if the content is unchanged
+        if data['size'] != stat.st_size or data['sha256'] != content_hash(self.db_path):
+            return None
+
+        data['mtime_ns'] = stat.st_mtime_ns
+        self._write(data)
+        self._data = data
+        return data
+
+    def save(
+        self,
+        records: Iterable[EntryRecord],
+        groups: Iterable[str],
+        search_index: Optional[SearchIndex] = None,
+        group_uuids: Optional[Dict[str, str]] = None
+    ) -> Optional[SearchIndex]:
+        """Rebuild the index from database records and group paths keyed by UUID, the search index is built unless given."""
+        stat = self._stat()
+        if stat is None:
+            return None
+
+        records = list(records)
+        groups = sorted(groups)
+        if search_index is None:
+            search_index = SearchIndex.from_records(records)
+        digest = content_hash(self.db_path)
+        self._write({
+            'version': INDEX_VERSION,
+            'database': self.db_path,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': digest,
+            'groups': groups,
+            'group_uuids': group_uuids or {},
+            'entries': [
+                {field: getattr(record, field) for field in INDEXED_FIELDS}
+                for record in records
+            ]
+        })
+        # Kept in a separate file, only read when servers are filtered,
+        # a JSON header line followed by the packed index
+        header = json.dumps({'version': INDEX_VERSION, 'sha256': digest}).encode('utf-8')
+        write_private_file(self.search_path, header + b'\n' + search_index.to_bytes())
+        # Titles and groups only, read by shell completion
+        write_private_file(self.completion_path, format_completions(records, groups).encode('utf-8'))
+        self._data = None
+        return search_index
+
+    def get_entries(self, group_path: Optional[str] = None) -> Optional[List[EntryRecord]]:
+        """Get indexed records of a group, or None when the index is stale."""
+        data = self.load()
+        if data is None:
+            return None
+
+        entries = data['entries']
+        if group_path:
+            group = normalize_group_path(group_path)
+            if group not in data['groups']:
+                group = self._group_by_uuid(data, group_path)
+
+            entries = [entry for entry in entries if entry['group'] == group]
+
+        return [EntryRecord(password=None, **entry) for entry in entries]
+
+    @staticmethod
+    def _group_by_uuid(data: dict, group_path: str) -> str:
+        """Resolve a group UUID to its indexed path, as the database does."""
+        try:
+            return data['group_uuids'][str(uuid.UUID(group_path))]
+        except (ValueError, KeyError):
+            raise GroupNotFoundError(f"Group {group_path} not found")
+
+    def get_search_index(self) -> Optional[SearchIndex]:
+        """Get the search index over all entries, or None when the index is stale."""
+        data = self._data or self.load()
+        if data is None:
+            return None
+
+        try:
+            with open(self.search_path, 'rb') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != INDEX_VERSION or header.get('sha256') != data['sha256']:
+                    return None
+                return SearchIndex.from_bytes(f.read())
+        except (OSError, ValueError, IndexError, struct.error):
+            return None
+
+def refresh_index(db, db_path: Optional[str]) -> None:
+    """Rebuild the metadata index of an opened database, a failed write is only logged."""
+    if not db_path or not os.path.exists(db_path):
+        return
+
+    try:
+        with timing.span('index.write'):
+            MetadataIndex(db_path).save(db.get_records(), db.get_group_paths(), group_uuids=db.get_group_uuids())
+    except OSError as e:
+        logging.warning(f"Could not write metadata index: {e}")
@@ -0,0 +1,150 @@
+"""Transformed key cache module."""
+import os
+import json
+import time
+import struct
+import hashlib
+import logging
+import subprocess
+from typing import Optional
+
+from .index import default_cache_dir, write_private_file
+
+DEFAULT_TTL = 600
+BACKENDS = ('file', 'keyring')
+KDBX_SIGNATURE = b'\x03\xd9\xa2\x9a\x67\xfb\x4b\xb5'
+
+def read_header(db_path: str) -> bytes:
+    """Read the outer header of a KDBX file, which holds the KDF seeds."""
+    with open(db_path, 'rb') as f:
+        data = f.read(12)
+        if len(data) < 12 or data[:8] != KDBX_SIGNATURE:
+            raise ValueError("Not a KeePass database")
+
+        major_version = struct.unpack('<H', data[10:12])[0]
+        length_format = '<I' if major_version >= 4 else '<H'
+        field_size = 1 + struct.calcsize(length_format)
+        chunks = [data]
+
+        while True:
+            field = f.read(field_size)
+            if len(field) < field_size:
+                raise ValueError("Truncated KeePass header")
+            length = struct.unpack(length_format, field[1:])[0]
+            chunks += [field, f.read(length)]
+            if field[0] == 0:
+                return b''.join(chunks)
+
+class _FileBackend:
+    """Store cached keys in private files with an expiry time."""
+
+    def __init__(self, cache_dir: str):
+        """Initialize backend storing keys below the cache directory."""
+        self.directory = os.path.join(cache_dir, 'keys')
+
+    def get(self, name: str) -> Optional[bytes]:
+        """Read a cached value unless it has expired."""
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('expires', 0) < time.time():
+            self.delete(name)
+            return None
+        return bytes.fromhex(data['value'])
+
+    def put(self, name: str, value: bytes, ttl: float) -> None:
+        """Store a value expiring after the TTL."""
+        data = {'expires': time.time() + ttl, 'value': value.hex()}
+        write_private_file(os.path.join(self.directory, name), json.dumps(data).encode('utf-8'))
+
+    def delete(self, name: str) -> None:
+        """Remove a cached value."""
+        try:
+            os.unlink(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+class _KeyringBackend:
+    """Store cached keys in the Linux kernel user keyring via keyctl."""
+
+    @staticmethod
+    def _keyctl(*args, data: Optional[bytes] = None) -> bytes:
+        """Run a keyctl command and return its output."""
+        return subprocess.run(
+            ('keyctl',) + args, input=data, capture_output=True, check=True
+        ).stdout
+
+    def _find(self, name: str) -> Optional[str]:
+        """Find the serial number of a cached key."""
+        try:
+            return self._keyctl('search', '@u', 'user', f'keepass-ssh:{name}').decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def get(self, name: str) -> Optional[bytes]:
+        """Read a cached value, expired keys are gone from the keyring."""
+        key_id = self._find(name)
+        if key_id is None:
+            return None
+        try:
+            return self._keyctl('pipe', key_id)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def put(self, name: str, value: bytes, ttl: float) -> None:
+        """Store a value and let the kernel expire it after the TTL."""
+        key_id = self._keyctl('padd', 'user', f'keepass-ssh:{name}', '@u', data=value).decode().strip()
+        self._keyctl('timeout', key_id, str(int(ttl)))
+
+    def delete(self, name: str) -> None:
+        """Remove a cached value."""
+        key_id = self._find(name)
+        if key_id is not None:
+            self._keyctl('unlink', key_id, '@u')
+
+class KeyCache:
+    """Cache of transformed database keys with a TTL."""
+
+    def __init__(self, backend: str = 'file', ttl: float = DEFAULT_TTL, cache_dir: Optional[str] = None):
+        """Initialize cache with the given storage backend."""
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown key cache backend: {backend}")
+        self.ttl = ttl
+        self.backend = _KeyringBackend() if backend == 'keyring' else _FileBackend(cache_dir or default_cache_dir())
+
+    @staticmethod
+    def _name(db_path: str, key_path: Optional[str]) -> str:
+        """Derive the cache slot name of a database and key file pair."""
+        paths = f"{os.path.realpath(db_path)}\0{os.path.realpath(key_path) if key_path else ''}"
+        return hashlib.sha256(paths.encode('utf-8')).hexdigest()[:32]
+
+    def get(self, db_path: str, key_path: Optional[str] = None) -> Optional[bytes]:
+        """Get the cached key if the database header is unchanged."""
+        try:
+            header_digest = hashlib.sha256(read_header(db_path)).digest()
+            value = self.backend.get(self._name(db_path, key_path))
+        except (OSError, ValueError) as e:
+            logging.info(f"Key cache unavailable: {e}")
+            return None
+
+        if not value or value[:32] != header_digest:
+            return None
+        return value[32:]
+
+    def put(self, db_path: str, key_path: Optional[str], transformed_key: bytes) -> None:
+        """Cache the transformed key for the current database header."""
+        try:
+            header_digest = hashlib.sha256(read_header(db_path)).digest()
+            self.backend.put(self._name(db_path, key_path), header_digest + transformed_key, self.ttl)
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            logging.warning(f"Could not cache database key: {e}")
+
+    def invalidate(self, db_path: str, key_path: Optional[str] = None) -> None:
+        """Drop the cached key of a database."""
+        try:
+            self.backend.delete(self._name(db_path, key_path))
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.warning(f"Could not invalidate cached key: {e}")
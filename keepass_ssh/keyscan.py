@@ -0,0 +1,107 @@
+"""Parallel host key scan module."""
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import paramiko
+
+from .server import ServerEntry
+from .pool import SSHConnectionPool
+from .hostkeys import host_key_name, managed_known_hosts, update_known_hosts
+
+DEFAULT_WORKERS = 64
+DEFAULT_TIMEOUT = 5.0
+
+class ScanResult(NamedTuple):
+    """Host key of one host, or why it could not be fetched."""
+    host: str
+    key: Optional[Tuple[str, str]]
+    status: str = 'failed'
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the key was fetched."""
+        return self.key is not None
+
+class KeyScanner:
+    """Fetch host keys of many servers on a bounded worker pool, like ssh-keyscan.
+
+    Servers behind jump hosts are scanned through a channel of a pooled
+    connection to the jump host, of the given pool or one opened per scan.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT,
+        resolver=None,
+        pool: Optional[SSHConnectionPool] = None
+    ):
+        """Initialize scanner with the seconds allowed per host."""
+        self.workers = workers
+        self.timeout = timeout
+        self.resolver = resolver
+        self.pool = pool
+
+    def fetch(self, hostname: str, port: int, sock=None) -> Tuple[str, str]:
+        """Run a key exchange with a host, over sock when given, and get its (type, base64) key."""
+        if sock is None and self.resolver is not None:
+            addresses = self.resolver.getaddrinfo(hostname, port)
+            sock = socket.create_connection(addresses[0][4][:2], self.timeout)
+        elif sock is None:
+            sock = socket.create_connection((hostname, port), self.timeout)
+        transport = paramiko.Transport(sock)
+        try:
+            transport.banner_timeout = self.timeout
+            # No authentication follows, the handshake alone reveals the key
+            transport.start_client(timeout=self.timeout)
+            key = transport.get_remote_server_key()
+            return key.get_name(), key.get_base64()
+        finally:
+            transport.close()
+
+    def scan_host(self, hostname: str, port: int, server: Optional[ServerEntry] = None) -> ScanResult:
+        """Fetch the key of a single host, through the jump host of server if it has one."""
+        host = host_key_name(hostname, port)
+        try:
+            if server is not None and server.jump:
+                with self.pool.tunnel(server) as channel:
+                    return ScanResult(host, self.fetch(hostname, port, channel))
+            return ScanResult(host, self.fetch(hostname, port))
+        except (paramiko.SSHException, EOFError, OSError) as e:
+            return ScanResult(host, None, error=str(e) or e.__class__.__name__)
+
+    def scan(self, servers: List[ServerEntry], path: Optional[str] = None) -> List[ScanResult]:
+        """
+        Fetch the keys of all servers and merge them into a known_hosts file.
+
+        Hosts shared by several entries are scanned once. Results are in
+        the order of the hosts and carry whether the key was added,
+        changed or already known.
+        """
+        targets = list({(server.hostname, server.port, server.jump or ''): server for server in servers}.values())
+        own_pool = self.pool is None and any(server.jump for server in targets)
+        if own_pool:
+            self.pool = SSHConnectionPool(timeout=self.timeout)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(targets)))) as pool:
+                results = list(pool.map(lambda server: self.scan_host(server.hostname, server.port, server), targets))
+        finally:
+            if own_pool:
+                self.pool.close()
+                self.pool = None
+
+        keys: Dict[str, Tuple[str, str]] = {result.host: result.key for result in results if result.ok}
+        status = update_known_hosts(path or managed_known_hosts(), keys) if keys else {}
+        return [result._replace(status=status[result.host]) if result.ok else result for result in results]
+
+def format_summary(results: List[ScanResult]) -> str:
+    """Summarize a scan, listing changed keys and failed hosts."""
+    counts = {state: 0 for state in ('added', 'changed', 'unchanged', 'failed')}
+    for result in results:
+        counts[result.status] += 1
+    lines = [', '.join(f"{count} {state}" for state, count in counts.items())]
+    lines.extend(f"  changed: {result.host} {result.key[0]}" for result in results if result.status == 'changed')
+    lines.extend(f"  failed: {result.host}: {result.error}" for result in results if not result.ok)
+    return '\n'.join(lines)
@@ -0,0 +1,134 @@
+"""Parallel loading of several KeePass databases."""
+import os
+import time
+from itertools import repeat
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import timing
+from .database import KeePassDatabase, EntryRecord, DatabaseError, GroupNotFoundError, stream_records
+from .index import refresh_index
+
+# Phases recorded in a worker process as (path, elapsed, count)
+PhaseRecord = Tuple[Tuple[str, ...], float, int]
+
+class DatabaseSource(NamedTuple):
+    """A database file together with its key file."""
+    path: str
+    key_path: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        """Short name of the database shown next to its servers."""
+        return database_name(self.path)
+
+class LoadResult(NamedTuple):
+    """Records loaded from one database, or why it could not be loaded."""
+    source: DatabaseSource
+    records: List[EntryRecord]
+    elapsed: float
+    error: Optional[str] = None
+    phases: Tuple[PhaseRecord, ...] = ()
+
+def database_name(path: str) -> str:
+    """Get the file name of a database without its extension."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+def load_records(
+    source: DatabaseSource,
+    group_path: Optional[str] = None,
+    key_cache=None,
+    stream: bool = False,
+    timed: bool = False
+) -> LoadResult:
+    """
+    Open a database and get the records of a group, errors are returned in the result.
+    
+    With timed, phases are recorded in fresh timings and returned, as
+    spans of a worker process do not reach the timings of the parent.
+    """
+    start = time.perf_counter()
+    timings = timing.enable() if timed else None
+    try:
+        if stream:
+            records, _ = stream_records(source.path, source.key_path, group_path, key_cache)
+        else:
+            db = KeePassDatabase(source.path, source.key_path, key_cache)
+            refresh_index(db, source.path)
+            records = db.get_records(group_path)
+        error = None
+    except (DatabaseError, GroupNotFoundError) as e:
+        records, error = [], str(e)
+    finally:
+        if timed:
+            timing.disable()
+    phases = tuple((phase.path, phase.elapsed, phase.count) for phase in timings.phases) if timings else ()
+    return LoadResult(source, records, time.perf_counter() - start, error, phases)
+
+def find_passwords(source: DatabaseSource, entry_uuids: Sequence[str], key_cache=None) -> Dict[str, Optional[str]]:
+    """Open a database and get the passwords of entries by UUID."""
+    db = KeePassDatabase(source.path, source.key_path, key_cache)
+    return {entry_uuid: db.find_entry(entry_uuid).password for entry_uuid in entry_uuids}
+
+def pool_size(jobs: int, workers: Optional[int] = None) -> int:
+    """Get the number of worker processes for jobs, limited by the usable CPUs."""
+    if workers is None:
+        try:
+            workers = len(os.sched_getaffinity(0))
+        except AttributeError:
+            workers = os.cpu_count() or 1
+    return max(1, min(jobs, workers))
+
+def _map(function: Callable, *iterables, processes: int) -> List:
+    """Map a function over the arguments in worker processes, or in this process for one."""
+    if processes <= 1:
+        return list(map(function, *iterables))
+
+    # Imported here, multiprocessing is only needed for several databases
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(function, *iterables))
+
+def load_databases(
+    sources: Sequence[DatabaseSource],
+    group_path: Optional[str] = None,
+    key_cache=None,
+    stream: bool = False,
+    workers: Optional[int] = None
+) -> List[LoadResult]:
+    """
+    Load the records of a group from several databases at once.
+
+    Databases are opened in worker processes, one per usable CPU, so the
+    key derivations run on separate cores and the wall clock time is
+    close to the slowest single open. Results are in the order of the
+    sources.
+    """
+    timings = timing.active()
+    processes = pool_size(len(sources), workers)
+    # Loads in this process record their spans directly
+    timed = timings is not None and processes > 1
+    with timing.span('databases'):
+        results = _map(
+            load_records, sources, repeat(group_path), repeat(key_cache), repeat(stream), repeat(timed),
+            processes=processes
+        )
+    if timed:
+        for result in results:
+            phases = (((), result.elapsed, 1),) + result.phases
+            timings.merge(phases, ('databases', result.source.name))
+    return results
+
+def fetch_passwords(
+    requests: Sequence[Tuple[DatabaseSource, Sequence[str]]],
+    key_cache=None,
+    workers: Optional[int] = None
+) -> List[Dict[str, Optional[str]]]:
+    """Get passwords by UUID from several databases at once, one dictionary per request."""
+    sources = [source for source, _ in requests]
+    entry_uuids = [uuids for _, uuids in requests]
+    with timing.span('databases'):
+        return _map(
+            find_passwords, sources, entry_uuids, repeat(key_cache),
+            processes=pool_size(len(requests), workers)
+        )
@@ -0,0 +1,163 @@
+"""SSH connection multiplexing module."""
+import os
+import json
+import socket
+import hashlib
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+from .index import default_cache_dir, write_private_file
+from .server import ServerEntry
+
+DEFAULT_PERSIST = 600
+WARM_WORKERS = 16
+WARM_TIMEOUT = 30
+
+class Master(NamedTuple):
+    """A control master socket and the server it was opened for."""
+    path: str
+    destination: str
+    port: int
+    title: str
+    alive: bool
+
+class ControlMasters:
+    """Persistent OpenSSH control masters, one socket per server.
+
+    Connections through a live master skip the TCP handshake, key exchange
+    and authentication. A small info file next to each socket records the
+    server so masters can be listed and closed later.
+    """
+
+    def __init__(self, directory: Optional[str] = None, persist: int = DEFAULT_PERSIST):
+        """Initialize masters kept in directory and alive for persist idle seconds."""
+        self.directory = directory or os.path.join(default_cache_dir(), 'masters')
+        self.persist = persist
+
+    @staticmethod
+    def destination(server: ServerEntry) -> str:
+        """Format the ssh destination of a server."""
+        return f'{server.username}@{server.hostname}' if server.username else server.hostname
+
+    def socket_path(self, server: ServerEntry) -> str:
+        """Get the control socket path of a server."""
+        # Socket paths are limited to about 100 bytes, so the name is a short digest
+        name = f'{self.destination(server)}:{server.port}'
+        if server.jump:
+            # One private address behind two jump hosts is two servers
+            name += f' via {server.jump}'
+        return os.path.join(self.directory, hashlib.sha1(name.encode('utf-8')).hexdigest()[:16])
+
+    def options(self, server: ServerEntry, master: str = 'auto') -> List[str]:
+        """Get the ssh options using the control master of a server."""
+        # ssh expands % tokens in ControlPath
+        path = self.socket_path(server).replace('%', '%%')
+        return [
+            '-o', f'ControlMaster={master}',
+            '-o', f'ControlPath={path}',
+            '-o', f'ControlPersist={self.persist}'
+        ]
+
+    def register(self, server: ServerEntry) -> None:
+        """Record the server of a control socket before ssh opens it."""
+        info = {'destination': self.destination(server), 'port': server.port, 'title': server.title}
+        write_private_file(self.socket_path(server) + '.json', json.dumps(info).encode('utf-8'))
+
+    @staticmethod
+    def is_alive(path: str) -> bool:
+        """Check whether a master is listening on the socket."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
+    def list(self) -> List[Master]:
+        """List known masters, records of exited masters are removed."""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError:
+            return []
+
+        masters = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            info_path = os.path.join(self.directory, name)
+            path = info_path[:-len('.json')]
+            try:
+                with open(info_path, encoding='utf-8') as f:
+                    info = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            alive = self.is_alive(path)
+            if not alive:
+                self._forget(path)
+            masters.append(Master(path, info['destination'], info['port'], info['title'], alive))
+        return masters
+
+    def close(self, master: Master) -> bool:
+        """Ask a master to exit and forget it."""
+        result = subprocess.run(
+            ['ssh', '-O', 'exit', '-o', f"ControlPath={master.path.replace('%', '%%')}",
+             '-p', str(master.port), master.destination],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self._forget(master.path)
+        return result.returncode == 0
+
+    def _forget(self, path: str) -> None:
+        """Remove the socket and info file of a master."""
+        for stale in (path, path + '.json'):
+            try:
+                os.unlink(stale)
+            except FileNotFoundError:
+                pass
+
+    def warm(self, servers: List[ServerEntry], timeout: float = WARM_TIMEOUT) -> Dict[str, Optional[str]]:
+        """Open masters for servers in parallel, map each title to an error or None."""
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=max(1, min(WARM_WORKERS, len(servers)))) as pool:
+            errors = pool.map(lambda server: self._warm_one(server, timeout), servers)
+            return dict(zip((server.title for server in servers), errors))
+
+    def _warm_one(self, server: ServerEntry, timeout: float) -> Optional[str]:
+        """Open the master of a single server unless it is already running."""
+        # Imported here, the ssh module imports this one
+        from .ssh import jump_options
+
+        if self.is_alive(self.socket_path(server)):
+            return None
+
+        self.register(server)
+        # Jump hosts never prompt, nobody could answer and sshpass must only answer the server
+        command = ['ssh', '-f', '-N', *self.options(server, 'yes'), *jump_options(server, batch=True),
+                   '-o', f'ConnectTimeout={int(timeout)}', '-p', str(server.port), self.destination(server)]
+        env = None
+        if server.password:
+            # Passed in the environment so it does not show up in the process list
+            command = ['sshpass', '-e', *command]
+            env = dict(os.environ, SSHPASS=server.password)
+        else:
+            command[1:1] = ['-o', 'BatchMode=yes']
+
+        # The backgrounded master keeps its output open, so errors go to a file instead of a pipe
+        with tempfile.TemporaryFile() as stderr:
+            try:
+                result = subprocess.run(command, env=env, stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.DEVNULL, stderr=stderr, timeout=timeout)
+            except FileNotFoundError:
+                return f"{command[0]} not found"
+            except subprocess.TimeoutExpired:
+                return f"timed out after {timeout:g}s"
+            if result.returncode == 0:
+                return None
+            stderr.seek(0)
+            message = stderr.read().decode('utf-8', errors='replace').strip()
+            return message.splitlines()[-1] if message else f"ssh exited with {result.returncode}"
@@ -0,0 +1,159 @@
+"""Machine-readable output module."""
+import sys
+import json
+import threading
+from typing import BinaryIO, Dict, List, Optional
+
+FORMATS = ('text', 'json', 'ndjson', 'tsv')
+BUFFER_SIZE = 1 << 16
+
+# Backslash escapes keeping a TSV value on one line of one column
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+_encode = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':')).encode
+
+def server_record(server, probe=None) -> Dict:
+    """Get the fields of a server shown by --list, the password left out."""
+    record = {
+        'title': server.title,
+        'username': server.username,
+        'hostname': server.hostname,
+        'port': server.port,
+        'url': server.url,
+        'description': server.description,
+        'uuid': None if server.uuid is None else str(server.uuid),
+        'tags': server.tags or [],
+        'database': server.database,
+        'jump': server.jump,
+    }
+    if probe is not None:
+        record['status'] = probe.status
+        record['latency_ms'] = None if probe.latency is None else round(probe.latency * 1000, 1)
+    return record
+
+def exec_record(result, stdout: List[str], stderr: List[str]) -> Dict:
+    """Get the outcome and output of a command on one server."""
+    return {
+        'title': result.server.title,
+        'hostname': result.server.hostname,
+        'port': result.server.port,
+        'ok': result.ok,
+        'exit_code': result.exit_code,
+        'elapsed': round(result.elapsed, 3),
+        'error': result.error,
+        'stdout': '\n'.join(stdout),
+        'stderr': '\n'.join(stderr),
+    }
+
+def transfer_record(result) -> Dict:
+    """Get the outcome of a transfer to or from one server."""
+    return {
+        'title': result.server.title,
+        'hostname': result.server.hostname,
+        'port': result.server.port,
+        'ok': result.ok,
+        'path': result.path,
+        'size': result.size,
+        'elapsed': round(result.elapsed, 3),
+        'error': result.error,
+    }
+
+def scan_record(result) -> Dict:
+    """Get the outcome of a host key scan of one host."""
+    return {
+        'host': result.host,
+        'ok': result.ok,
+        'status': result.status,
+        'key_type': result.key[0] if result.ok else None,
+        'key': result.key[1] if result.ok else None,
+        'error': result.error,
+    }
+
+def _tsv_value(value) -> str:
+    """Format a value as a TSV column."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        value = ','.join(value)
+    return str(value).translate(_TSV_ESCAPES)
+
+class RecordWriter:
+    """Write records one at a time as a JSON array, JSON lines or TSV.
+
+    Records are encoded to UTF-8 and written to a binary stream in
+    chunks, so no record list is kept and no print call is made per
+    record. TSV columns are the keys of the first record, given once as
+    a header line. Records may come from several threads.
+    """
+
+    def __init__(self, output_format: str, stream: Optional[BinaryIO] = None, buffer_size: int = BUFFER_SIZE):
+        """Initialize writer, standard output by default."""
+        if output_format not in FORMATS[1:]:
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.format = output_format
+        self.stream = stream or sys.stdout.buffer
+        self.buffer_size = buffer_size
+        self.count = 0
+        self._chunks: List[bytes] = []
+        self._size = 0
+        self._fields = None
+        self._lock = threading.Lock()
+
+    def _encode(self, record: Dict) -> str:
+        """Encode a record with its separator."""
+        if self.format == 'ndjson':
+            return _encode(record) + '\n'
+        if self.format == 'json':
+            return ('[\n' if self.count == 0 else ',\n') + _encode(record)
+
+        line = '\t'.join(_tsv_value(record.get(field)) for field in self._fields or record) + '\n'
+        if self._fields is None:
+            self._fields = tuple(record)
+            line = '\t'.join(self._fields) + '\n' + line
+        return line
+
+    def write(self, record: Dict) -> None:
+        """Write a record, flushing once a chunk is full."""
+        with self._lock:
+            data = self._encode(record).encode('utf-8')
+            self.count += 1
+            self._chunks.append(data)
+            self._size += len(data)
+            if self._size >= self.buffer_size:
+                self._flush()
+
+    def _flush(self) -> None:
+        """Write the buffered records to the stream."""
+        self.stream.write(b''.join(self._chunks))
+        self.stream.flush()
+        self._chunks, self._size = [], 0
+
+    def close(self) -> None:
+        """Terminate the output and write what is buffered."""
+        with self._lock:
+            if self.format == 'json':
+                self._chunks.append(b'[]\n' if self.count == 0 else b'\n]\n')
+            self._flush()
+
+class ExecRecorder:
+    """Collect remote output per server and write a record once its command finished."""
+
+    def __init__(self, writer: RecordWriter):
+        """Initialize recorder writing through a record writer."""
+        self.writer = writer
+        self._output: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, server, line: str, is_stderr: bool = False) -> None:
+        """Keep a line of remote output."""
+        with self._lock:
+            stdout, stderr = self._output.setdefault(id(server), ([], []))
+        (stderr if is_stderr else stdout).append(line)
+
+    def finished(self, result) -> None:
+        """Write the record of a server together with its output."""
+        with self._lock:
+            stdout, stderr = self._output.pop(id(result.server), ([], []))
+        self.writer.write(exec_record(result, stdout, stderr))
@@ -0,0 +1,340 @@
+"""SSH connection pool module."""
+import time
+import select
+import socket
+import threading
+import contextlib
+from collections import OrderedDict
+from typing import Iterator, Optional, Tuple
+
+import paramiko
+
+from . import timing
+from .server import ServerEntry, ServerManager
+from .hostkeys import KnownHostsPolicy
+
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_IDLE_TIMEOUT = 300.0
+DEFAULT_KEEPALIVE = 30
+DEFAULT_TIMEOUT = 30.0
+READ_SIZE = 32768
+
+PoolKey = Tuple[str, str, int, str]
+
+class _PooledConnection:
+    """An authenticated client with its usage bookkeeping.
+
+    A connection tunnelled through a jump host keeps that connection in
+    use until it is closed. Connections serving as jump hosts are only
+    closed once idle for the idle timeout. A discarded connection with
+    open sessions is retired and closed when its last session ends.
+    """
+
+    __slots__ = ('client', 'last_used', 'in_use', 'via', 'jump', 'retired')
+
+    def __init__(self, client: paramiko.SSHClient, via: Optional['_PooledConnection'] = None):
+        self.client = client
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        self.via = via
+        self.jump = False
+        self.retired = False
+
+    @property
+    def transport(self) -> Optional[paramiko.Transport]:
+        """Underlying transport of the client."""
+        return self.client.get_transport()
+
+    def healthy(self) -> bool:
+        """Whether the transport is still connected and authenticated."""
+        transport = self.transport
+        return transport is not None and transport.is_active() and transport.is_authenticated()
+
+class SSHConnectionPool:
+    """Authenticated paramiko connections shared across commands.
+
+    Connections are keyed by (username, hostname, port, jump) and every command
+    opens a new channel on the existing transport. Idle connections are
+    closed after idle_timeout seconds, and the least recently used idle
+    connections are closed once more than max_connections are open, so a
+    pool with max_connections=0 closes every connection once it is idle.
+    Connections with open sessions are never evicted, so the limit may be
+    exceeded while all of them are busy.
+
+    Servers with jump hosts are connected through a direct-tcpip channel
+    of a pooled connection to their jump host, so any number of servers
+    behind a bastion cost one handshake with the bastion.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        keepalive: int = DEFAULT_KEEPALIVE,
+        timeout: float = DEFAULT_TIMEOUT,
+        host_key_policy: Optional[paramiko.MissingHostKeyPolicy] = None,
+        resolver=None
+    ):
+        """Initialize an empty pool, hostnames are looked up through the resolver when given."""
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.host_key_policy = host_key_policy or KnownHostsPolicy()
+        self.resolver = resolver
+        self._connections: 'OrderedDict[PoolKey, _PooledConnection]' = OrderedDict()
+        # Reentrant, closing a tunnelled connection releases its jump host
+        self._lock = threading.RLock()
+        self._connecting = {}
+
+    @staticmethod
+    def key(server: ServerEntry) -> PoolKey:
+        """Get the pool key of a server, private addresses behind different jump hosts differ."""
+        return (server.username or '', server.hostname, server.port, server.jump or '')
+
+    def __len__(self) -> int:
+        """Number of open connections."""
+        return len(self._connections)
+
+    def __enter__(self) -> 'SSHConnectionPool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _open_socket(self, server: ServerEntry) -> socket.socket:
+        """Resolve a server and connect to the first of its addresses accepting the connection."""
+        with timing.span('dns'):
+            if self.resolver is not None:
+                addresses = self.resolver.getaddrinfo(server.hostname, server.port)
+            else:
+                addresses = socket.getaddrinfo(server.hostname, server.port, 0, socket.SOCK_STREAM)
+        
+        error = None
+        with timing.span('tcp'):
+            for family, kind, proto, _, address in addresses:
+                sock = socket.socket(family, kind, proto)
+                try:
+                    sock.settimeout(self.timeout)
+                    sock.connect(address)
+                except OSError as e:
+                    sock.close()
+                    error = e
+                    continue
+                # Channel requests are small writes, Nagle would hold them for the peer's delayed ACK
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                return sock
+        raise error or OSError(f"No address found for {server.hostname}")
+
+    def _open_tunnel(self, server: ServerEntry) -> Tuple[paramiko.Channel, _PooledConnection]:
+        """Open a channel to a server through its jump host, keeping the jump host in use."""
+        jump = ServerManager.jump_server(server)
+        connection, _ = self._acquire(jump)
+        connection.jump = True
+        try:
+            with timing.span('tunnel'):
+                # The jump host resolves the name, it may only be known behind it
+                channel = connection.transport.open_channel(
+                    'direct-tcpip', (server.hostname, server.port), ('127.0.0.1', 0), timeout=self.timeout
+                )
+        except BaseException:
+            self._release(connection)
+            raise
+        return channel, connection
+
+    def _connect(self, server: ServerEntry, sock=None) -> paramiko.SSHClient:
+        """Open an authenticated connection, unknown host keys are rejected."""
+        sock = sock or self._open_socket(server)
+        # known_hosts is read once by the shared policy, paramiko would
+        # parse the whole file again for every client
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(self.host_key_policy)
+        try:
+            with timing.span('handshake'):
+                client.connect(
+                    server.hostname,
+                    port=server.port,
+                    username=server.username,
+                    password=server.password or None,
+                    sock=sock,
+                    timeout=self.timeout,
+                    banner_timeout=self.timeout,
+                    auth_timeout=self.timeout
+                )
+        except BaseException:
+            client.close()
+            sock.close()
+            raise
+        if self.keepalive:
+            client.get_transport().set_keepalive(self.keepalive)
+        return client
+
+    def _acquire(self, server: ServerEntry) -> Tuple[_PooledConnection, bool]:
+        """Get a healthy connection to a server and whether it was just opened."""
+        key = self.key(server)
+        with self._lock:
+            # Connecting to the same server from several threads opens one connection
+            key_lock = self._connecting.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                self._evict_idle()
+                connection = self._connections.get(key)
+                if connection is not None and not connection.healthy():
+                    del self._connections[key]
+                    self._close(connection)
+                    connection = None
+                if connection is not None:
+                    self._connections.move_to_end(key)
+                    connection.in_use += 1
+                    return connection, False
+
+            via = None
+            if server.jump:
+                sock, via = self._open_tunnel(server)
+                try:
+                    client = self._connect(server, sock)
+                except BaseException:
+                    self._release(via)
+                    raise
+            else:
+                client = self._connect(server)
+            connection = _PooledConnection(client, via)
+            connection.in_use += 1
+            with self._lock:
+                self._connections[key] = connection
+                self._evict_lru()
+            return connection, True
+
+    def _release(self, connection: _PooledConnection) -> None:
+        """Mark a session on the connection as finished."""
+        with self._lock:
+            connection.in_use -= 1
+            connection.last_used = time.monotonic()
+            if connection.retired and not connection.in_use:
+                self._close(connection)
+            self._evict_lru()
+
+    def _close(self, connection: _PooledConnection) -> None:
+        """Close a connection and release the jump host it was tunnelled through."""
+        connection.client.close()
+        if connection.via is not None:
+            via, connection.via = connection.via, None
+            self._release(via)
+
+    def _evict_idle(self) -> None:
+        """Close connections unused for longer than the idle timeout."""
+        deadline = time.monotonic() - self.idle_timeout
+        for key, connection in list(self._connections.items()):
+            if not connection.in_use and connection.last_used < deadline and self._connections.get(key) is connection:
+                del self._connections[key]
+                self._close(connection)
+
+    def _evict_lru(self) -> None:
+        """Close the least recently used idle connections above the limit, jump hosts aside."""
+        excess = len(self._connections) - self.max_connections
+        excess -= sum(1 for connection in self._connections.values() if connection.jump)
+        for key, connection in list(self._connections.items()):
+            if excess <= 0:
+                break
+            if not connection.in_use and not connection.jump and self._connections.get(key) is connection:
+                del self._connections[key]
+                self._close(connection)
+                excess -= 1
+
+    def open_session(self, server: ServerEntry) -> Tuple[_PooledConnection, paramiko.Channel]:
+        """Open a channel on a pooled connection, reconnecting once if the pooled one died."""
+        connection, created = self._acquire(server)
+        try:
+            return connection, connection.transport.open_session(timeout=self.timeout)
+        except (paramiko.SSHException, EOFError, OSError):
+            self._release(connection)
+            self._discard(self.key(server), connection)
+            if created:
+                raise
+        # The peer went away since the connection was last used
+        return self.open_session(server)
+
+    def connect(self, server: ServerEntry) -> None:
+        """Open the pooled connection to a server ahead of its first use."""
+        connection, _ = self._acquire(server)
+        self._release(connection)
+
+    @contextlib.contextmanager
+    def tunnel(self, server: ServerEntry) -> Iterator[paramiko.Channel]:
+        """Open a raw channel to the SSH port of a server through its jump host, closed when the block exits."""
+        channel, via = self._open_tunnel(server)
+        try:
+            yield channel
+        finally:
+            channel.close()
+            self._release(via)
+
+    @contextlib.contextmanager
+    def session(self, server: ServerEntry) -> Iterator[paramiko.Channel]:
+        """Open a channel to a server, closed again when the block exits."""
+        connection, channel = self.open_session(server)
+        try:
+            yield channel
+        finally:
+            channel.close()
+            self._release(connection)
+
+    def exec_command(self, server: ServerEntry, command: str) -> Tuple[int, bytes, bytes]:
+        """Run a command and return its exit status, stdout and stderr."""
+        stdout, stderr = [], []
+        with self.session(server) as channel:
+            channel.exec_command(command)
+            # Both streams are drained together so neither fills the channel window
+            while True:
+                if channel.recv_ready():
+                    stdout.append(channel.recv(READ_SIZE))
+                elif channel.recv_stderr_ready():
+                    stderr.append(channel.recv_stderr(READ_SIZE))
+                elif channel.exit_status_ready():
+                    break
+                else:
+                    select.select([channel], [], [], 0.5)
+            return channel.recv_exit_status(), b''.join(stdout), b''.join(stderr)
+
+    def discard(self, server: ServerEntry) -> None:
+        """Close and forget the connection to a server."""
+        key = self.key(server)
+        self._discard(key, self._connections.get(key))
+
+    def _discard(self, key: PoolKey, connection: Optional[_PooledConnection]) -> None:
+        """
+        Forget a connection unless it was already replaced, and close it.
+
+        A healthy connection still carrying sessions of other threads, e.g.
+        one refusing more channels than MaxSessions, is only closed once
+        those sessions end.
+        """
+        if connection is None:
+            return
+        with self._lock:
+            if self._connections.get(key) is connection:
+                del self._connections[key]
+            if connection.in_use and connection.healthy():
+                connection.retired = True
+            else:
+                self._close(connection)
+
+    def prune(self) -> None:
+        """Close idle and dead connections."""
+        with self._lock:
+            self._evict_idle()
+            for key, connection in list(self._connections.items()):
+                if not connection.in_use and not connection.healthy():
+                    del self._connections[key]
+                    self._close(connection)
+
+    def close(self) -> None:
+        """Close every connection."""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._connecting.clear()
+            # Tunnelled connections first, their jump hosts are closed after them
+            for connection in sorted(connections, key=lambda connection: connection.jump):
+                self._close(connection)
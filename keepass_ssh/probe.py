@@ -0,0 +1,183 @@
+"""Server reachability probe module."""
+import time
+import socket
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .server import ServerManager
+
+DEFAULT_CONCURRENCY = 500
+DEFAULT_TIMEOUT = 2.0
+# Threads probing through jump hosts, each channel is a round trip on a shared transport
+TUNNEL_WORKERS = 32
+
+# File descriptors kept free for the rest of the process
+RESERVED_FDS = 64
+
+class ProbeResult(NamedTuple):
+    """Outcome of probing a single host."""
+    status: str
+    latency: Optional[float] = None
+    banner: Optional[str] = None
+
+    @property
+    def reachable(self) -> bool:
+        """Whether the TCP connection succeeded."""
+        return self.latency is not None
+
+def max_concurrency(requested: int) -> int:
+    """Limit concurrency to the open file limit of the process."""
+    try:
+        import resource
+    except ImportError:
+        return requested
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft_limit == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft_limit - RESERVED_FDS))
+
+def _banner_result(line: bytes, latency: float) -> ProbeResult:
+    """Tell an SSH server from another service by the first line it sent."""
+    banner = line.decode('ascii', errors='replace').strip()
+    if banner.startswith('SSH-'):
+        return ProbeResult('up', latency, banner)
+    return ProbeResult('no-ssh', latency, banner or None)
+
+async def probe_host(hostname: str, port: int, timeout: float = DEFAULT_TIMEOUT) -> ProbeResult:
+    """Connect to a host and read its SSH banner within the timeout."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(hostname, port), timeout)
+    except asyncio.TimeoutError:
+        return ProbeResult('timeout')
+    except ConnectionRefusedError:
+        return ProbeResult('refused')
+    except socket.gaierror:
+        return ProbeResult('unresolved')
+    except OSError:
+        return ProbeResult('unreachable')
+    latency = loop.time() - start
+
+    try:
+        # Servers send their identification line first, RFC 4253 section 4.2
+        line = await asyncio.wait_for(reader.readline(), max(timeout - latency, 0.001))
+    except (asyncio.TimeoutError, OSError):
+        line = b''
+    finally:
+        writer.close()
+        with contextlib.suppress(OSError):
+            await writer.wait_closed()
+    return _banner_result(line, latency)
+
+async def probe_hosts(
+    targets: Iterable[Tuple[str, int]],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT
+) -> List[ProbeResult]:
+    """Probe hosts concurrently, at most concurrency at a time."""
+    semaphore = asyncio.Semaphore(max_concurrency(concurrency))
+
+    async def bounded(hostname: str, port: int) -> ProbeResult:
+        async with semaphore:
+            return await probe_host(hostname, port, timeout)
+
+    return await asyncio.gather(*(bounded(hostname, port) for hostname, port in targets))
+
+def probe_tunnelled(pool, server, timeout: float = DEFAULT_TIMEOUT) -> ProbeResult:
+    """Open a channel to a server through its jump host and read its SSH banner within the timeout."""
+    import paramiko
+
+    start = time.monotonic()
+    line = b''
+    try:
+        with pool.tunnel(server) as channel:
+            latency = time.monotonic() - start
+            channel.settimeout(max(timeout - latency, 0.001))
+            with contextlib.suppress(socket.timeout):
+                while b'\n' not in line and len(line) < 256:
+                    data = channel.recv(256)
+                    if not data:
+                        break
+                    line += data
+    except socket.timeout:
+        return ProbeResult('timeout')
+    except (paramiko.SSHException, EOFError, OSError):
+        # The jump host could not connect, it does not tell why
+        return ProbeResult('unreachable')
+    return _banner_result(line.split(b'\n', 1)[0], latency)
+
+def _probe_through_jumps(servers: List, timeout: float, pool=None) -> List[ProbeResult]:
+    """Probe servers behind jump hosts over pooled connections to the jump hosts."""
+    import paramiko
+    from .pool import SSHConnectionPool
+
+    own_pool = pool is None
+    pool = SSHConnectionPool(timeout=timeout) if own_pool else pool
+    try:
+        with ThreadPoolExecutor(max_workers=min(TUNNEL_WORKERS, len(servers))) as executor:
+            # Jump hosts are connected first, so latencies only cover the last hop
+            jumps = list({pool.key(jump): jump for jump in map(ServerManager.jump_server, servers)}.values())
+
+            def connect(jump) -> bool:
+                try:
+                    pool.connect(jump)
+                    return True
+                except (paramiko.SSHException, EOFError, OSError):
+                    return False
+
+            connected = {pool.key(jump) for jump, ok in zip(jumps, executor.map(connect, jumps)) if ok}
+            return list(executor.map(
+                lambda server: probe_tunnelled(pool, server, timeout)
+                if pool.key(ServerManager.jump_server(server)) in connected else ProbeResult('unreachable'),
+                servers
+            ))
+    finally:
+        if own_pool:
+            pool.close()
+
+def probe_servers(
+    servers: List,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    resolver=None,
+    pool=None
+) -> List[ProbeResult]:
+    """
+    Probe every server, hosts shared by several entries are probed once.
+
+    With a resolver all hostnames are resolved concurrently beforehand and
+    the first address of each host is probed. Servers behind jump hosts
+    are probed through a channel of a pooled connection to the jump host,
+    of the given pool or one opened for the probe.
+    """
+    def key(server) -> Tuple[str, int, str]:
+        return (server.hostname, server.port, server.jump or '')
+
+    targets = list(dict.fromkeys(key(server) for server in servers if not server.jump))
+    results: Dict[Tuple[str, int, str], ProbeResult] = {}
+    if resolver is not None:
+        addresses = resolver.resolve_all(hostname for hostname, _, _ in targets)
+        results = {target: ProbeResult('unresolved') for target in targets if not addresses.get(target[0])}
+        targets = [target for target in targets if target not in results]
+        probed = [(addresses[hostname][0], port) for hostname, port, _ in targets]
+    else:
+        probed = [(hostname, port) for hostname, port, _ in targets]
+    if probed:
+        results.update(zip(targets, asyncio.run(probe_hosts(probed, concurrency, timeout))))
+
+    tunnelled = list({key(server): server for server in servers if server.jump}.items())
+    if tunnelled:
+        probes = _probe_through_jumps([server for _, server in tunnelled], timeout, pool)
+        results.update(zip((target for target, _ in tunnelled), probes))
+    return [results[key(server)] for server in servers]
+
+def sort_by_latency(servers: List, probes: List[ProbeResult]) -> Tuple[List, List[ProbeResult]]:
+    """Order servers by latency, SSH servers first and unreachable servers last."""
+    order = sorted(
+        range(len(servers)),
+        key=lambda i: (probes[i].status != 'up', not probes[i].reachable, probes[i].latency or 0.0)
+    )
+    return [servers[i] for i in order], [probes[i] for i in order]
@@ -0,0 +1,201 @@
+"""Hostname resolution cache module."""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .index import default_cache_dir, write_private_file
+
+CACHE_VERSION = 1
+DEFAULT_TTL = 300.0
+DEFAULT_NEGATIVE_TTL = 60.0
+DEFAULT_WORKERS = 32
+
+# Errors meaning the name does not exist, other errors are not cached
+_NEGATIVE_ERRORS = {socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)}
+
+AddrInfo = Tuple[int, int, int, str, tuple]
+
+class Resolver:
+    """Resolve hostnames concurrently through a cache kept on disk.
+
+    The system resolver does not report record TTLs, so addresses are
+    kept for a fixed ttl and names that do not exist for negative_ttl.
+    Addresses are stored as text, IPv6 scope ids included, and turned
+    back into socket addresses without another lookup.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = DEFAULT_TTL,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+        workers: int = DEFAULT_WORKERS
+    ):
+        """Initialize resolver with the cache file in the cache directory by default."""
+        self.path = path or os.path.join(default_cache_dir(), 'dns.json')
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.workers = workers
+        self._entries: Optional[Dict[str, Tuple[float, Optional[List[str]]]]] = None
+        self._resolved: Dict[str, Tuple[float, Optional[List[str]]]] = {}
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _read(self) -> Dict[str, Tuple[float, Optional[List[str]]]]:
+        """Read the unexpired entries of the cache file."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != CACHE_VERSION:
+            return {}
+        now = time.time()
+        return {
+            hostname: (entry['expires'], entry['addresses'])
+            for hostname, entry in data.get('hosts', {}).items()
+            if entry['expires'] > now
+        }
+
+    def _cached(self, hostname: str) -> Optional[Tuple[float, Optional[List[str]]]]:
+        """Get the unexpired entry of a hostname."""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            entry = self._resolved.get(hostname) or self._entries.get(hostname)
+        if entry is not None and entry[0] > time.time():
+            return entry
+        return None
+
+    @staticmethod
+    def _numeric(hostname: str) -> bool:
+        """Check whether the hostname is an IP address."""
+        try:
+            socket.getaddrinfo(hostname, None, 0, socket.SOCK_STREAM, 0, socket.AI_NUMERICHOST)
+        except (socket.gaierror, UnicodeError):
+            return False
+        return True
+
+    def _lookup(self, hostname: str) -> Optional[List[str]]:
+        """Ask the system resolver, None when the name does not exist."""
+        try:
+            infos = socket.getaddrinfo(hostname, None, 0, socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if e.errno not in _NEGATIVE_ERRORS:
+                # Tried again by the next call
+                with self._lock:
+                    self._pending.pop(hostname, None)
+                raise
+            addresses = None
+        else:
+            addresses = []
+            for family, _, _, _, sockaddr in infos:
+                address = sockaddr[0]
+                if family == socket.AF_INET6 and sockaddr[3] and '%' not in address:
+                    address = f'{address}%{sockaddr[3]}'
+                if address not in addresses:
+                    addresses.append(address)
+
+        ttl = self.ttl if addresses is not None else self.negative_ttl
+        with self._lock:
+            self._resolved[hostname] = (time.time() + ttl, addresses)
+            self._pending.pop(hostname, None)
+        return addresses
+
+    def resolve(self, hostname: str) -> List[str]:
+        """
+        Get the addresses of a hostname, from the cache when fresh.
+
+        Raises socket.gaierror when the name does not exist, also when
+        that was cached, or when the lookup failed.
+        """
+        if self._numeric(hostname):
+            return [hostname]
+
+        entry = self._cached(hostname)
+        if entry is not None:
+            addresses = entry[1]
+        else:
+            with self._lock:
+                future = self._pending.get(hostname)
+            addresses = future.result() if future is not None else self._lookup(hostname)
+
+        if addresses is None:
+            raise socket.gaierror(socket.EAI_NONAME, f"Name or service not known: {hostname}")
+        return addresses
+
+    def _submit(self, hostnames: Iterable[str]) -> Dict[str, Future]:
+        """Start looking up the hostnames missing from the cache in worker threads."""
+        futures = {}
+        for hostname in dict.fromkeys(hostnames):
+            if not hostname or self._numeric(hostname) or self._cached(hostname) is not None:
+                continue
+            with self._lock:
+                future = self._pending.get(hostname)
+                if future is None:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='resolver')
+                    future = self._pending[hostname] = self._executor.submit(self._lookup, hostname)
+            futures[hostname] = future
+        return futures
+
+    def prefetch(self, hostnames: Iterable[str]) -> None:
+        """Look up hostnames in the background, later calls wait for their results."""
+        self._submit(hostnames)
+
+    def resolve_all(self, hostnames: Iterable[str]) -> Dict[str, Optional[List[str]]]:
+        """Resolve hostnames concurrently, None for those that cannot be resolved."""
+        hostnames = [hostname for hostname in dict.fromkeys(hostnames) if hostname]
+        futures = self._submit(hostnames)
+        results = {}
+        for hostname in hostnames:
+            try:
+                results[hostname] = futures[hostname].result() if hostname in futures else self.resolve(hostname)
+            except (socket.gaierror, UnicodeError) as e:
+                logging.info(f"Cannot resolve {hostname}: {e}")
+                results[hostname] = None
+        return results
+
+    def address(self, hostname: str) -> Optional[str]:
+        """Get the first address of a hostname, None when it cannot be resolved."""
+        try:
+            return self.resolve(hostname)[0]
+        except (socket.gaierror, UnicodeError, IndexError):
+            return None
+
+    def getaddrinfo(self, hostname: str, port: int) -> List[AddrInfo]:
+        """Resolve like socket.getaddrinfo for stream sockets, using the cache."""
+        infos = []
+        for address in self.resolve(hostname):
+            infos.extend(socket.getaddrinfo(address, port, 0, socket.SOCK_STREAM, 0, socket.AI_NUMERICHOST))
+        return infos
+
+    def save(self) -> None:
+        """Merge the lookups of this resolver into the cache file, dropping expired entries."""
+        with self._lock:
+            resolved = dict(self._resolved)
+        if not resolved:
+            return
+
+        entries = self._read()
+        entries.update(resolved)
+        write_private_file(self.path, json.dumps({
+            'version': CACHE_VERSION,
+            'hosts': {
+                hostname: {'expires': expires, 'addresses': addresses}
+                for hostname, (expires, addresses) in entries.items()
+            }
+        }).encode('utf-8'))
+
+    def close(self) -> None:
+        """Save the cache and stop the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.save()
@@ -0,0 +1,532 @@
+"""Server search module."""
+import re
+import heapq
+import struct
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+# Searched fields in priority order, a match in the title ranks highest
+FIELDS = ('title', 'hostname', 'username', 'tags', 'notes')
+FIELD_WEIGHTS = (1.0, 0.8, 0.6, 0.6, 0.4)
+
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+SUBSTRING_SCORE = 0.6
+TYPO_SCORE = 0.4
+
+# Rough cost of scoring one entry from the forward index, in postings
+FORWARD_COST = 16
+
+_TOKEN = re.compile(r'[^\W_]+')
+_SECTION = struct.Struct('<Q')
+
+class Matches(NamedTuple):
+    """Scores of the entries matching a query, keyed in index order."""
+    scores: Dict[Hashable, float]
+    # Some query term only matched with typos
+    typos: bool = False
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens."""
+    return _TOKEN.findall(text.lower())
+
+def trigrams(token: str) -> Set[str]:
+    """Get the trigrams of a token padded with one space on each side."""
+    padded = f' {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_typos(term: str) -> int:
+    """Number of typos tolerated in a query term."""
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+def _text(value) -> str:
+    """Convert a field value to searchable text."""
+    if isinstance(value, (list, tuple)):
+        return ' '.join(value)
+    return value if isinstance(value, str) else ''
+
+def _token_score(term: str, token: str) -> float:
+    """Score a token containing a query term as typed, 0 when it does not."""
+    if token == term:
+        return EXACT_SCORE
+    if token.startswith(term):
+        return PREFIX_SCORE
+    return SUBSTRING_SCORE if term in token else 0.0
+
+def rank(
+    scores: Dict[Hashable, float],
+    limit: Optional[int] = None,
+    tiebreak: Optional[Callable[[Hashable], float]] = None
+) -> List[Hashable]:
+    """Order matched keys best first.
+
+    Keys scoring the same are ordered by their tiebreak value, highest
+    first, then in the order of the scores.
+    """
+    if tiebreak is None:
+        order = lambda key: -scores[key]
+    else:
+        order = lambda key: (-scores[key], -tiebreak(key))
+    return sorted(scores, key=order) if limit is None else heapq.nsmallest(limit, scores, key=order)
+
+def _text_scorer(term: str) -> Callable[[str], float]:
+    """Get a function scoring lowercase text by its best token containing a term as typed."""
+    # Token boundaries as in tokenize, so whole and leading matches score like tokens
+    whole = re.compile(rf'(?<![^\W_]){re.escape(term)}(?![^\W_])')
+    leading = re.compile(rf'(?<![^\W_]){re.escape(term)}')
+
+    def score(text: str) -> float:
+        if term not in text:
+            return 0.0
+        if whole.search(text):
+            return EXACT_SCORE
+        return PREFIX_SCORE if leading.search(text) else SUBSTRING_SCORE
+    return score
+
+def scan(rows: Iterable[Tuple], query: str) -> Matches:
+    """Score rows of field values in FIELDS order without an index, keyed by position.
+
+    Scores are those of SearchIndex.match, except that terms are only
+    matched as typed, typo tolerance needs the trigram index.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return Matches({doc: 0.0 for doc, _ in enumerate(rows)})
+
+    scorers = [_text_scorer(term) for term in terms]
+    scores = {}
+    for doc, (title, hostname, username, tags, notes) in enumerate(rows):
+        haystack = '\0'.join((title or '', hostname or '', username or '', ' '.join(tags or ()), notes or '')).lower()
+        texts = None
+        total = 0.0
+        for term, score in zip(terms, scorers):
+            if term not in haystack:
+                break
+            if texts is None:
+                texts = haystack.split('\0')
+            total += max(score(text) * weight for text, weight in zip(texts, FIELD_WEIGHTS))
+        else:
+            scores[doc] = total
+    return Matches(scores)
+
+class _PackedLists:
+    """Integer lists stored in one array, each unpacked on first access.
+
+    Supports the list operations the index uses on its postings and
+    forward index, so a loaded index only builds the lists a query or
+    an update touches.
+    """
+
+    def __init__(self, values: array, offsets: array, unpack: Callable[[List[int]], list] = list):
+        """Initialize lists from their concatenated values and start offsets."""
+        self._values = values
+        self._offsets = offsets
+        self._unpack = unpack
+        self._packed = len(offsets) - 1
+        self._lists: Dict[int, list] = {}
+        self._appended: list = []
+
+    def __len__(self) -> int:
+        return self._packed + len(self._appended)
+
+    def __getitem__(self, i: int) -> list:
+        if i >= self._packed:
+            return self._appended[i - self._packed]
+        unpacked = self._lists.get(i)
+        if unpacked is None:
+            unpacked = self._lists[i] = self._unpack(self._values[self._offsets[i]:self._offsets[i + 1]].tolist())
+        return unpacked
+
+    def __setitem__(self, i: int, value: list) -> None:
+        if i >= self._packed:
+            self._appended[i - self._packed] = value
+        else:
+            self._lists[i] = value
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def append(self, value: list) -> None:
+        self._appended.append(value)
+
+class _PackedMap:
+    """Mapping of sorted names to packed lists, names are found by bisection."""
+
+    def __init__(self, names: List[str], lists: _PackedLists):
+        """Initialize mapping from sorted names and their lists."""
+        self._names = names
+        self._lists = lists
+        self._added: Dict[str, list] = {}
+
+    def get(self, name: str, default=None):
+        i = bisect_left(self._names, name)
+        if i < len(self._names) and self._names[i] == name:
+            return self._lists[i]
+        return self._added.get(name, default)
+
+    def setdefault(self, name: str, default: list) -> list:
+        value = self.get(name)
+        if value is None:
+            value = self._added[name] = default
+        return value
+
+    def __iter__(self):
+        yield from self._names
+        yield from self._added
+
+def _unpack_postings(values: List[int]) -> List[Tuple[int, List[int]]]:
+    """Unpack postings stored as field, count and entries of every field."""
+    postings = []
+    i = 0
+    while i < len(values):
+        field, count = values[i], values[i + 1]
+        postings.append((field, values[i + 2:i + 2 + count]))
+        i += 2 + count
+    return postings
+
+def _pack(lists: Iterable[Iterable[int]]) -> Tuple[array, array]:
+    """Concatenate integer lists into one array with their start offsets."""
+    values, offsets = array('I'), array('I', [0])
+    for values_of in lists:
+        values.extend(values_of)
+        offsets.append(len(values))
+    return values, offsets
+
+def _pack_strings(strings: Iterable[str]) -> bytes:
+    """Encode strings each terminated by a NUL character."""
+    return ''.join(string + '\0' for string in strings).encode('utf-8')
+
+def _unpack_strings(data: bytes) -> List[str]:
+    """Decode strings encoded with _pack_strings."""
+    return data.decode('utf-8').split('\0')[:-1]
+
+class SearchIndex:
+    """Token and trigram index over server fields with ranked fuzzy search.
+
+    Postings hold, for each token, the entries containing it grouped by
+    field, so a query is scored with set operations per score tier. The
+    forward index holds ``token << 3 | field`` codes of each entry, used
+    once few entries are left to check. Removed entries keep their
+    position with a None key, so positions of other entries stay valid.
+    Saved indexes are packed into arrays and only unpacked where a query
+    looks.
+    """
+
+    def __init__(
+        self,
+        keys: Sequence[Hashable],
+        titles: Sequence[str],
+        tokens: List[str],
+        postings: Sequence[List[Tuple[int, List[int]]]],
+        forward: Sequence[List[int]],
+        trigram_map: Dict[str, List[int]]
+    ):
+        """Initialize index from its token postings."""
+        self.keys = list(keys)
+        self.titles = list(titles)
+        self.tokens = tokens
+        self.postings = postings
+        self.forward = forward
+        self.trigram_map = trigram_map
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple], keys: Optional[Sequence[Hashable]] = None) -> 'SearchIndex':
+        """Build an index from rows of field values in FIELDS order."""
+        token_ids: Dict[str, int] = {}
+        tokens: List[str] = []
+        fields: List[Dict[int, List[int]]] = []
+        forward: List[List[int]] = []
+        titles = []
+
+        for doc, row in enumerate(rows):
+            titles.append(_text(row[0]).lower())
+            codes = []
+            forward.append(codes)
+            for field, value in enumerate(row):
+                for token in set(tokenize(_text(value))):
+                    token_id = token_ids.get(token)
+                    if token_id is None:
+                        token_id = token_ids[token] = len(tokens)
+                        tokens.append(token)
+                        fields.append({})
+                    fields[token_id].setdefault(field, []).append(doc)
+                    codes.append(token_id << 3 | field)
+        postings = [list(docs.items()) for docs in fields]
+
+        trigram_map: Dict[str, List[int]] = {}
+        for token_id, token in enumerate(tokens):
+            for trigram in trigrams(token):
+                trigram_map.setdefault(trigram, []).append(token_id)
+
+        keys = range(len(titles)) if keys is None else keys
+        return cls(keys, titles, tokens, postings, forward, trigram_map)
+
+    @staticmethod
+    def server_row(server) -> Tuple:
+        """Get the searched field values of a server entry."""
+        return (server.title, server.hostname, server.username, server.tags, server.description)
+
+    @classmethod
+    def from_servers(cls, servers: Sequence) -> 'SearchIndex':
+        """Build an index over server entries keyed by list position."""
+        return cls.build(map(cls.server_row, servers))
+
+    @staticmethod
+    def record_row(record) -> Tuple:
+        """Get the searched field values of an entry record."""
+        return (record.title, (record.url or '').split(':')[0], record.username, record.tags, record.notes)
+
+    @classmethod
+    def from_records(cls, records: Sequence) -> 'SearchIndex':
+        """Build an index over entry records keyed by UUID."""
+        return cls.build([cls.record_row(r) for r in records], [r.uuid for r in records])
+
+    @property
+    def removed(self) -> int:
+        """Number of positions left empty by removed entries."""
+        return self.keys.count(None)
+
+    def add(self, rows: Iterable[Tuple], keys: Iterable[Hashable]) -> None:
+        """Append entries given as rows of field values in FIELDS order."""
+        token_ids = {token: token_id for token_id, token in enumerate(self.tokens)}
+        for key, row in zip(keys, rows):
+            doc = len(self.keys)
+            title = _text(row[0]).lower()
+            self.keys.append(key)
+            self.titles.append(title)
+            codes = []
+            self.forward.append(codes)
+            for field, value in enumerate(row):
+                for token in set(tokenize(_text(value))):
+                    token_id = token_ids.get(token)
+                    if token_id is None:
+                        token_id = token_ids[token] = len(self.tokens)
+                        self.tokens.append(token)
+                        self.postings.append([])
+                        for trigram in trigrams(token):
+                            self.trigram_map.setdefault(trigram, []).append(token_id)
+                    for posting_field, docs in self.postings[token_id]:
+                        if posting_field == field:
+                            docs.append(doc)
+                            break
+                    else:
+                        self.postings[token_id].append((field, [doc]))
+                    codes.append(token_id << 3 | field)
+
+    def add_records(self, records: Sequence) -> None:
+        """Append entry records keyed by UUID."""
+        self.add([self.record_row(r) for r in records], [r.uuid for r in records])
+
+    def remove(self, keys: Iterable[Hashable]) -> None:
+        """Remove entries by key from the postings, unknown keys are ignored."""
+        docs_by_key = {key: doc for doc, key in enumerate(self.keys) if key is not None}
+        for key in keys:
+            doc = docs_by_key.pop(key, None)
+            if doc is None:
+                continue
+            for code in self.forward[doc]:
+                postings = self.postings[code >> 3]
+                for i, (field, docs) in enumerate(postings):
+                    if field == code & 7:
+                        docs.remove(doc)
+                        if not docs:
+                            del postings[i]
+                        break
+            self.keys[doc] = None
+            self.forward[doc] = []
+
+    def to_bytes(self) -> bytes:
+        """Serialize the index, its keys must be strings."""
+        trigram_names = sorted(self.trigram_map)
+        sections = [
+            _pack_strings('' if key is None else key for key in self.keys),
+            _pack_strings(self.titles),
+            _pack_strings(self.tokens),
+            _pack_strings(trigram_names)
+        ]
+        packed = [
+            [value for field, docs in postings for value in (field, len(docs), *docs)]
+            for postings in self.postings
+        ]
+        for lists in (packed, self.forward, [self.trigram_map.get(name) for name in trigram_names]):
+            for values in _pack(lists):
+                sections.append(values.tobytes())
+        return b''.join(_SECTION.pack(len(section)) + section for section in sections)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'SearchIndex':
+        """Load an index serialized with to_bytes, without unpacking its lists."""
+        view = memoryview(data)
+        sections = []
+        offset = 0
+        while offset < len(view):
+            size, = _SECTION.unpack_from(view, offset)
+            offset += _SECTION.size
+            if offset + size > len(view):
+                raise ValueError("Truncated search index")
+            sections.append(view[offset:offset + size])
+            offset += size
+
+        keys, titles, tokens, trigram_names = (_unpack_strings(bytes(section)) for section in sections[:4])
+        arrays = []
+        for section in sections[4:]:
+            values = array('I')
+            values.frombytes(section)
+            arrays.append(values)
+        postings = _PackedLists(arrays[0], arrays[1], _unpack_postings)
+        forward = _PackedLists(arrays[2], arrays[3])
+        trigram_map = _PackedMap(trigram_names, _PackedLists(arrays[4], arrays[5]))
+        return cls([key or None for key in keys], titles, tokens, postings, forward, trigram_map)
+
+    def exact(self, title: str) -> List[Hashable]:
+        """Get keys of entries whose title equals the query, ignoring case."""
+        title = title.lower()
+        keys = []
+        doc = -1
+        while True:
+            try:
+                doc = self.titles.index(title, doc + 1)
+            except ValueError:
+                return keys
+            if self.keys[doc] is not None:
+                keys.append(self.keys[doc])
+
+    def _candidates(self, term: str) -> Set[int]:
+        """Get tokens containing all inner trigrams of the term."""
+        inner = [self.trigram_map.get(term[i:i + 3], ()) for i in range(len(term) - 2)]
+        inner.sort(key=len)
+        return set(inner[0]).intersection(*inner[1:])
+
+    def _match_tokens(self, term: str) -> Tuple[Dict[int, float], bool]:
+        """Score the tokens matching a query term, with typos if none match as typed."""
+        if len(term) < 3:
+            candidates = (i for i, token in enumerate(self.tokens) if term in token)
+        else:
+            candidates = (i for i in self._candidates(term) if term in self.tokens[i])
+        matches = {token_id: _token_score(term, self.tokens[token_id]) for token_id in candidates}
+
+        limit = max_typos(term)
+        if matches or not limit:
+            return matches, False
+
+        # A typo changes at most three padded trigrams
+        term_trigrams = trigrams(term)
+        shared: Dict[int, int] = {}
+        for trigram in term_trigrams:
+            for token_id in self.trigram_map.get(trigram, ()):
+                shared[token_id] = shared.get(token_id, 0) + 1
+
+        required = len(term_trigrams) - 3 * limit
+        for token_id, count in shared.items():
+            if count < required:
+                continue
+            distance = edit_distance(term, self.tokens[token_id], limit)
+            if distance <= limit:
+                matches[token_id] = TYPO_SCORE / distance
+        return matches, True
+
+    def _score_docs(self, tokens: Dict[int, float], docs: Iterable[int]) -> Dict[int, float]:
+        """Score the given entries by their best matching token and field."""
+        scores = {}
+        for doc in docs:
+            best = 0.0
+            for code in self.forward[doc]:
+                token_score = tokens.get(code >> 3)
+                if token_score:
+                    best = max(best, token_score * FIELD_WEIGHTS[code & 7])
+            if best:
+                scores[doc] = best
+        return scores
+
+    def _score_term(self, tokens: Dict[int, float], within: Optional[Set[int]] = None) -> Dict[int, float]:
+        """Score entries by their best matching token and field."""
+        tiers: Dict[float, List[List[int]]] = {}
+        for token_id, token_score in tokens.items():
+            for field, docs in self.postings[token_id]:
+                tiers.setdefault(token_score * FIELD_WEIGHTS[field], []).append(docs)
+
+        scores: Dict[int, float] = {}
+        for score in sorted(tiers, reverse=True):
+            if within is None:
+                docs = set().union(*tiers[score])
+            else:
+                docs = set()
+                for tier_docs in tiers[score]:
+                    docs.update(within.intersection(tier_docs))
+            docs.difference_update(scores)
+            scores.update(dict.fromkeys(docs, score))
+        return scores
+
+    def _postings_size(self, tokens: Dict[int, float]) -> int:
+        """Count the postings of matched tokens."""
+        return sum(len(docs) for token_id in tokens for _, docs in self.postings[token_id])
+
+    def _search(self, terms: List[str]) -> Tuple[Dict[int, float], bool]:
+        """Score entries matching all terms, and whether a term needed typos."""
+        matches = []
+        typos = False
+        for term in terms:
+            tokens, typo = self._match_tokens(term)
+            if not tokens:
+                return {}, typo
+            matches.append(tokens)
+            typos = typos or typo
+
+        # Score the rarest term first, the others only for its entries
+        sizes = {id(tokens): self._postings_size(tokens) for tokens in matches}
+        matches.sort(key=lambda tokens: sizes[id(tokens)])
+        totals = self._score_term(matches[0])
+        for tokens in matches[1:]:
+            if len(totals) * FORWARD_COST < sizes[id(tokens)]:
+                scores = self._score_docs(tokens, totals)
+            else:
+                scores = self._score_term(tokens, set(totals))
+            totals = {doc: totals[doc] + score for doc, score in scores.items()}
+            if not totals:
+                break
+        return totals, typos
+
+    def match(self, query: str) -> Matches:
+        """Score the entries matching every query term, keyed in index order.
+
+        Terms matching no indexed token as typed are matched with typos.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return Matches(dict.fromkeys((key for key in self.keys if key is not None), 0.0))
+
+        scores, typos = self._search(terms)
+        return Matches({self.keys[doc]: scores[doc] for doc in sorted(scores)}, typos)
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        tiebreak: Optional[Callable[[Hashable], float]] = None
+    ) -> List[Hashable]:
+        """Get keys of entries matching every query term, best match first.
+
+        Entries scoring the same are ordered by the tiebreak value of their
+        key, highest first, then in index order.
+        """
+        return rank(self.match(query).scores, limit, tiebreak)
@@ -1,18 +1,110 @@
 """Server management module."""
-from typing import Dict, List, Optional
-from dataclasses import dataclass
-from colorama import Fore, Style
+import os
+import re
+import sys
+import uuid
+import base64
+from typing import Dict, Iterable, List, Optional, TextIO
+
+from . import timing
+from .database import JUMP_FIELD
+
+# Entry string keys read by the bulk constructor, the password is left in the entry
+STRING_FIELDS = {'Title': 'title', 'UserName': 'username', 'URL': 'url', 'Notes': 'notes', JUMP_FIELD: 'jump'}
+
+# Color codes, not counted in the width of a line
+_ANSI = re.compile(r'\x1b\[[0-9;]*m')
 
-@dataclass
 class ServerEntry:
-    """Server entry data."""
-    title: str
-    username: str
-    password: str
-    url: str
-    hostname: str
-    port: int
-    description: str
+    """Server entry data, resolved lazily from a KeePass entry.
+
+    Entries listed without their password, e.g. from the metadata index,
+    have needs_password set until it is read from the database.
+    """
+
+    FIELDS = ('title', 'username', 'password', 'url', 'hostname', 'port', 'description', 'uuid', 'tags', 'jump')
+    __slots__ = FIELDS + ('database', 'needs_password', '_source', '_strings')
+
+    def __init__(
+        self,
+        title: str,
+        username: str,
+        password: str,
+        url: str,
+        hostname: str,
+        port: int,
+        description: str,
+        uuid: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        database: Optional[str] = None,
+        jump: Optional[str] = None
+    ):
+        """Initialize server entry with resolved fields, database being the path of its source and jump its jump hosts."""
+        self.title = title
+        self.username = username
+        self.password = password
+        self.url = url
+        self.hostname = hostname
+        self.port = port
+        self.description = description
+        self.uuid = uuid
+        self.tags = tags
+        self.jump = jump
+        self.database = database
+        self.needs_password = False
+        self._source = None
+        self._strings = None
+
+    @classmethod
+    def lazy(cls, source, strings: Optional[Dict[str, str]] = None) -> 'ServerEntry':
+        """Create a view resolving fields from a KeePass entry on first access."""
+        server = cls.__new__(cls)
+        server.database = None
+        server.needs_password = False
+        server._source = source
+        server._strings = strings
+        return server
+
+    def _field(self, name: str):
+        """Read a raw field from the pre-read strings or the source entry."""
+        if self._strings is not None:
+            return self._strings.get(name)
+        return getattr(self._source, name)
+
+    def __getattr__(self, name: str):
+        """Resolve an unset field from the source entry and keep it."""
+        if name not in self.FIELDS:
+            raise AttributeError(name)
+
+        if name in ('hostname', 'port'):
+            self.hostname, self.port = ServerManager.parse_server_url(self.url)
+            return getattr(self, name)
+
+        if name == 'description':
+            value = self._field('notes')
+        elif name == 'uuid':
+            value = self._field('uuid')
+            value = None if value is None else str(value)
+        elif name == 'password':
+            # Only read from the entry for the selected server, never copied in bulk
+            return self._source.password
+        elif name == 'jump' and self._strings is None and hasattr(self._source, 'get_custom_property'):
+            value = self._source.get_custom_property(JUMP_FIELD)
+        else:
+            value = self._field(name)
+        setattr(self, name, value)
+        return value
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS if name != 'password')
+        return f"{self.__class__.__name__}({fields})"
 
 class ServerManager:
     """Server entry manager."""
@@ -27,35 +119,139 @@ def parse_server_url(url: str) -> tuple[str, int]:
             return hostname, int(port)
         return url, ServerManager.DEFAULT_PORT
     
+    @staticmethod
+    def jump_server(server: ServerEntry) -> Optional[ServerEntry]:
+        """
+        Get the jump host a server is reached through, None for direct servers.
+
+        Jump hosts are given as ``[user@]host[:port]``, several separated
+        by commas in the order they are passed, so the last one connects
+        to the server and is itself reached through the others. Without a
+        user the local user name is used, as by ssh.
+        """
+        hops = [hop.strip() for hop in (server.jump or '').split(',') if hop.strip()]
+        if not hops:
+            return None
+        destination = hops[-1]
+        if destination.startswith('ssh://'):
+            destination = destination[len('ssh://'):]
+        username, _, address = destination.rpartition('@')
+        hostname, port = ServerManager.parse_server_url(address)
+        return ServerEntry(
+            title=address, username=username or None, password=None, url=address,
+            hostname=hostname, port=port, description='', jump=','.join(hops[:-1]) or None
+        )
+    
     @classmethod
     def from_keepass_entry(cls, entry) -> ServerEntry:
         """Create ServerEntry from KeePass entry."""
-        hostname, port = cls.parse_server_url(entry.url)
-        return ServerEntry(
-            title=entry.title,
-            username=entry.username,
-            password=entry.password,
-            url=entry.url,
-            hostname=hostname,
-            port=port,
-            description=entry.notes
-        )
+        return ServerEntry.lazy(entry)
+    
+    @classmethod
+    def from_keepass_entries(cls, entries: Iterable) -> List[ServerEntry]:
+        """Create ServerEntries from many KeePass entries in one pass over their XML."""
+        with timing.span('servers'):
+            return cls._from_keepass_entries(entries)
+    
+    @classmethod
+    def _from_keepass_entries(cls, entries: Iterable) -> List[ServerEntry]:
+        """Create ServerEntries, reading the strings of XML backed entries at once."""
+        # Entries can only be backed by XML once pykeepass has loaded lxml
+        etree = sys.modules.get('lxml.etree')
+        
+        servers = []
+        for entry in entries:
+            element = getattr(entry, '_element', None)
+            if etree is None or not isinstance(element, etree._Element):
+                servers.append(cls.from_keepass_entry(entry))
+                continue
+            
+            # One walk over the children instead of an XPath query per field
+            strings = {'tags': []}
+            for child in element.iterchildren('UUID', 'Tags', 'String'):
+                if child.tag == 'UUID':
+                    strings['uuid'] = uuid.UUID(bytes=base64.b64decode(child.text))
+                elif child.tag == 'Tags':
+                    strings['tags'] = child.text.replace(',', ';').split(';') if child.text else []
+                elif len(child) == 2:
+                    # KeePass writes Key before Value
+                    name = STRING_FIELDS.get(child[0].text)
+                    if name:
+                        strings[name] = child[1].text
+            servers.append(ServerEntry.lazy(entry, strings))
+        return servers
     
     @staticmethod
-    def list_servers(servers: List[ServerEntry]) -> None:
-        """Display server list in a compact, one-line format."""
-        for i, server in enumerate(servers, 1):
+    def format_probe(probe) -> str:
+        """Format a probe result with its latency."""
+        from colorama import Fore, Style
+        
+        if probe.status == 'up':
+            return f"{Fore.GREEN}up {probe.latency * 1000:.0f} ms{Style.RESET_ALL}"
+        if probe.reachable:
+            return f"{Fore.YELLOW}{probe.status} {probe.latency * 1000:.0f} ms{Style.RESET_ALL}"
+        return f"{Fore.RED}{probe.status}{Style.RESET_ALL}"
+    
+    @staticmethod
+    def terminal_size(stream: Optional[TextIO] = None) -> Optional[os.terminal_size]:
+        """Get the size of the terminal a stream writes to, None when it is not a terminal."""
+        stream = stream or sys.stdout
+        try:
+            return os.get_terminal_size(stream.fileno()) if stream.isatty() else None
+        except (AttributeError, ValueError, OSError):
+            return None
+    
+    @staticmethod
+    def format_servers(
+        servers: List[ServerEntry],
+        probes: Optional[List] = None,
+        width: Optional[int] = None,
+        start: int = 1
+    ) -> List[str]:
+        """Format servers as numbered lines, descriptions cut to the width when given."""
+        from colorama import Fore, Style
+        
+        green, blue, cyan, yellow, reset = Fore.GREEN, Fore.BLUE, Fore.CYAN, Fore.YELLOW, Style.RESET_ALL
+        lines = []
+        for i, server in enumerate(servers, start):
             # Construct a single line with key server details
-            server_info = (
-                f"{i}. {Fore.GREEN}{server.title}{Style.RESET_ALL} | "
-                f"{Fore.BLUE}{server.username}@{server.hostname}:{server.port}{Style.RESET_ALL}"
-            )
+            line = f"{i}. {green}{server.title}{reset} | {blue}{server.username}@{server.hostname}:{server.port}{reset}"
             
-            # Add description if available
-            if server.description:
-                server_info += f" | {Fore.YELLOW}{server.description}{Style.RESET_ALL}"
+            # Add reachability if the servers were probed
+            if probes:
+                line += f" | {ServerManager.format_probe(probes[i - start])}"
             
-            print(server_info)
+            # Add the source database when several databases are merged
+            if server.database:
+                line += f" | {cyan}{os.path.splitext(os.path.basename(server.database))[0]}{reset}"
+            
+            # Add description if available, on a terminal only what fits on the line
+            description = server.description
+            if description and width:
+                room = width - len(_ANSI.sub('', line)) - 3
+                description = next((text for text in description.splitlines() if text.strip()), '')
+                if len(description) > room:
+                    description = description[:room - 1] + '…' if room > 1 else ''
+            if description:
+                line += f" | {yellow}{description}{reset}"
+            
+            lines.append(line)
+        return lines
+    
+    @staticmethod
+    def list_servers(
+        servers: List[ServerEntry],
+        probes: Optional[List] = None,
+        start: int = 1,
+        stream: Optional[TextIO] = None
+    ) -> None:
+        """Display server list in a compact, one-line format, written at once."""
+        stream = stream or sys.stdout
+        size = ServerManager.terminal_size(stream)
+        with timing.span('render'):
+            lines = ServerManager.format_servers(servers, probes, size.columns if size else None, start)
+            if lines:
+                print('\n'.join(lines), file=stream)
     
     @staticmethod
     def select_server(servers: List[ServerEntry], selection: str) -> Optional[ServerEntry]:
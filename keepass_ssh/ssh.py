@@ -1,21 +1,61 @@
 """SSH connection module."""
 import os
+import shlex
+import contextlib
+import socket
 import subprocess
-from .server import ServerEntry
+from typing import List, Optional
+from . import timing
+from .server import ServerEntry, ServerManager
+from .multiplex import ControlMasters
+from .complete import default_cache_dir
+
+def managed_known_hosts() -> str:
+    """Return the known_hosts file written by key scans."""
+    return os.path.join(default_cache_dir(), 'known_hosts')
+
+def proxy_command(jump: ServerEntry) -> str:
+    """Build a ProxyCommand tunnelling through a jump host that never prompts."""
+    command = 'ssh -o BatchMode=yes'
+    outer = ServerManager.jump_server(jump)
+    if outer is not None:
+        # Expanded by this hop's ssh first, so its own tokens are escaped
+        command += ' -o ' + shlex.quote('ProxyCommand=' + proxy_command(outer).replace('%', '%%'))
+    destination = f'{jump.username}@{jump.hostname}' if jump.username else jump.hostname
+    return f'{command} -p {jump.port} -W %h:%p {shlex.quote(destination)}'
+
+def jump_options(server: ServerEntry, batch: bool = False) -> List[str]:
+    """Get the ssh options reaching a server through its jump hosts, in batch mode they never prompt."""
+    if not server.jump:
+        return []
+    if batch:
+        return ['-o', 'ProxyCommand=' + proxy_command(ServerManager.jump_server(server))]
+    return ['-J', server.jump]
 
 class SSHConnector:
     """SSH connection handler."""
     
     @staticmethod
-    def connect(server: ServerEntry) -> None:
+    def connect(
+        server: ServerEntry,
+        masters: Optional[ControlMasters] = None,
+        address: Optional[str] = None,
+        known_hosts: Optional[str] = None
+    ) -> None:
         """
         Connect to server using SSH with platform-specific command.
         
         :param server: Server entry with connection details
+        :param masters: Control masters to reuse connections with, ignored by Plink
+        :param address: Resolved address of the host, ignored by Plink
+        :param known_hosts: known_hosts file read before the user's own, ignored by Plink
+        :raises SSHConnectionError: When the server has a jump host and Plink is used
         """
         # Prepare SSH command based on operating system
         if os.name == 'nt':  # Windows
             # Use Plink (PuTTY's command-line SSH client)
+            if server.jump:
+                raise SSHConnectionError(f"Jump hosts are not supported by Plink: {server.jump}")
             ssh_command = f'plink -ssh -P {server.port} {server.username}@{server.hostname}'
             
             # Add password if available
@@ -25,13 +65,44 @@ def connect(server: ServerEntry) -> None:
             # Use standard SSH command
             ssh_command = f'ssh -p {server.port} {server.username}@{server.hostname}'
             
+            # Reuse or open a persistent master connection
+            if masters is not None:
+                masters.register(server)
+                options = ' '.join(shlex.quote(option) for option in masters.options(server))
+                ssh_command = f'ssh {options} -p {server.port} {server.username}@{server.hostname}'
+            
+            # Connect to the resolved address, known_hosts still matches the hostname
+            if address:
+                alias = server.hostname if server.port == 22 else f'[{server.hostname}]:{server.port}'
+                options = f'-o HostName={shlex.quote(address)} -o HostKeyAlias={shlex.quote(alias)}'
+                ssh_command = ssh_command.replace('ssh ', f'ssh {options} ', 1)
+            
+            # Keys of scanned hosts are trusted next to those of the user
+            if known_hosts:
+                files = f'{known_hosts} ~/.ssh/known_hosts ~/.ssh/known_hosts2'
+                option = shlex.quote(f'UserKnownHostsFile={files}')
+                ssh_command = ssh_command.replace('ssh ', f'ssh -o {option} ', 1)
+            
+            # Tunnel through the jump hosts, which authenticate with keys or the agent.
+            # sshpass answers the first password prompt, so with a password the
+            # jump hosts run in batch mode and cannot be sent the target's password
+            if server.jump:
+                options = ' '.join(shlex.quote(option) for option in jump_options(server, batch=bool(server.password)))
+                ssh_command = ssh_command.replace('ssh ', f'ssh {options} ', 1)
+            
             # Add sshpass for password if available
             if server.password:
                 ssh_command = f'sshpass -p "{server.password}" {ssh_command}'
         
+        # The client resolves the host itself, look it up beforehand to time DNS
+        if timing.active() is not None and not address and not server.jump:
+            with timing.span('dns'), contextlib.suppress(OSError):
+                socket.getaddrinfo(server.hostname, server.port, 0, socket.SOCK_STREAM)
+        
         try:
             # Run the SSH connection
-            subprocess.run(ssh_command, shell=True, check=True)
+            with timing.span('session'):
+                subprocess.run(ssh_command, shell=True, check=True)
         
         except subprocess.CalledProcessError as e:
             raise SSHConnectionError(f"Failed to connect to {server.hostname}: {e}")
@@ -0,0 +1,79 @@
+"""OpenSSH client configuration export module."""
+import os
+import re
+import hashlib
+from typing import Iterable, List, Optional
+
+from .index import content_hash
+from .server import ServerEntry
+
+CONFIG_VERSION = 1
+HEADER = '# Generated by keepass-ssh-connect, changes are overwritten'
+STAMP_PREFIX = '# Source: '
+
+# Characters with a meaning in Host patterns or the config syntax
+_ALIAS_UNSAFE = re.compile(r'[\s*?!,#"\'=]+')
+
+def default_config_path() -> str:
+    """Return the generated file meant to be included from ~/.ssh/config."""
+    return os.path.join(os.path.expanduser('~'), '.ssh', 'keepass-ssh.conf')
+
+def host_alias(title: str) -> str:
+    """Turn an entry title into a name usable as ssh destination."""
+    return _ALIAS_UNSAFE.sub('-', title.strip()).strip('-').lower()
+
+def _quote(value: str) -> str:
+    """Quote a config value containing spaces."""
+    return f'"{value}"' if any(char.isspace() for char in value) else value
+
+def config_stamp(db_paths: Iterable[str], *options) -> str:
+    """Digest the database contents together with the export options."""
+    digest = hashlib.sha256(f'{CONFIG_VERSION}'.encode('utf-8'))
+    for path in db_paths:
+        digest.update(f'\0{os.path.realpath(path)}\0{content_hash(path)}'.encode('utf-8'))
+    digest.update(repr(options).encode('utf-8'))
+    return digest.hexdigest()
+
+def read_stamp(path: str) -> Optional[str]:
+    """Get the stamp of a generated file, None when missing or not generated."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            header, stamp = f.readline().rstrip('\n'), f.readline().rstrip('\n')
+    except (OSError, ValueError):
+        return None
+    if header != HEADER or not stamp.startswith(STAMP_PREFIX):
+        return None
+    return stamp[len(STAMP_PREFIX):]
+
+def render_config(
+    servers: List[ServerEntry],
+    stamp: str,
+    control_dir: str,
+    persist: int,
+    known_hosts: Optional[str] = None
+) -> str:
+    """Render a Host block per server, titles shared by several servers get a numbered alias."""
+    lines = [HEADER, STAMP_PREFIX + stamp]
+    used = set()
+    for server in servers:
+        base = host_alias(server.title or server.hostname) or host_alias(server.hostname)
+        alias, number = base, 1
+        while alias in used:
+            number += 1
+            alias = f'{base}-{number}'
+        used.add(alias)
+
+        lines.extend(['', f'Host {alias}', f'    HostName {server.hostname}', f'    Port {server.port}'])
+        if server.username:
+            lines.append(f'    User {_quote(server.username)}')
+        if server.jump:
+            lines.append(f'    ProxyJump {server.jump}')
+        # Connections within ControlPersist reuse the authenticated master
+        lines.extend([
+            '    ControlMaster auto',
+            f"    ControlPath {_quote(os.path.join(control_dir.replace('%', '%%'), '%C'))}",
+            f'    ControlPersist {persist}',
+        ])
+        if known_hosts:
+            lines.append(f"    UserKnownHostsFile {_quote(known_hosts)} ~/.ssh/known_hosts ~/.ssh/known_hosts2")
+    return '\n'.join(lines) + '\n'
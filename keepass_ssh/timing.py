@@ -0,0 +1,161 @@
+"""Phase timing module."""
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+from typing import ContextManager, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+class Phase:
+    """Accumulated wall clock time of a phase."""
+
+    __slots__ = ('path', 'elapsed', 'count')
+
+    def __init__(self, path: Tuple[str, ...]):
+        self.path = path
+        self.elapsed = 0.0
+        self.count = 0
+
+    @property
+    def name(self) -> str:
+        """Slash separated names of the phase and its parents."""
+        return '/'.join(self.path)
+
+class Timings:
+    """Time spent per phase of an invocation.
+
+    Spans nest per thread, a span opened in a worker thread is a top level
+    phase. Phases entered several times, e.g. once per server, accumulate
+    their time and count.
+    """
+
+    def __init__(self):
+        """Initialize timings starting now."""
+        self.started = time.perf_counter()
+        self.finished = None
+        self._phases: Dict[Tuple[str, ...], Phase] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as a phase nested in the open spans of the thread."""
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(name)
+        path = tuple(stack)
+        with self._lock:
+            # Phases are reported in the order they were entered
+            phase = self._phases.setdefault(path, Phase(path))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                phase.elapsed += elapsed
+                phase.count += 1
+
+    def merge(self, phases: Iterable[Tuple[Tuple[str, ...], float, int]], prefix: Tuple[str, ...] = ()) -> None:
+        """Add phases recorded elsewhere, e.g. in a worker process, below a prefix."""
+        with self._lock:
+            for path, elapsed, count in phases:
+                phase = self._phases.setdefault(prefix + tuple(path), Phase(prefix + tuple(path)))
+                phase.elapsed += elapsed
+                phase.count += count
+
+    def stop(self) -> None:
+        """Stop the total time."""
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        """Seconds from start until stopped, or until now."""
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def phases(self) -> List[Phase]:
+        """Finished phases in the order they were entered."""
+        with self._lock:
+            return [phase for phase in self._phases.values() if phase.count]
+
+    def format(self) -> str:
+        """Format the phases as an indented breakdown."""
+        lines = ['Timings:', f"  {'total':<30} {self.total * 1000:>10.1f} ms"]
+        for phase in self.phases:
+            label = '  ' * len(phase.path) + phase.path[-1]
+            line = f"{label:<32} {phase.elapsed * 1000:>10.1f} ms"
+            if phase.count > 1:
+                line += f"  ({phase.count}x)"
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def record(self, action: str) -> Dict:
+        """Describe the invocation and its phases as a JSON serializable record."""
+        import platform
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'host': platform.node(),
+            'user': _user(),
+            'pid': os.getpid(),
+            'action': action,
+            'total': round(self.total, 6),
+            'phases': [
+                {'name': phase.name, 'elapsed': round(phase.elapsed, 6), 'count': phase.count}
+                for phase in self.phases
+            ],
+        }
+
+    def append(self, path: str, action: str) -> None:
+        """Append the record of the invocation as a JSON line."""
+        line = json.dumps(self.record(action), separators=(',', ':')) + '\n'
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One write per record, appends of concurrent invocations do not interleave
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, line.encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    def write(self, stream: Optional[TextIO] = None) -> None:
+        """Write the breakdown, to stderr by default."""
+        (stream or sys.stderr).write(self.format() + '\n')
+
+def _user() -> Optional[str]:
+    """Get the name of the current user."""
+    import getpass
+    try:
+        return getpass.getuser()
+    except Exception:
+        return None
+
+_active: Optional[Timings] = None
+
+def enable() -> Timings:
+    """Start recording spans, returning the timings they are recorded in."""
+    global _active
+    _active = Timings()
+    return _active
+
+def disable() -> Optional[Timings]:
+    """Stop recording spans, returning the recorded timings."""
+    global _active
+    timings, _active = _active, None
+    if timings is not None:
+        timings.stop()
+    return timings
+
+def active() -> Optional[Timings]:
+    """Get the timings spans are recorded in, if enabled."""
+    return _active
+
+def span(name: str) -> ContextManager[None]:
+    """Time the enclosed block when timings are enabled, otherwise do nothing."""
+    timings = _active
+    if timings is None:
+        return contextlib.nullcontext()
+    return timings.span(name)
@@ -0,0 +1,224 @@
+"""Parallel file transfer module."""
+import os
+import sys
+import mmap
+import stat
+import time
+import posixpath
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, NamedTuple, Optional, TextIO
+
+import paramiko
+
+from .server import ServerEntry
+from .pool import SSHConnectionPool
+
+DEFAULT_WORKERS = 32
+DEFAULT_TIMEOUT = 60.0
+
+# Data handed to paramiko per call, it splits writes into 32 KiB requests
+BLOCK_SIZE = 1 << 20
+
+class TransferResult(NamedTuple):
+    """Outcome of a transfer to or from one server."""
+    server: ServerEntry
+    path: str
+    size: int
+    elapsed: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the file was transferred."""
+        return self.error is None
+
+def server_directory(server: ServerEntry) -> str:
+    """Get a directory name for a server, its title unless that is empty or only dots."""
+    name = (server.title or '').replace('/', '_').replace('\\', '_').replace('\0', '_').strip()
+    if not name.strip('.'):
+        name = f'{server.hostname}_{server.port}'.replace('/', '_')
+    return name
+
+def format_size(size: float) -> str:
+    """Format a byte count for humans."""
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+class ProgressPrinter:
+    """Print a line per finished host and, on a terminal, a live status line."""
+
+    def __init__(self, stream: Optional[TextIO] = None, interval: float = 0.2):
+        """Initialize printer redrawing the status line at most every interval seconds."""
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.live = self.stream.isatty()
+        self._progress = {}
+        self._finished = 0
+        self._last_draw = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, server: ServerEntry, done: int, total: int) -> None:
+        """Record the progress of a host."""
+        with self._lock:
+            self._progress[id(server)] = done
+            if done >= total:
+                self._finished += 1
+                self._write(f"[{server.title}] {format_size(total)}\n")
+            elif self.live and time.monotonic() - self._last_draw >= self.interval:
+                self._write('')
+
+    def _write(self, text: str) -> None:
+        """Write text above the status line."""
+        if self.live:
+            active = len(self._progress) - self._finished
+            transferred = format_size(sum(self._progress.values()))
+            text = f"\r\033[K{text}{self._finished} done, {active} active, {transferred} transferred"
+            self._last_draw = time.monotonic()
+        self.stream.write(text)
+        self.stream.flush()
+
+    def close(self) -> None:
+        """End the status line."""
+        if self.live and self._progress:
+            self.stream.write('\n')
+
+class FanoutTransfer:
+    """Copy a file to or from many servers over SFTP on a bounded worker pool."""
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT,
+        progress: Optional[Callable[[ServerEntry, int, int], None]] = None,
+        pool: Optional[SSHConnectionPool] = None,
+        resolver=None
+    ):
+        """Initialize transfer with the seconds a transfer may stall before failing."""
+        self.workers = workers
+        self.timeout = timeout
+        self.progress = progress or (lambda server, done, total: None)
+        self._own_pool = pool is None
+        self.pool = pool if pool is not None else SSHConnectionPool(
+            max_connections=0, keepalive=0, timeout=timeout, resolver=resolver
+        )
+
+    @contextlib.contextmanager
+    def _sftp(self, server: ServerEntry) -> Iterator[paramiko.SFTPClient]:
+        """Open an SFTP session on a pooled connection."""
+        with self.pool.session(server) as channel:
+            channel.settimeout(self.timeout)
+            channel.invoke_subsystem('sftp')
+            yield paramiko.SFTPClient(channel)
+
+    def _run(self, servers: List[ServerEntry], transfer: Callable[[ServerEntry], TransferResult]) -> List[TransferResult]:
+        """Run a transfer for every server, results are in server order."""
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(servers)))) as pool:
+                return list(pool.map(transfer, servers))
+        finally:
+            # Jump hosts of the default pool stay open until every transfer finished
+            if self._own_pool:
+                self.pool.close()
+
+    def put(self, servers: List[ServerEntry], source: str, destination: str) -> List[TransferResult]:
+        """Upload a local file to every server, a destination ending in / is a directory."""
+        if destination.endswith('/'):
+            destination = posixpath.join(destination, os.path.basename(source))
+
+        # The file is mapped once and every upload sends slices of the same buffer
+        with open(source, 'rb') as f:
+            info = os.fstat(f.fileno())
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if info.st_size else b''
+        view = memoryview(data)
+        try:
+            mode = stat.S_IMODE(info.st_mode)
+            return self._run(servers, lambda server: self._put_one(server, view, mode, destination))
+        finally:
+            view.release()
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def _put_one(self, server: ServerEntry, data: memoryview, mode: int, path: str) -> TransferResult:
+        """Upload the buffer to a single server."""
+        start = time.monotonic()
+        size = len(data)
+        try:
+            with self._sftp(server) as sftp:
+                with sftp.open(path, 'wb', bufsize=0) as remote:
+                    # Writes are sent without waiting for each acknowledgement
+                    remote.set_pipelined(True)
+                    for offset in range(0, size, BLOCK_SIZE):
+                        remote.write(data[offset:offset + BLOCK_SIZE])
+                        if offset + BLOCK_SIZE < size:
+                            self.progress(server, offset + BLOCK_SIZE, size)
+                    remote.chmod(mode)
+            self.progress(server, size, size)
+            return TransferResult(server, path, size, time.monotonic() - start)
+        except (paramiko.SSHException, EOFError, OSError) as e:
+            return TransferResult(server, path, 0, time.monotonic() - start, str(e) or e.__class__.__name__)
+
+    def local_paths(self, servers: List[ServerEntry], source: str, destination: str) -> List[str]:
+        """Get the local paths of a downloaded file in server order.
+
+        A single server downloads to the destination file or directory, several
+        servers download into a directory per server title below it. Titles
+        shared by several servers get a numbered directory each.
+        """
+        name = posixpath.basename(source.rstrip('/'))
+        if len(servers) == 1:
+            return [os.path.join(destination, name) if os.path.isdir(destination) else destination]
+
+        paths, used = [], set()
+        for server in servers:
+            base = server_directory(server)
+            directory, number = base, 1
+            # Compared case-insensitively, some file systems are
+            while directory.lower() in used:
+                number += 1
+                directory = f'{base}-{number}'
+            used.add(directory.lower())
+            paths.append(os.path.join(destination, directory, name))
+        return paths
+
+    def get(self, servers: List[ServerEntry], source: str, destination: str) -> List[TransferResult]:
+        """Download a remote file from every server."""
+        paths = dict(zip(map(id, servers), self.local_paths(servers, source, destination)))
+        return self._run(servers, lambda server: self._get_one(server, source, paths[id(server)]))
+
+    def _get_one(self, server: ServerEntry, source: str, path: str) -> TransferResult:
+        """Download the file of a single server."""
+        start = time.monotonic()
+        partial = path + '.part'
+        try:
+            with self._sftp(server) as sftp, sftp.open(source, 'rb') as remote:
+                size = remote.stat().st_size
+                # Reads are requested ahead of time instead of one round trip each
+                remote.prefetch(size)
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                done = 0
+                with open(partial, 'wb') as local:
+                    for block in iter(lambda: remote.read(BLOCK_SIZE), b''):
+                        local.write(block)
+                        done += len(block)
+                        if done < size:
+                            self.progress(server, done, size)
+            os.replace(partial, path)
+            self.progress(server, done, done)
+            return TransferResult(server, path, done, time.monotonic() - start)
+        except (paramiko.SSHException, EOFError, OSError) as e:
+            with contextlib.suppress(OSError):
+                os.unlink(partial)
+            return TransferResult(server, path, 0, time.monotonic() - start, str(e) or e.__class__.__name__)
+
+def format_summary(results: List[TransferResult]) -> str:
+    """Summarize results with the servers that failed."""
+    failed = [result for result in results if not result.ok]
+    transferred = format_size(sum(result.size for result in results))
+    lines = [f"{len(results) - len(failed)} succeeded, {len(failed)} failed, {transferred} transferred"]
+    for result in failed:
+        lines.append(f"  {result.server.title} ({result.server.hostname}): {result.error}")
+    return '\n'.join(lines)
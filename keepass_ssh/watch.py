@@ -0,0 +1,138 @@
+"""Database file watching module."""
+import os
+import sys
+import time
+import struct
+import logging
+from typing import Optional, Tuple
+
+DEFAULT_DEBOUNCE = 0.5
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Event flags of inotify(7)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# Watch descriptor, mask, cookie and name length, followed by the name
+_EVENT = struct.Struct('iIII')
+
+def _inotify_watch(directory: str) -> Optional[int]:
+    """Create an inotify descriptor watching a directory, None where unavailable."""
+    if not sys.platform.startswith('linux'):
+        return None
+
+    import ctypes
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+        logging.info(f"Cannot watch {directory}: {os.strerror(ctypes.get_errno())}")
+        os.close(fd)
+        return None
+    return fd
+
+class FileWatcher:
+    """Report settled changes of a file.
+
+    Linux notifies about changes in the directory of the file, so files
+    replaced by a rename are followed, elsewhere the file is polled. A
+    change is reported once no event arrived for the debounce delay and
+    the modification time, size or inode differ from the last report.
+    """
+
+    def __init__(self, path: str, debounce: float = DEFAULT_DEBOUNCE, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        """Initialize watcher, the current version of the file counts as seen."""
+        self.path = os.path.abspath(path)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._name = os.fsencode(os.path.basename(self.path))
+        self._fd = _inotify_watch(os.path.dirname(self.path))
+        self._reported = self._seen = self._signature()
+        self._pending = None
+        self._next_poll = time.monotonic() + poll_interval
+
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        """Get the modification time, size and inode of the file, None when missing."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def fileno(self) -> Optional[int]:
+        """Get the descriptor becoming readable on events, None when polling."""
+        return self._fd
+
+    def read_events(self) -> bool:
+        """Consume pending events, returning whether any concerns the file."""
+        if self._fd is None:
+            return False
+
+        found = False
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT.unpack_from(data, offset)
+                start = offset + _EVENT.size
+                offset = start + length
+                found = found or data[start:offset].rstrip(b'\0') == self._name
+        if found:
+            self._seen = self._signature()
+            self._pending = time.monotonic()
+        return found
+
+    def timeout(self) -> Optional[float]:
+        """Seconds until changed should be called, None when only events matter."""
+        now = time.monotonic()
+        if self._pending is not None:
+            return max(0.0, self._pending + self.debounce - now)
+        if self._fd is None:
+            return max(0.0, self._next_poll - now)
+        return None
+
+    def changed(self) -> bool:
+        """Check whether the file changed and settled since the last reported change."""
+        now = time.monotonic()
+        if self._fd is None and now >= self._next_poll:
+            self._next_poll = now + self.poll_interval
+            signature = self._signature()
+            if signature != self._seen:
+                self._seen = signature
+                self._pending = now
+
+        if self._pending is None or now < self._pending + self.debounce:
+            return False
+
+        self._pending = None
+        signature = self._signature()
+        if signature != self._seen:
+            # Still being written
+            self._seen = signature
+            self._pending = now
+            return False
+        if signature is None or signature == self._reported:
+            return False
+        self._reported = signature
+        return True
+
+    def close(self) -> None:
+        """Stop watching."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -30,7 +30,7 @@ def main():
         
         # Get server entries
         keepass_entries = db.get_entries(group_path)
-        servers = [ServerManager.from_keepass_entry(entry) for entry in keepass_entries]
+        servers = ServerManager.from_keepass_entries(keepass_entries)
         
         if not servers:
             print("No server entries found")
@@ -0,0 +1,13 @@
+"""Shared test fixtures."""
+import pytest
+from keepass_ssh.server import ServerEntry
+
+@pytest.fixture
+def make_server():
+    """Get a factory of test server entries, the URL carries the port unless it is 22."""
+    def make(title='web', hostname='host1', port=22, username='user', password='secret', **fields):
+        url = hostname if port == 22 else f'{hostname}:{port}'
+        fields.setdefault('description', '')
+        return ServerEntry(title=title, username=username, password=password, url=url,
+                           hostname=hostname, port=port, **fields)
+    return make
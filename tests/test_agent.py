@@ -0,0 +1,128 @@
+"""Tests for agent module."""
+import threading
+import pytest
+from unittest.mock import Mock, patch
+from keepass_ssh.agent import KeePassAgent, AgentClient
+from keepass_ssh.database import DatabaseChanges, DatabaseError, EntryRecord, GroupNotFoundError
+from keepass_ssh.search import Matches, SearchIndex
+
+@pytest.fixture
+def record():
+    """Create a test entry record."""
+    return EntryRecord(
+        uuid="0b6c5f1e-58b5-4d0c-9a47-3b6f0e4ac0d1",
+        title="Test Server",
+        username="test_user",
+        password="test_pass",
+        url="test.server.com:22",
+        notes="Test server description"
+    )
+
+@pytest.fixture
+def database(tmp_path, record):
+    """Create a mock opened database."""
+    db = Mock()
+    db.db_path = str(tmp_path / "test.kdbx")
+    db.get_records.return_value = [record]
+    return db
+
+@pytest.fixture
+def running_agent(tmp_path, database):
+    """Run an agent on a temporary socket in a background thread."""
+    agent = KeePassAgent(database, socket_path=str(tmp_path / "agent.sock"), idle_ttl=10)
+    thread = threading.Thread(target=agent.serve_forever, daemon=True)
+    thread.start()
+    client = AgentClient(agent.socket_path)
+    for _ in range(100):
+        if client.request({'op': 'ping'}):
+            break
+        thread.join(0.01)
+    yield agent
+    client.stop()
+    thread.join(5)
+
+def test_handle_entries(database, record):
+    """Test serving entries for the loaded database."""
+    agent = KeePassAgent(database, socket_path="unused.sock")
+    response = agent.handle_request({'op': 'entries', 'database': database.db_path, 'group': 'root'})
+    assert response['ok']
+    assert response['entries'] == [record._replace(password=None)._asdict()]
+    database.get_records.assert_called_once_with('root')
+
+def test_handle_other_database(database):
+    """Test refusing requests for a database the agent did not open."""
+    agent = KeePassAgent(database, socket_path="unused.sock")
+    response = agent.handle_request({'op': 'entries', 'database': '/other.kdbx', 'group': 'root'})
+    assert not response['ok']
+    database.get_records.assert_not_called()
+
+def test_handle_unknown_operation(database):
+    """Test error response for unknown operations."""
+    agent = KeePassAgent(database, socket_path="unused.sock")
+    assert not agent.handle_request({'op': 'unknown'})['ok']
+
+def test_client_without_agent(tmp_path):
+    """Test client falls back when no agent is listening."""
+    client = AgentClient(str(tmp_path / "missing.sock"))
+    assert client.get_entries(str(tmp_path / "test.kdbx"), 'root') is None
+
+def test_client_get_entries(running_agent, database, record):
+    """Test fetching entries through the socket."""
+    client = AgentClient(running_agent.socket_path)
+    assert client.get_entries(database.db_path, 'root') == [record._replace(password=None)]
+
+def test_client_group_not_found(running_agent, database):
+    """Test group errors are raised instead of falling back."""
+    database.get_records.side_effect = GroupNotFoundError("Group Missing not found")
+    client = AgentClient(running_agent.socket_path)
+    with pytest.raises(GroupNotFoundError):
+        client.get_entries(database.db_path, 'Missing')
+
+def test_agent_idle_timeout(tmp_path, database):
+    """Test agent exits and removes its socket after the idle TTL."""
+    socket_path = tmp_path / "agent.sock"
+    agent = KeePassAgent(database, socket_path=str(socket_path), idle_ttl=0.2)
+    agent.serve_forever()
+    assert not socket_path.exists()
+
+def test_reload_patches_search_index(tmp_path, database, record):
+    """Test that a reload patches the search index and rewrites the metadata index."""
+    renamed = record._replace(title="Renamed Server")
+    database.reload.return_value = DatabaseChanges([], [renamed], [])
+    database.get_records.return_value = [renamed]
+    database.get_group_paths.return_value = ['']
+    database.get_group_uuids.return_value = {}
+    agent = KeePassAgent(database, socket_path="unused.sock")
+    agent.search_index = SearchIndex.from_records([record])
+    with patch('keepass_ssh.agent.MetadataIndex') as index:
+        index.return_value.save.side_effect = lambda records, groups, search_index, group_uuids: search_index
+        agent.reload()
+    assert agent.search_index.search("renamed") == [record.uuid]
+    assert agent.search_index.exact("Test Server") == []
+    index.return_value.save.assert_called_once_with([renamed], [''], agent.search_index, group_uuids={})
+
+def test_handle_search_builds_index_once(database, record):
+    """Test that searches are answered from an index built on first use."""
+    agent = KeePassAgent(database, socket_path="unused.sock")
+    with patch('keepass_ssh.agent.MetadataIndex') as index:
+        index.return_value.get_search_index.return_value = None
+        first = agent.handle_request({'op': 'search', 'database': database.db_path, 'query': 'test server'})
+        second = agent.handle_request({'op': 'search', 'database': database.db_path, 'query': 'tset'})
+    assert first == {'ok': True, 'exact': [record.uuid], 'matches': [(record.uuid, 2.0)], 'typos': False}
+    assert second['typos'] and second['exact'] == []
+    database.get_records.assert_called_once_with()
+
+def test_client_search(running_agent, database, record):
+    """Test searching entries through the socket."""
+    running_agent.search_index = SearchIndex.from_records([record])
+    client = AgentClient(running_agent.socket_path)
+    assert client.search(database.db_path, 'server') == ([], Matches({record.uuid: 1.0}))
+    assert client.search('/other.kdbx', 'server') is None
+
+def test_reload_failure_keeps_database(database):
+    """Test that a database which cannot be opened is not swapped in."""
+    database.reload.side_effect = DatabaseError("partial write")
+    agent = KeePassAgent(database, socket_path="unused.sock")
+    with patch('keepass_ssh.agent.MetadataIndex') as index:
+        assert agent.reload() is None
+    index.assert_not_called()
@@ -0,0 +1,87 @@
+"""Tests for batch module."""
+import pytest
+from unittest.mock import MagicMock, patch
+import paramiko
+from keepass_ssh.pool import SSHConnectionPool
+from keepass_ssh.batch import BatchExecutor, ExecResult, format_summary
+
+def fake_channel(stdout=(), stderr=(), exit_code=0, finished=True):
+    """Create a channel returning the given chunks and exit status."""
+    stdout, stderr = list(stdout), list(stderr)
+    channel = MagicMock()
+    channel.recv_ready.side_effect = lambda: bool(stdout)
+    channel.recv.side_effect = lambda size: stdout.pop(0)
+    channel.recv_stderr_ready.side_effect = lambda: bool(stderr)
+    channel.recv_stderr.side_effect = lambda size: stderr.pop(0)
+    channel.exit_status_ready.return_value = finished
+    channel.recv_exit_status.return_value = exit_code
+    return channel
+
+@pytest.fixture
+def executor():
+    """Create an executor on a mocked pool collecting output lines."""
+    lines = []
+    executor = BatchExecutor(workers=4, timeout=5, output=lambda srv, line, is_stderr=False:
+                             lines.append((srv.title, line, is_stderr)),
+                             pool=MagicMock())
+    executor.lines = lines
+    return executor
+
+def test_run_on_streams_lines(executor, make_server):
+    """Test that output is split into lines across chunks."""
+    channel = fake_channel([b'one\ntw', b'o\r\nthree'], [b'warn\n'], exit_code=3)
+    executor.pool.session.return_value.__enter__.return_value = channel
+    result = executor.run_on(make_server('web'), 'uptime')
+
+    channel.exec_command.assert_called_once_with('uptime')
+    assert result.exit_code == 3 and not result.ok
+    assert executor.lines == [('web', 'one', False), ('web', 'two', False),
+                              ('web', 'warn', True), ('web', 'three', False)]
+    executor.pool.session.return_value.__exit__.assert_called_once()
+
+def test_run_on_timeout(executor, make_server):
+    """Test that a command running past the deadline fails."""
+    executor.timeout = 0.01
+    executor.pool.session.return_value.__enter__.return_value = fake_channel(finished=False)
+    with patch('keepass_ssh.batch.select.select'):
+        result = executor.run_on(make_server('web'), 'sleep 10')
+
+    assert result.exit_code is None
+    assert 'timed out' in result.error
+
+def test_run_on_connection_error(executor, make_server):
+    """Test that connection errors are reported per server."""
+    executor.pool.session.side_effect = paramiko.AuthenticationException('denied')
+    result = executor.run_on(make_server('web'), 'true')
+    assert result.error == 'denied'
+
+def test_keeps_empty_pool():
+    """Test that a given pool is used even while it holds no connections."""
+    pool = SSHConnectionPool(host_key_policy=paramiko.RejectPolicy())
+    assert BatchExecutor(pool=pool).pool is pool
+
+def test_default_pool_closes_connections():
+    """Test that an executor without pool keeps no idle connections."""
+    executor = BatchExecutor(timeout=5)
+    assert executor.pool.max_connections == 0
+    assert executor.pool.timeout == 5
+
+def test_run_keeps_server_order(executor, make_server):
+    """Test that results follow the order of the servers."""
+    servers = [make_server(f'web{i}') for i in range(10)]
+    with patch.object(BatchExecutor, 'run_on', side_effect=lambda srv, cmd: ExecResult(srv, 0, 0.0)):
+        results = executor.run(servers, 'true')
+    assert [result.server for result in results] == servers
+
+def test_format_summary(make_server):
+    """Test summarizing failed servers."""
+    results = [
+        ExecResult(make_server('web1'), 0, 0.1),
+        ExecResult(make_server('web2', 'host2'), 2, 0.1),
+        ExecResult(make_server('web3', 'host3'), None, 0.1, 'timed out'),
+    ]
+    assert format_summary(results) == (
+        "1 succeeded, 2 failed\n"
+        "  web2 (host2): exit code 2\n"
+        "  web3 (host3): timed out"
+    )
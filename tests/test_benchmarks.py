@@ -0,0 +1,63 @@
+"""Tests for benchmarks package."""
+import json
+import pytest
+from benchmarks.__main__ import main
+from benchmarks.generate import ensure_database, group_paths, leaf_group
+from benchmarks.suite import compare, measure
+from keepass_ssh.database import KeePassDatabase
+
+@pytest.fixture(scope="module")
+def bench_dir(tmp_path_factory):
+    """Directory for generated databases shared by the tests."""
+    return str(tmp_path_factory.mktemp("bench"))
+
+def test_group_paths():
+    """Test the nested group layout."""
+    paths = group_paths(2, fanout=3)
+    assert len(paths) == 12
+    assert paths[0] == ['Servers', 'production', 'web-1']
+    assert leaf_group(2) == 'Servers/production/web-1'
+
+def test_generate_database(bench_dir):
+    """Test generating entries with history in nested groups."""
+    db_path, key_path = ensure_database(bench_dir, 40, history=2)
+    assert ensure_database(bench_dir, 40, history=2) == (db_path, key_path)
+
+    db = KeePassDatabase(db_path, key_path)
+    entries = db.get_entries()
+    assert len(entries) == 40
+    assert len(db.get_entries(leaf_group(2))) == len(range(0, 40, len(group_paths(2))))
+    assert len(entries[0].history) == 2
+    assert entries[0].tags == ['production', entries[0].title.split('-')[0]]
+
+def test_measure():
+    """Test that setup runs before every timed call."""
+    calls = []
+    result = measure(lambda: calls.append('run'), repeat=2, setup=lambda: calls.append('setup'))
+    assert calls == ['setup', 'run', 'setup', 'run']
+    assert len(result['runs']) == 2 and result['best'] <= result['median']
+
+def test_compare():
+    """Test reporting benchmarks slower than the threshold."""
+    previous = {'results': [{'name': 'open', 'entries': 100, 'kdf': 'fast', 'median': 0.010}]}
+    current = {'results': [
+        {'name': 'open', 'entries': 100, 'kdf': 'fast', 'median': 0.013},
+        {'name': 'open', 'entries': 1000, 'kdf': 'fast', 'median': 0.100},
+    ]}
+    assert compare(previous, current) == ['open (100 entries, fast): 10.00 ms -> 13.00 ms']
+    assert compare(previous, current, threshold=1.5) == []
+
+def test_main_writes_results(bench_dir, tmp_path):
+    """Test running the suite and writing JSON results."""
+    output = tmp_path / 'results.json'
+    assert main(['--sizes', '40', '--history', '2', '--repeat', '1', '--cache-dir', bench_dir, '-o', str(output)]) == 0
+
+    data = json.loads(output.read_text())
+    names = {result['name'] for result in data['results']}
+    assert {'open', 'get_entries[group]', 'stream_records[group]', 'from_keepass_entries',
+            'filter_servers[typo]', 'list_servers'} <= names
+    assert data['environment']['python']
+    assert all(result['entries'] == 40 and result['kdf'] == 'fast' for result in data['results'])
+
+    assert main(['--sizes', '40', '--history', '2', '--repeat', '1', '--cache-dir', bench_dir,
+                 '-o', str(tmp_path / 'next.json'), '--compare', str(output), '--threshold', '1000']) == 0
@@ -0,0 +1,82 @@
+"""Tests for complete module."""
+import os
+import sys
+import subprocess
+import pytest
+from keepass_ssh.complete import complete, match, main, read_completions, completion_path
+from keepass_ssh.database import EntryRecord
+from keepass_ssh.index import MetadataIndex
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    """Create the completion list of a database in a temporary cache."""
+    db_file = tmp_path / "test.kdbx"
+    db_file.write_bytes(b"database content")
+    records = [
+        EntryRecord(uuid="1", title="Root Server", username="root", password="secret",
+                    url="root.server.com", notes="", group=""),
+        EntryRecord(uuid="2", title="web-production", username="web", password="secret",
+                    url="web1.example.com", notes="", group="Servers/Production"),
+        EntryRecord(uuid="3", title="db-production", username="db", password="secret",
+                    url="db1.example.com", notes="", group="Servers/Production"),
+    ]
+    cache_dir = str(tmp_path / "cache")
+    MetadataIndex(str(db_file), cache_dir=cache_dir).save(records, ["", "Servers", "Servers/Production"])
+    return cache_dir
+
+def test_match_prefix_first():
+    """Test that prefix matches hide substring and fuzzy matches."""
+    candidates = ["web-staging", "Web-production", "db-web", "wide-eyed-box"]
+    assert match(candidates, "WEB") == ["Web-production", "web-staging"]
+    assert match(candidates, "eb") == ["db-web", "Web-production", "web-staging", "wide-eyed-box"]
+    assert match(candidates, "wdb") == ["wide-eyed-box"]
+    assert match(candidates, "") == ["db-web", "Web-production", "web-staging", "wide-eyed-box"]
+
+def test_completion_list(cache_dir, tmp_path):
+    """Test that only titles and groups are written."""
+    path = completion_path(str(tmp_path / "test.kdbx"), cache_dir)
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert "secret" not in open(path).read()
+    assert read_completions(path) == {
+        "": ["Root Server"], "Servers": [], "Servers/Production": ["web-production", "db-production"]
+    }
+
+def test_complete_servers(cache_dir, tmp_path, monkeypatch):
+    """Test completing titles of the group given on the command line."""
+    monkeypatch.delenv("KEEPASS_GROUP_PATH", raising=False)
+    words = ["-d", str(tmp_path / "test.kdbx")]
+    assert complete("servers", "", words, cache_dir) == ["Root Server"]
+    assert complete("servers", "prod", words + ["-g", "/Servers/Production/"], cache_dir) == [
+        "db-production", "web-production"
+    ]
+    assert complete("servers", "web", words + ["--group=Missing"], cache_dir) == []
+
+def test_complete_groups(cache_dir, tmp_path, monkeypatch):
+    """Test completing groups of the database found in the current directory."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("KEEPASS_DB_PATH", raising=False)
+    assert complete("groups", "serv", [], cache_dir) == ["Servers", "Servers/Production"]
+    assert complete("groups", "ro", [], cache_dir) == ["root"]
+
+def test_complete_missing_list(tmp_path):
+    """Test that databases without a completion list complete nothing."""
+    assert complete("servers", "", ["-d", str(tmp_path / "other.kdbx")], str(tmp_path)) == []
+
+def test_main_script(capsys):
+    """Test printing the completion script of each shell."""
+    for shell in ("bash", "zsh", "fish"):
+        assert main(["--script", shell]) == 0
+        assert "keepass-ssh-complete" in capsys.readouterr().out
+    assert main(["unknown"]) == 2
+
+def test_completer_imports():
+    """Test that the completer loads no other module of the package and no database libraries."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import keepass_ssh.complete'],
+        capture_output=True, text=True, timeout=60,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    modules = {line.split('|')[-1].strip() for line in result.stderr.splitlines() if '|' in line}
+    assert 'keepass_ssh.complete' in modules
+    assert not [module for module in modules if module.startswith('keepass_ssh.') and module != 'keepass_ssh.complete']
+    assert not modules & {'pykeepass', 'typing', 'json'}
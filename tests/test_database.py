@@ -1,7 +1,10 @@
 """Tests for database module."""
 import pytest
 from unittest.mock import Mock, patch
-from keepass_ssh.database import KeePassDatabase, DatabaseError, GroupNotFoundError
+from keepass_ssh import timing
+from keepass_ssh.database import (
+    KeePassDatabase, DatabaseError, GroupNotFoundError, normalize_group_path, stream_records
+)
 
 @pytest.fixture
 def mock_keepass_entry():
@@ -14,12 +17,20 @@ def mock_keepass_entry():
     entry.notes = "Test server description"
     return entry
 
+def mock_group(name, entries=(), subgroups=()):
+    """Create a mock KeePass group."""
+    group = Mock()
+    group.name = name
+    group.entries = list(entries)
+    group.subgroups = list(subgroups)
+    return group
+
 @pytest.fixture
 def mock_db():
     """Create a mock PyKeePass database."""
     db = Mock()
     db.entries = []
-    db.root_group = Mock()
+    db.root_group = mock_group(None)
     return db
 
 def test_database_initialization():
@@ -36,7 +47,7 @@ def test_database_error():
 
 def test_get_entries_all(mock_db, mock_keepass_entry):
     """Test getting all entries."""
-    mock_db.entries = [mock_keepass_entry]
+    mock_db.root_group.subgroups = [mock_group("Servers", [mock_keepass_entry])]
     with patch('keepass_ssh.database.PyKeePass', return_value=mock_db):
         db = KeePassDatabase("test.kdbx")
         entries = db.get_entries()
@@ -45,8 +56,8 @@ def test_get_entries_all(mock_db, mock_keepass_entry):
 
 def test_get_entries_root(mock_db, mock_keepass_entry):
     """Test getting root entries."""
-    mock_keepass_entry.group = mock_db.root_group
-    mock_db.entries = [mock_keepass_entry]
+    mock_db.root_group.entries = [mock_keepass_entry]
+    mock_db.root_group.subgroups = [mock_group("Servers", [Mock()])]
     with patch('keepass_ssh.database.PyKeePass', return_value=mock_db):
         db = KeePassDatabase("test.kdbx")
         entries = db.get_entries("root")
@@ -55,9 +66,7 @@ def test_get_entries_root(mock_db, mock_keepass_entry):
 
 def test_get_entries_group(mock_db, mock_keepass_entry):
     """Test getting entries from a specific group."""
-    group = Mock()
-    group.entries = [mock_keepass_entry]
-    mock_db.find_groups.return_value = group
+    mock_db.root_group.subgroups = [mock_group("Test", subgroups=[mock_group("Group", [mock_keepass_entry])])]
     with patch('keepass_ssh.database.PyKeePass', return_value=mock_db):
         db = KeePassDatabase("test.kdbx")
         entries = db.get_entries("Test/Group")
@@ -66,8 +75,181 @@ def test_get_entries_group(mock_db, mock_keepass_entry):
 
 def test_get_entries_group_not_found(mock_db):
     """Test error when group is not found."""
-    mock_db.find_groups.return_value = None
     with patch('keepass_ssh.database.PyKeePass', return_value=mock_db):
         db = KeePassDatabase("test.kdbx")
         with pytest.raises(GroupNotFoundError):
             db.get_entries("NonExistent/Group")
+
+def test_normalize_group_path():
+    """Test group path normalization."""
+    assert normalize_group_path("root") == ""
+    assert normalize_group_path("/Servers/Production/") == "Servers/Production"
+    assert normalize_group_path("Servers//Production") == "Servers/Production"
+
+def test_get_records_group(mock_db, mock_keepass_entry):
+    """Test getting plain records from a specific group."""
+    mock_db.root_group.subgroups = [mock_group("Test", subgroups=[mock_group("Group", [mock_keepass_entry])])]
+    with patch('keepass_ssh.database.PyKeePass', return_value=mock_db):
+        db = KeePassDatabase("test.kdbx")
+        records = db.get_records("/Test/Group")
+        assert records[0].title == "Test Server"
+        assert records[0].password == "test_pass"
+        assert records[0].group == "Test/Group"
+
+def test_find_entry_not_found(mock_db):
+    """Test error when entry UUID is not found."""
+    mock_db.find_entries.return_value = None
+    with patch('keepass_ssh.database.PyKeePass', return_value=mock_db):
+        db = KeePassDatabase("test.kdbx")
+        with pytest.raises(DatabaseError):
+            db.find_entry("0b6c5f1e-58b5-4d0c-9a47-3b6f0e4ac0d1")
+
+def test_database_cached_key(mock_db):
+    """Test opening the database with a cached transformed key."""
+    key_cache = Mock()
+    key_cache.get.return_value = b'key'
+    with patch('keepass_ssh.database.PyKeePass', return_value=mock_db) as mock_keepass:
+        KeePassDatabase("test.kdbx", "test.key", key_cache=key_cache)
+        mock_keepass.assert_called_once_with("test.kdbx", keyfile="test.key", transformed_key=b'key')
+        key_cache.put.assert_not_called()
+
+def test_database_stale_cached_key(mock_db):
+    """Test falling back to the KDF when the cached key is rejected."""
+    key_cache = Mock()
+    key_cache.get.return_value = b'stale'
+    with patch('keepass_ssh.database.PyKeePass', side_effect=[Exception("Invalid credentials"), mock_db]):
+        KeePassDatabase("test.kdbx", "test.key", key_cache=key_cache)
+    key_cache.invalidate.assert_called_once_with("test.kdbx", "test.key")
+    key_cache.put.assert_called_once_with("test.kdbx", "test.key", mock_db.transformed_key)
+
+def test_get_entries_by_uuid(mock_db, mock_keepass_entry):
+    """Test getting entries of a group given by UUID."""
+    group = mock_group("Servers", [mock_keepass_entry])
+    group.uuid = "0b6c5f1e-58b5-4d0c-9a47-3b6f0e4ac0d1"
+    mock_db.root_group.subgroups = [group]
+    with patch('keepass_ssh.database.PyKeePass', return_value=mock_db):
+        db = KeePassDatabase("test.kdbx")
+        assert db.get_entries("0B6C5F1E-58B5-4D0C-9A47-3B6F0E4AC0D1") == [mock_keepass_entry]
+
+def test_group_index_order(mock_db):
+    """Test that entries are listed depth-first and the tree is walked once."""
+    a, b, c = Mock(), Mock(), Mock()
+    servers = mock_group("Servers", [b], [mock_group("Production", [c])])
+    mock_db.root_group = mock_group(None, [a], [servers])
+    with patch('keepass_ssh.database.PyKeePass', return_value=mock_db):
+        db = KeePassDatabase("test.kdbx")
+        assert db.get_entries() == [a, b, c]
+        assert db.get_entries("root") == [a]
+        assert db.get_entries("/Servers/Production/") == [c]
+        assert db.get_group_paths() == ["", "Servers", "Servers/Production"]
+    mock_db.find_groups.assert_not_called()
+
+@pytest.fixture(scope="module")
+def kdbx_file(tmp_path_factory):
+    """Create a real database with a cheap KDF for the streaming loader."""
+    from pykeepass import create_database
+    path = tmp_path_factory.mktemp("kdbx") / "test.kdbx"
+    key_path = path.parent / "test.keyx"
+    key_path.write_bytes(b"0" * 32)
+    kp = create_database(str(path), keyfile=str(key_path))
+    kdf = kp.kdbx.header.value.dynamic_header.kdf_parameters.data.dict
+    kdf['I'].value, kdf['M'].value, kdf['P'].value = 1, 1 << 20, 1
+
+    servers = kp.add_group(kp.root_group, "Servers")
+    production = kp.add_group(servers, "Production & Co")
+    kp.add_entry(kp.root_group, "Root Server", "root", "root<pass>", url="root.server.com")
+    kp.add_entry(kp.root_group, "Empty Server", "", "", url="", notes="")
+    web = kp.add_entry(production, "Web Server", "web", "old", url="web.server.com:2222")
+    web.save_history()
+    web.password = "new"
+    kp.add_entry(production, "DB Server", "db", "db_pass", notes="Database", tags=["db", "prod"])
+    kp.save()
+    return str(path), str(key_path)
+
+def test_stream_records_matches_full_load(kdbx_file):
+    """Test that streaming a group yields the same records as a full load."""
+    db = KeePassDatabase(*kdbx_file)
+    for group in ("root", "Servers", "Servers/Production & Co"):
+        records, stats = stream_records(*kdbx_file, group_path=group)
+        assert records == db.get_records(group)
+        assert stats.entries == len(records)
+    records, _ = stream_records(*kdbx_file, group_path="Servers/Production & Co")
+    assert [r.password for r in records] == ["new", "db_pass"]
+
+def test_stream_records_group_not_found(kdbx_file):
+    """Test error when streamed group does not exist."""
+    with pytest.raises(GroupNotFoundError):
+        stream_records(*kdbx_file, group_path="Missing")
+
+def test_stream_records_wrong_key(kdbx_file, tmp_path):
+    """Test error when the key does not open the database."""
+    key_path = tmp_path / "wrong.keyx"
+    key_path.write_bytes(b"1" * 32)
+    with pytest.raises(DatabaseError):
+        stream_records(kdbx_file[0], str(key_path), "root")
+
+def test_stream_records_stale_cached_key(kdbx_file):
+    """Test that a stale cached key is replaced by the key derived instead."""
+    key_cache = Mock()
+    key_cache.get.return_value = b"0" * 32
+    records, _ = stream_records(*kdbx_file, group_path="root", key_cache=key_cache)
+    
+    assert len(records) == 2
+    key_cache.invalidate.assert_called_once_with(*kdbx_file)
+    key_cache.put.assert_called_once()
+    assert key_cache.put.call_args.args[:2] == kdbx_file
+    assert key_cache.put.call_args.args[2] != b"0" * 32
+
+def test_open_timings(kdbx_file):
+    """Test that key derivation is timed within opening the database."""
+    timings = timing.enable()
+    try:
+        KeePassDatabase(*kdbx_file).get_entries()
+        stream_records(*kdbx_file, group_path="root")
+    finally:
+        timing.disable()
+    
+    names = [phase.name for phase in timings.phases]
+    assert names == ["open", "open/kdf", "groups", "decrypt", "decrypt/kdf", "scan"]
+    
+    # pykeepass itself is left as it is
+    from pykeepass.kdbx_parsing import kdbx4
+    assert kdbx4.Body.transformed_key.subcon.func is kdbx4.compute_transformed
+
+def test_reload_changes(kdbx_file, tmp_path):
+    """Test that a reload reports entries added, changed and removed since the last load."""
+    import shutil
+    from datetime import datetime, timezone
+    from pykeepass import PyKeePass
+    path = tmp_path / "test.kdbx"
+    shutil.copy(kdbx_file[0], path)
+    db = KeePassDatabase(str(path), kdbx_file[1])
+    before = {record.title: record for record in db.get_records()}
+    
+    kp = PyKeePass(str(path), keyfile=kdbx_file[1])
+    web = kp.find_entries(title="Web Server", first=True)
+    web.password = "newer"
+    web.mtime = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    kp.delete_entry(kp.find_entries(title="Empty Server", first=True))
+    kp.add_entry(kp.root_group, "New Server", "new", "pw", url="new.server.com")
+    kp.save()
+    
+    changes = db.reload()
+    assert [record.title for record in changes.added] == ["New Server"]
+    assert [record.password for record in changes.changed] == ["newer"]
+    assert changes.removed == [before["Empty Server"].uuid]
+    after = {record.title: record for record in db.get_records()}
+    assert after["DB Server"] is before["DB Server"]
+    assert not db.reload()
+
+def test_reload_keeps_previous_load(kdbx_file, tmp_path):
+    """Test that a failed reload leaves the loaded database in use."""
+    import shutil
+    path = tmp_path / "test.kdbx"
+    shutil.copy(kdbx_file[0], path)
+    db = KeePassDatabase(str(path), kdbx_file[1])
+    records = db.get_records()
+    path.write_bytes(b"partial")
+    with pytest.raises(DatabaseError):
+        db.reload()
+    assert db.get_records() == records
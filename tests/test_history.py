@@ -0,0 +1,83 @@
+"""Tests for history module."""
+import os
+import time
+import threading
+import pytest
+from unittest.mock import patch
+from keepass_ssh.history import History, HALF_LIFE
+
+WEB = "0b6c5f1e-58b5-4d0c-9a47-3b6f0e4ac0d1"
+DB = "7d1b1a8e-2f4c-4b8e-8f3a-5a2c9e1d4b60"
+NOW = 1_700_000_000.0
+
+@pytest.fixture
+def history(tmp_path):
+    """Create a history in a temporary directory."""
+    return History(str(tmp_path / "history"))
+
+def test_scores_decay(history):
+    """Test that a connection counts half as much after the half-life."""
+    history.record(WEB, 12.5, timestamp=NOW - HALF_LIFE)
+    history.record(WEB, 3.0, timestamp=NOW)
+    history.record(DB, 1.0, timestamp=NOW - 2 * HALF_LIFE)
+    assert history.scores(NOW) == pytest.approx({WEB: 1.5, DB: 0.25})
+    assert os.stat(history.path).st_mode & 0o777 == 0o600
+
+def test_compact_keeps_scores(history):
+    """Test that compaction leaves one record per entry and keeps the scores."""
+    for i in range(10):
+        history.record(WEB, 1.0, timestamp=NOW - i * 3600)
+    history.record(DB, 1.0, timestamp=NOW - 100 * HALF_LIFE)
+    before = history.scores(NOW)
+    size = os.path.getsize(history.path)
+    
+    history.compact(NOW)
+    assert history.scores(NOW) == pytest.approx({WEB: before[WEB]})
+    assert os.path.getsize(history.path) < size
+    assert history.scores(NOW + HALF_LIFE)[WEB] == pytest.approx(before[WEB] / 2)
+
+def test_record_compacts_when_full(tmp_path):
+    """Test that the file is compacted once it outgrows its size limit."""
+    history = History(str(tmp_path / "history"), max_size=200)
+    for _ in range(10):
+        history.record(WEB, 1.0)
+    assert os.path.getsize(history.path) <= 200
+    assert history.scores()[WEB] == pytest.approx(10, rel=1e-3)
+
+@pytest.mark.skipif(os.name == 'nt', reason="no flock")
+def test_record_during_compaction_kept(history):
+    """Test that a record appended by another invocation while compacting is not lost."""
+    history.record(WEB, 1.0, timestamp=NOW)
+    other = History(history.path)
+    read = History._read
+    appender = threading.Thread(target=other.record, args=(DB, 1.0, NOW))
+
+    def read_then_append(self):
+        records = read(self)
+        if appender.ident is None:
+            appender.start()
+            time.sleep(0.2)
+        return records
+
+    with patch.object(History, '_read', read_then_append):
+        history.compact(NOW)
+    appender.join()
+    assert set(history.scores(NOW)) == {WEB, DB}
+
+def test_torn_record_ignored(history):
+    """Test that a partially written record is skipped."""
+    history.record(WEB, 1.0, timestamp=NOW)
+    with open(history.path, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+    assert list(history.scores(NOW)) == [WEB]
+
+def test_rank_and_most_likely(history, make_server):
+    """Test ordering servers by frecency."""
+    servers = [make_server(uuid=None), make_server(uuid=DB), make_server(uuid=WEB), make_server(uuid="not-a-uuid")]
+    assert history.most_likely(servers) is None
+    history.record(WEB, 1.0)
+    history.record(WEB, 1.0)
+    history.record(DB, 1.0)
+    history.record("not-a-uuid", 1.0)
+    assert history.rank(servers) == [servers[2], servers[1], servers[0], servers[3]]
+    assert history.most_likely(servers) is servers[2]
@@ -0,0 +1,96 @@
+"""Tests for hostkeys module."""
+import hmac
+import base64
+import hashlib
+import pytest
+from unittest.mock import MagicMock
+import paramiko
+from keepass_ssh.hostkeys import KnownHosts, KnownHostsPolicy, hash_host, host_key_name, update_known_hosts
+
+def key(name, data):
+    """Create a key stub with type and base64 text."""
+    return MagicMock(get_name=MagicMock(return_value=name), get_base64=MagicMock(return_value=data))
+
+def hashed(host, salt=b'0123456789abcdefghij'):
+    """Hash a host name as done by ssh-keygen -H."""
+    digest = hmac.new(salt, host.encode(), hashlib.sha1).digest()
+    return f"|1|{base64.b64encode(salt).decode()}|{base64.b64encode(digest).decode()}"
+
+@pytest.fixture
+def known_hosts(tmp_path):
+    """Write a known_hosts file with plain, hashed, revoked and pattern entries."""
+    path = tmp_path / 'known_hosts'
+    path.write_text(
+        "# comment\n"
+        "web1,10.0.0.1 ssh-ed25519 AAAAweb1\n"
+        "[web2]:2222 ssh-rsa AAAAweb2\n"
+        f"{hashed('db1')} ssh-ed25519 AAAAdb1\n"
+        "*.example.com ssh-rsa AAAApattern\n"
+        "@cert-authority * ssh-rsa AAAAca\n"
+        "@revoked * ssh-ed25519 AAAAold\n"
+        "old ssh-ed25519 AAAAold\n"
+        "broken\n"
+    )
+    return KnownHosts([str(path), str(tmp_path / 'missing')])
+
+def test_host_key_name():
+    """Test formatting hosts with non-default ports."""
+    assert host_key_name('web1') == 'web1'
+    assert host_key_name('web2', 2222) == '[web2]:2222'
+
+def test_lookup(known_hosts):
+    """Test plain and hashed lookups."""
+    assert known_hosts.lookup('10.0.0.1') == {('ssh-ed25519', 'AAAAweb1')}
+    assert known_hosts.lookup('[web2]:2222') == {('ssh-rsa', 'AAAAweb2')}
+    assert known_hosts.lookup('db1') == {('ssh-ed25519', 'AAAAdb1')}
+    assert known_hosts.lookup('www.example.com') == set()
+
+def test_check(known_hosts):
+    """Test matching keys and rejecting changed or revoked keys."""
+    assert known_hosts.check('web1', key('ssh-ed25519', 'AAAAweb1'))
+    assert not known_hosts.check('web1', key('ssh-ed25519', 'AAAAother'))
+    assert not known_hosts.check('old', key('ssh-ed25519', 'AAAAold'))
+
+def test_policy(known_hosts):
+    """Test that the policy only accepts known keys."""
+    policy = KnownHostsPolicy(known_hosts)
+    policy.missing_host_key(None, 'db1', key('ssh-ed25519', 'AAAAdb1'))
+    with pytest.raises(paramiko.SSHException):
+        policy.missing_host_key(None, 'db2', key('ssh-ed25519', 'AAAAdb1'))
+
+def test_hash_host():
+    """Test that hashed names match the host only."""
+    field = hash_host('web1', b'0123456789abcdefghij')
+    assert field == hashed('web1')
+    known = KnownHosts([])
+    known._add_line(f"{hash_host('web1')} ssh-ed25519 AAAAweb1")
+    assert known.lookup('web1') == {('ssh-ed25519', 'AAAAweb1')}
+    assert known.lookup('web2') == set()
+
+def test_update_known_hosts(tmp_path):
+    """Test that only new and changed keys are written, hashed and without duplicates."""
+    path = tmp_path / 'known_hosts'
+    path.write_text(
+        f"{hashed('db1')} ssh-ed25519 AAAAdb1\n"
+        f"{hashed('db2')} ssh-ed25519 AAAAold\n"
+        "other ssh-rsa AAAAother\n"
+        "other ssh-rsa AAAAother\n"
+    )
+    status = update_known_hosts(str(path), {
+        'db1': ('ssh-ed25519', 'AAAAdb1'),
+        'db2': ('ssh-ed25519', 'AAAAnew'),
+        '[db3]:2222': ('ecdsa-sha2-nistp256', 'AAAAdb3')
+    })
+    assert status == {'db1': 'unchanged', 'db2': 'changed', '[db3]:2222': 'added'}
+    
+    lines = path.read_text().splitlines()
+    assert len(lines) == 4
+    assert all(line.startswith('|1|') for line in lines if not line.startswith('other'))
+    known = KnownHosts([str(path)])
+    assert known.lookup('db2') == {('ssh-ed25519', 'AAAAnew')}
+    assert known.lookup('[db3]:2222') == {('ecdsa-sha2-nistp256', 'AAAAdb3')}
+    assert path.stat().st_mode & 0o777 == 0o600
+    
+    mtime = path.stat().st_mtime_ns
+    assert set(update_known_hosts(str(path), {'db2': ('ssh-ed25519', 'AAAAnew')}).values()) == {'unchanged'}
+    assert path.stat().st_mtime_ns == mtime
@@ -0,0 +1,115 @@
+"""Tests for index module."""
+import os
+import pytest
+from unittest.mock import Mock, patch
+from keepass_ssh.index import MetadataIndex, refresh_index
+from keepass_ssh.database import EntryRecord, GroupNotFoundError
+
+@pytest.fixture
+def db_file(tmp_path):
+    """Create a fake database file."""
+    path = tmp_path / "test.kdbx"
+    path.write_bytes(b"database content")
+    return path
+
+@pytest.fixture
+def records():
+    """Create test entry records."""
+    return [
+        EntryRecord(uuid="1", title="Root Server", username="root", password="secret",
+                    url="root.server.com", notes="", group=""),
+        EntryRecord(uuid="2", title="Web Server", username="web", password="secret",
+                    url="web.server.com:2222", notes="Web", group="Servers/Production", tags=["nginx"]),
+    ]
+
+@pytest.fixture
+def index(tmp_path, db_file, records):
+    """Create a saved metadata index."""
+    index = MetadataIndex(str(db_file), cache_dir=str(tmp_path / "cache"))
+    index.save(records, ["", "Servers", "Servers/Production"],
+               group_uuids={"0b6c5f1e-58b5-4d0c-9a47-3b6f0e4ac0d1": "Servers/Production"})
+    return index
+
+def test_index_skips_passwords(index):
+    """Test that passwords are never written to the index."""
+    with open(index.path) as f:
+        assert "secret" not in f.read()
+    assert all(record.password is None for record in index.get_entries())
+
+def test_index_file_permissions(index):
+    """Test that the index is readable by the owner only."""
+    assert os.stat(index.path).st_mode & 0o777 == 0o600
+
+def test_get_entries_by_group(index):
+    """Test filtering indexed entries by group."""
+    assert [r.title for r in index.get_entries("root")] == ["Root Server"]
+    assert [r.title for r in index.get_entries("/Servers/Production")] == ["Web Server"]
+    assert index.get_entries("Servers") == []
+    assert len(index.get_entries()) == 2
+
+def test_get_entries_group_not_found(index):
+    """Test error when group is not indexed."""
+    with pytest.raises(GroupNotFoundError):
+        index.get_entries("Missing")
+
+def test_get_entries_by_group_uuid(index):
+    """Test that groups given by UUID resolve like in the database."""
+    entries = index.get_entries("0B6C5F1E58B54D0C9A473B6F0E4AC0D1")
+    assert [entry.title for entry in entries] == ["Web Server"]
+    with pytest.raises(GroupNotFoundError):
+        index.get_entries("7d1b1a8e-2f4c-4b8e-8f3a-5a2c9e1d4b60")
+
+def test_index_stale_after_change(index, db_file):
+    """Test that changed database content invalidates the index."""
+    db_file.write_bytes(b"changed database content")
+    assert index.get_entries() is None
+
+def test_index_survives_touch(index, db_file):
+    """Test that a new mtime with unchanged content keeps the index."""
+    stat = db_file.stat()
+    os.utime(db_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert len(index.get_entries()) == 2
+
+def test_index_missing_database(tmp_path):
+    """Test that no index is used for a missing database."""
+    index = MetadataIndex(str(tmp_path / "missing.kdbx"), cache_dir=str(tmp_path))
+    assert index.get_entries() is None
+
+def test_search_index(index):
+    """Test that the search index is saved with the metadata index."""
+    search_index = index.get_search_index()
+    assert search_index.search("nginx") == ["2"]
+    assert search_index.search("server") == ["1", "2"]
+
+def test_search_index_stale_after_change(index, db_file):
+    """Test that the search index is not used for a changed database."""
+    db_file.write_bytes(b"changed database content")
+    assert index.get_search_index() is None
+
+def test_search_index_truncated(index):
+    """Test that a truncated search index file is not used."""
+    with open(index.search_path, "rb") as f:
+        data = f.read()
+    with open(index.search_path, "wb") as f:
+        f.write(data[:-4])
+    assert index.get_search_index() is None
+
+def test_refresh_index(db_file, records):
+    """Test rebuilding the index from an opened database."""
+    db = Mock()
+    db.get_records.return_value = records
+    db.get_group_paths.return_value = ["", "Servers", "Servers/Production"]
+    db.get_group_uuids.return_value = {}
+    with patch("keepass_ssh.index.MetadataIndex") as index_class:
+        refresh_index(db, str(db_file))
+        refresh_index(db, str(db_file) + ".missing")
+    index_class.assert_called_once_with(str(db_file))
+    index_class.return_value.save.assert_called_once_with(
+        records, ["", "Servers", "Servers/Production"], group_uuids={})
+
+def test_refresh_index_write_error(db_file, caplog):
+    """Test that a failed index write is only logged."""
+    with patch("keepass_ssh.index.MetadataIndex") as index_class:
+        index_class.return_value.save.side_effect = OSError("read-only")
+        refresh_index(Mock(), str(db_file))
+    assert "Could not write metadata index" in caplog.text
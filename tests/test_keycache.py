@@ -0,0 +1,76 @@
+"""Tests for keycache module."""
+import os
+import struct
+import pytest
+from unittest.mock import patch
+from keepass_ssh.keycache import KeyCache, read_header, KDBX_SIGNATURE
+
+TRANSFORMED_KEY = bytes(range(32))
+
+def kdbx4_header(seed: bytes) -> bytes:
+    """Build a minimal KDBX4 outer header."""
+    fields = b''
+    for field_id, value in ((4, seed), (0, b'\r\n\r\n')):
+        fields += struct.pack('<BI', field_id, len(value)) + value
+    return KDBX_SIGNATURE + struct.pack('<HH', 0, 4) + fields
+
+@pytest.fixture
+def db_file(tmp_path):
+    """Create a fake database file with a header and payload."""
+    path = tmp_path / "test.kdbx"
+    path.write_bytes(kdbx4_header(b'A' * 32) + b'encrypted payload')
+    return path
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create a file backed key cache."""
+    return KeyCache('file', ttl=60, cache_dir=str(tmp_path / "cache"))
+
+def test_read_header(db_file):
+    """Test reading the outer header without the payload."""
+    assert read_header(str(db_file)) == kdbx4_header(b'A' * 32)
+
+def test_read_header_invalid(tmp_path):
+    """Test error for files that are not KeePass databases."""
+    path = tmp_path / "plain.txt"
+    path.write_bytes(b'not a database')
+    with pytest.raises(ValueError):
+        read_header(str(path))
+
+def test_cache_roundtrip(cache, db_file):
+    """Test caching and reading back a transformed key."""
+    assert cache.get(str(db_file)) is None
+    cache.put(str(db_file), None, TRANSFORMED_KEY)
+    assert cache.get(str(db_file)) == TRANSFORMED_KEY
+    assert cache.get(str(db_file), "other.keyx") is None
+
+def test_cache_file_permissions(cache, db_file):
+    """Test that cached keys are readable by the owner only."""
+    cache.put(str(db_file), None, TRANSFORMED_KEY)
+    path = os.path.join(cache.backend.directory, os.listdir(cache.backend.directory)[0])
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+def test_cache_invalidated_by_header_change(cache, db_file):
+    """Test that a new header, e.g. a rotated KDF seed, invalidates the key."""
+    cache.put(str(db_file), None, TRANSFORMED_KEY)
+    db_file.write_bytes(kdbx4_header(b'B' * 32) + b'encrypted payload')
+    assert cache.get(str(db_file)) is None
+
+def test_cache_expired(tmp_path, db_file):
+    """Test that keys expire after the TTL."""
+    cache = KeyCache('file', ttl=-1, cache_dir=str(tmp_path))
+    cache.put(str(db_file), None, TRANSFORMED_KEY)
+    assert cache.get(str(db_file)) is None
+
+def test_keyring_backend(db_file):
+    """Test storing keys in the kernel keyring through keyctl."""
+    cache = KeyCache('keyring', ttl=60)
+    with patch('keepass_ssh.keycache._KeyringBackend._keyctl', return_value=b'123\n') as mock_keyctl:
+        cache.put(str(db_file), None, TRANSFORMED_KEY)
+    assert mock_keyctl.call_args_list[0].args[:2] == ('padd', 'user')
+    mock_keyctl.assert_called_with('timeout', '123', '60')
+
+def test_unknown_backend():
+    """Test error for unknown backends."""
+    with pytest.raises(ValueError):
+        KeyCache('unknown')
@@ -0,0 +1,94 @@
+"""Tests for keyscan module."""
+import socket
+import threading
+import contextlib
+import pytest
+from unittest.mock import Mock, patch
+import paramiko
+from keepass_ssh.hostkeys import KnownHosts
+from keepass_ssh.keyscan import KeyScanner, ScanResult, format_summary
+
+def closed_port():
+    """Get a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def ssh_server():
+    """Run a local SSH server answering key exchanges, yield its port and key."""
+    host_key = paramiko.ECDSAKey.generate()
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    transports = []
+
+    def serve():
+        while True:
+            try:
+                sock, _ = listener.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(sock)
+            transport.add_server_key(host_key)
+            transport.start_server(server=paramiko.ServerInterface())
+            transports.append(transport)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield listener.getsockname()[1], host_key
+    listener.close()
+    for transport in transports:
+        transport.close()
+
+def test_scan_writes_known_hosts(ssh_server, tmp_path, make_server):
+    """Test that keys are fetched once per host and written to known_hosts."""
+    port, host_key = ssh_server
+    path = str(tmp_path / 'known_hosts')
+    servers = [make_server('a', '127.0.0.1', port), make_server('b', '127.0.0.1', port),
+               make_server('c', '127.0.0.1', closed_port())]
+    
+    results = KeyScanner(timeout=5).scan(servers, path)
+    assert [result.status for result in results] == ['added', 'failed']
+    assert results[0].key == (host_key.get_name(), host_key.get_base64())
+    assert KnownHosts([path]).check(f'[127.0.0.1]:{port}', host_key)
+    
+    results = KeyScanner(timeout=5).scan(servers[:1], path)
+    assert results[0].status == 'unchanged'
+
+def test_scan_through_jump_host(ssh_server, tmp_path, make_server):
+    """Test that servers behind a jump host are scanned over a tunnel from the pool."""
+    port, host_key = ssh_server
+    target = make_server('a', '10.0.0.5', 22)
+    target.jump = 'bastion'
+    pool = Mock()
+    create_connection = socket.create_connection
+    pool.tunnel.side_effect = lambda server: contextlib.closing(create_connection(('127.0.0.1', port)))
+
+    with patch('keepass_ssh.keyscan.socket.create_connection') as mock_connect:
+        results = KeyScanner(timeout=5, pool=pool).scan([target], str(tmp_path / 'known_hosts'))
+    mock_connect.assert_not_called()
+    pool.tunnel.assert_called_once_with(target)
+    assert results == [ScanResult('10.0.0.5', (host_key.get_name(), host_key.get_base64()), 'added')]
+
+def test_scan_uses_resolver(tmp_path):
+    """Test that hosts are contacted at their resolved address."""
+    scanner = KeyScanner(resolver=Mock())
+    scanner.resolver.getaddrinfo.return_value = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', 22))]
+    with patch('keepass_ssh.keyscan.socket.create_connection', side_effect=ConnectionRefusedError()) as mock_connect:
+        result = scanner.scan_host('web.example', 22)
+    mock_connect.assert_called_once_with(('192.0.2.1', 22), scanner.timeout)
+    assert result == ScanResult('web.example', None, error='ConnectionRefusedError')
+
+def test_format_summary():
+    """Test that changed keys and failures are listed."""
+    results = [
+        ScanResult('web1', ('ssh-ed25519', 'AAAA'), 'unchanged'),
+        ScanResult('web2', ('ssh-rsa', 'AAAB'), 'changed'),
+        ScanResult('[web3]:2222', None, error='timed out'),
+    ]
+    assert format_summary(results) == (
+        "0 added, 1 changed, 1 unchanged, 1 failed\n"
+        "  changed: web2 ssh-rsa\n"
+        "  failed: [web3]:2222: timed out"
+    )
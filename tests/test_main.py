@@ -1,11 +1,36 @@
 import os
+import json
 import sys
+import subprocess
 import pytest
 from unittest.mock import patch, MagicMock
 import argparse
 
+from keepass_ssh import timing
 from keepass_ssh.cli import KeePassSSHCLI, main
 from keepass_ssh.server import ServerEntry
+from keepass_ssh.database import EntryRecord, DatabaseError, GroupNotFoundError
+from keepass_ssh.multidb import DatabaseSource, LoadResult
+from keepass_ssh.search import Matches, SearchIndex
+
+# Cold import budget of the entry point, well above the ~100ms it takes
+IMPORT_BUDGET_US = 200_000
+HEAVY_MODULES = ('pykeepass', 'lxml', 'argon2', 'Cryptodome', 'paramiko', 'dotenv', 'colorama')
+
+def import_times(*args):
+    """Run the interpreter with -X importtime and map modules to cumulative microseconds."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        capture_output=True, text=True, timeout=60,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, module = line.split('|')
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
 
 class TestMainModule:
     @pytest.fixture
@@ -20,7 +45,7 @@ def no_discovery_patch(self):
         """
         Fixture to prevent file auto-discovery in tests.
         """
-        with patch('keepass_ssh.cli.KeePassSSHCLI.find_keepass_files', return_value=(None, None)):
+        with patch('keepass_ssh.cli.KeePassSSHCLI.find_keepass_files', return_value=[]):
             yield
 
     @pytest.fixture
@@ -220,7 +245,7 @@ def test_parse_arguments_case_sensitivity(self, cli_instance, no_discovery_patch
             with pytest.raises(SystemExit):
                 cli_instance.parse_arguments()
 
-    @patch('keepass_ssh.cli.KeePassSSHCLI.find_keepass_files', return_value=('/path/to/test.kdbx', '/path/to/test.keyx'))
+    @patch('keepass_ssh.cli.KeePassSSHCLI.find_keepass_files', return_value=[('/path/to/test.kdbx', '/path/to/test.keyx')])
     @patch('os.path.exists', return_value=True)
     @patch.dict('os.environ', clear=True)
     def test_parse_arguments_auto_discovery(self, mock_exists, mock_find, cli_instance, no_discovery_patch):
@@ -233,7 +258,7 @@ def test_parse_arguments_auto_discovery(self, mock_exists, mock_find, cli_instan
             assert args.key_file == '/path/to/test.keyx'
             assert args.group == 'root'
 
-    @patch('keepass_ssh.cli.KeePassSSHCLI.find_keepass_files', return_value=('/path/to/test.kdbx', '/path/to/test.keyx'))
+    @patch('keepass_ssh.cli.KeePassSSHCLI.find_keepass_files', return_value=[('/path/to/test.kdbx', '/path/to/test.keyx')])
     @patch('os.path.exists', return_value=True)
     @patch.dict('os.environ', {'KEEPASS_DB_PATH': '/custom/db.kdbx'}, clear=True)
     def test_parse_arguments_no_auto_discovery_with_env_vars(self, mock_exists, mock_find, cli_instance, no_discovery_patch):
@@ -255,7 +280,7 @@ def test_parse_arguments_no_auto_discovery_with_server_arg(self, cli_instance, m
         
         # Mock find_keepass_files to return the test database
         def mock_find_keepass_files():
-            return str(test_db_path), None
+            return [(str(test_db_path), None)]
         
         # Set up command-line arguments for server selection
         sys.argv = ['keepass-ssh-connect', '-s', 'mikr.us']
@@ -270,6 +295,143 @@ def mock_find_keepass_files():
         assert args.database == str(test_db_path)
         assert args.server == 'mikr.us'
 
+    @patch.dict('os.environ', {'KEEPASS_DB_PATH': 'db.kdbx', 'KEEPASS_SSH_FORMAT': 'json'}, clear=True)
+    def test_parse_arguments_format_from_environment(self, cli_instance, no_discovery_patch):
+        """
+        Test that the environment format only applies to modes writing records and never fails a connect.
+        """
+        with patch('sys.argv', ['keepass-ssh-connect', '-s', 'web']):
+            assert cli_instance.parse_arguments().format == 'text'
+        with patch('sys.argv', ['keepass-ssh-connect', '-l']):
+            assert cli_instance.parse_arguments().format == 'json'
+        with patch('sys.argv', ['keepass-ssh-connect', '-l', '--format', 'tsv']):
+            assert cli_instance.parse_arguments().format == 'tsv'
+        with patch('sys.argv', ['keepass-ssh-connect', '-s', 'web', '--format', 'json']), \
+             patch('sys.stderr'), \
+             pytest.raises(SystemExit):
+            cli_instance.parse_arguments()
+
+    @patch.dict('os.environ', clear=True)
+    def test_parse_arguments_multiple_databases(self, cli_instance, no_discovery_patch):
+        """
+        Test that repeated -d pairs databases with a shared key file or one key file each.
+        """
+        with patch('sys.argv', ['keepass-ssh-connect', '-d', 'a.kdbx', '-d', 'b.kdbx', '-k', 'shared.keyx']):
+            args = cli_instance.parse_arguments()
+        assert args.databases == [DatabaseSource('a.kdbx', 'shared.keyx'), DatabaseSource('b.kdbx', 'shared.keyx')]
+        assert (args.database, args.key_file) == ('a.kdbx', 'shared.keyx')
+        
+        with patch('sys.argv', ['keepass-ssh-connect', '-d', 'a.kdbx', '-d', 'b.kdbx', '-k', 'a.keyx', '-k', 'b.keyx']):
+            args = cli_instance.parse_arguments()
+        assert args.databases == [DatabaseSource('a.kdbx', 'a.keyx'), DatabaseSource('b.kdbx', 'b.keyx')]
+        
+        with patch('sys.argv', ['keepass-ssh-connect', '-d', 'a.kdbx', '-d', 'b.kdbx', '-d', 'c.kdbx', '-k', 'a.keyx', '-k', 'b.keyx']), \
+             patch('sys.stderr'), \
+             pytest.raises(SystemExit):
+            cli_instance.parse_arguments()
+        
+        with patch.dict('os.environ', {'KEEPASS_DB_PATH': os.pathsep.join(['a.kdbx', 'b.kdbx'])}), \
+             patch('sys.argv', ['keepass-ssh-connect']):
+            args = cli_instance.parse_arguments()
+        assert args.databases == [DatabaseSource('a.kdbx'), DatabaseSource('b.kdbx')]
+
+    def test_find_keepass_files_pairs_key_files(self, monkeypatch, tmp_path):
+        """
+        Test that every discovered database gets the key file of its name or the only other key file.
+        """
+        for name in ('team-a.kdbx', 'team-a.keyx', 'team-b.kdbx', 'team-c.kdbx', 'shared.keyx'):
+            (tmp_path / name).touch()
+        monkeypatch.chdir(tmp_path)
+        
+        assert KeePassSSHCLI.find_keepass_files() == [
+            ('team-a.kdbx', 'team-a.keyx'),
+            ('team-b.kdbx', 'shared.keyx'),
+            ('team-c.kdbx', 'shared.keyx')
+        ]
+
+    def test_load_merged_servers(self):
+        """
+        Test that databases missing from the index are loaded together and servers are tagged with their database.
+        """
+        cli = KeePassSSHCLI()
+        cli.databases = [DatabaseSource('a.kdbx', 'a.keyx'), DatabaseSource('b.kdbx'), DatabaseSource('c.kdbx')]
+        indexed = EntryRecord('uuid-a', 'web-a', 'user', None, 'host-a', '')
+        loaded = EntryRecord('uuid-b', 'web-b', 'user', 'secret', 'host-b', '')
+        results = [
+            LoadResult(cli.databases[1], [loaded], 0.1),
+            LoadResult(cli.databases[2], [], 0.1, 'Error opening KeePass database: wrong key')
+        ]
+        
+        with patch('keepass_ssh.cli.os.path.exists', return_value=True), \
+             patch('keepass_ssh.cli.MetadataIndex') as mock_index, \
+             patch('keepass_ssh.cli.AgentClient.get_entries', return_value=None), \
+             patch('keepass_ssh.cli.load_databases', return_value=results) as mock_load, \
+             patch('builtins.print'):
+            mock_index.return_value.get_entries.side_effect = [[indexed], None, None]
+            servers = cli._load_servers(group_path='Servers')
+        
+        assert mock_load.call_args.args[:2] == (cli.databases[1:], 'Servers')
+        assert [(server.title, server.database, server.password) for server in servers] == [
+            ('web-a', 'a.kdbx', None),
+            ('web-b', 'b.kdbx', 'secret')
+        ]
+        
+        with patch('keepass_ssh.cli.os.path.exists', return_value=False), \
+             patch('keepass_ssh.cli.AgentClient.get_entries', return_value=None), \
+             patch('keepass_ssh.cli.load_databases', return_value=[LoadResult(source, [], 0.1, 'bad') for source in cli.databases]), \
+             patch('builtins.print'), \
+             pytest.raises(DatabaseError):
+            cli._load_servers(group_path='Servers')
+
+    def test_load_merged_servers_group_missing_from_one_database(self):
+        """
+        Test that a database without the group is reported as an error while the others are still loaded.
+        """
+        cli = KeePassSSHCLI()
+        cli.databases = [DatabaseSource('t.kdbx'), DatabaseSource('u.kdbx')]
+        indexed = EntryRecord('uuid-t', 'web-t', 'user', None, 'host-t', '', 'prod')
+        
+        with patch('keepass_ssh.cli.os.path.exists', return_value=True), \
+             patch('keepass_ssh.cli.MetadataIndex') as mock_index, \
+             patch('keepass_ssh.cli.load_databases', return_value=[]) as mock_load, \
+             patch('builtins.print') as mock_print:
+            mock_index.return_value.get_entries.side_effect = [[indexed], GroupNotFoundError('Group prod not found')]
+            servers = cli._load_servers(group_path='prod')
+        
+        assert mock_load.call_args.args[0] == []
+        assert [(server.title, server.database) for server in servers] == [('web-t', 't.kdbx')]
+        mock_print.assert_called_once_with('Error: u.kdbx: Group prod not found', file=sys.stderr)
+        
+        with patch('keepass_ssh.cli.os.path.exists', return_value=False), \
+             patch('keepass_ssh.cli.AgentClient.get_entries', side_effect=GroupNotFoundError('Group prod not found')), \
+             patch('keepass_ssh.cli.load_databases', return_value=[]), \
+             patch('builtins.print'), \
+             pytest.raises(DatabaseError):
+            cli._load_servers(group_path='prod')
+
+    def test_fetch_merged_passwords(self):
+        """
+        Test that passwords are fetched from the database of every server.
+        """
+        cli = KeePassSSHCLI()
+        cli.databases = [DatabaseSource('a.kdbx', 'a.keyx'), DatabaseSource('b.kdbx', 'b.keyx')]
+        servers = [
+            ServerEntry(title=f'web{i}', username='user', password=None, url='host', hostname='host', port=22,
+                        description='', uuid=f'uuid-{i}', database=path)
+            for i, path in enumerate(['a.kdbx', 'b.kdbx', 'a.kdbx'])
+        ]
+        passwords = [{'uuid-0': 'pass0', 'uuid-2': 'pass2'}, {'uuid-1': 'pass1'}]
+        
+        with patch('keepass_ssh.cli.AgentClient.get_entry', return_value=None), \
+             patch('keepass_ssh.cli.fetch_passwords', return_value=passwords) as mock_fetch:
+            cli._fetch_passwords(servers)
+        
+        assert mock_fetch.call_args.args[0] == [
+            (cli.databases[0], ['uuid-0', 'uuid-2']),
+            (cli.databases[1], ['uuid-1'])
+        ]
+        assert [server.password for server in servers] == ['pass0', 'pass1', 'pass2']
+
     @patch.dict('os.environ', clear=True)
     def test_parse_arguments_default_group(self, cli_instance, no_discovery_patch):
         """
@@ -360,6 +522,71 @@ def test_filter_servers_case_insensitive(self):
         assert len(filtered_servers) == 1
         assert filtered_servers[0].title == 'Production-Server'
 
+    def test_filter_servers_ranked_scan(self):
+        """
+        Test server filtering across fields by scanning servers, without typo tolerance.
+        """
+        cli = KeePassSSHCLI()
+        servers = [
+            ServerEntry(title='db-server', username='user1', password='pass1', hostname='db.prod', url='db.prod', port=22, description='notes1'),
+            ServerEntry(title='production-server', username='user2', password='pass2', hostname='web.prod', url='web.prod', port=22, description='notes2')
+        ]
+        
+        assert cli._filter_servers(servers, 'server db') == [servers[0]]
+        assert cli._filter_servers(servers, 'prod') == servers
+        assert cli._filter_servers(servers, 'prodution') == []
+        assert not cli.typo_matches
+
+    def test_filter_servers_reuses_metadata_index(self):
+        """
+        Test that the search index saved with the metadata index is reused, with typo tolerance.
+        """
+        cli = KeePassSSHCLI()
+        records = [
+            EntryRecord('1', 'production-server', 'user1', None, 'web.prod', ''),
+            EntryRecord('2', 'production-db', 'user2', None, 'db.prod', '', 'Other')
+        ]
+        servers = [
+            ServerEntry(title='production-server', username='user1', password=None, hostname='web.prod', url='web.prod', port=22, description='', uuid='1'),
+        ]
+        cli.metadata_index = MagicMock(get_search_index=MagicMock(return_value=SearchIndex.from_records(records)))
+        
+        assert cli._filter_servers(servers, 'production-db') == []
+        assert cli._filter_servers(servers, 'prodution') == servers
+        assert cli.typo_matches
+
+    def test_filter_servers_asks_agent(self):
+        """
+        Test that servers served by the unlock agent are searched by the agent.
+        """
+        cli = KeePassSSHCLI()
+        cli.agent_database = 'test.kdbx'
+        servers = [
+            ServerEntry(title=f'web-{i}', username='user', password=None, hostname=f'host{i}', url=f'host{i}', port=22, description='', uuid=str(i))
+            for i in range(2)
+        ]
+        
+        with patch('keepass_ssh.cli.AgentClient.search', return_value=([], Matches({'9': 2.0, '1': 1.0, '0': 0.6}))) as mock_search:
+            assert cli._filter_servers(servers, 'web') == [servers[1], servers[0]]
+        
+        mock_search.assert_called_once_with('test.kdbx', 'web')
+
+    def test_select_typo_match_is_listed(self):
+        """
+        Test that a single server matched only with typos is listed instead of connected to.
+        """
+        cli = KeePassSSHCLI()
+        servers = [
+            ServerEntry(title='production', username='user', password='pass', hostname='host', url='host', port=22, description='')
+        ]
+        cli.typo_matches = True
+        
+        with patch('builtins.input', return_value='1') as mock_input, \
+             patch('keepass_ssh.cli.ServerManager.list_servers'):
+            assert cli._list_and_select_server(servers, 'prodution') == servers[0]
+        
+        mock_input.assert_called_once()
+
     def test_list_and_select_server_valid_selection(self):
         """
         Test interactive server selection with a valid input.
@@ -377,4 +604,398 @@ def test_list_and_select_server_valid_selection(self):
         assert selected_server == servers[0]
         mock_print.assert_called()
 
+    def test_list_and_select_server_paged(self):
+        """
+        Test that long lists are shown a page at a time and a number typed at a page prompt selects.
+        """
+        cli = KeePassSSHCLI()
+        servers = [
+            ServerEntry(title=f'Server{i}', username='user', password='pass', hostname=f'host{i}', url=f'host{i}', port=22, description='')
+            for i in range(10)
+        ]
+        
+        with patch('keepass_ssh.cli.ServerManager.terminal_size', return_value=os.terminal_size((80, 6))), \
+             patch('sys.stdin.isatty', return_value=True), \
+             patch('keepass_ssh.cli.ServerManager.list_servers') as mock_list, \
+             patch('builtins.input', side_effect=['', '7']) as mock_input:
+            selected_server = cli._list_and_select_server(servers)
+        
+        assert selected_server == servers[6]
+        assert [call.args[2] for call in mock_list.call_args_list] == [1, 5]
+        assert mock_list.call_args_list[1].args[0] == servers[4:8]
+        assert mock_input.call_count == 2
+
+    def test_list_and_select_server_paged_eof(self):
+        """
+        Test that EOF or Ctrl-C at a page prompt ends the selection like at the selection prompt.
+        """
+        cli = KeePassSSHCLI()
+        servers = [
+            ServerEntry(title=f'Server{i}', username='user', password='pass', hostname=f'host{i}', url=f'host{i}', port=22, description='')
+            for i in range(10)
+        ]
+        
+        for interrupt in (EOFError, KeyboardInterrupt):
+            with patch('keepass_ssh.cli.ServerManager.terminal_size', return_value=os.terminal_size((80, 6))), \
+                 patch('sys.stdin.isatty', return_value=True), \
+                 patch('keepass_ssh.cli.ServerManager.list_servers') as mock_list, \
+                 patch('builtins.input', side_effect=interrupt) as mock_input, \
+                 patch('builtins.print') as mock_print:
+                assert cli._list_and_select_server(servers) is None
+            
+            mock_list.assert_called_once()
+            mock_input.assert_called_once()
+            mock_print.assert_called_with("Invalid selection")
+
+    def test_list_and_select_single_match_unlisted(self):
+        """
+        Test that a filter matching one server selects it without listing.
+        """
+        cli = KeePassSSHCLI()
+        servers = [ServerEntry(title='Server1', username='user1', password='pass1', hostname='host1', url='host1', port=22, description='')]
+        
+        with patch('keepass_ssh.cli.ServerManager.list_servers') as mock_list:
+            assert cli._list_and_select_server(servers, 'Server1') == servers[0]
+        mock_list.assert_not_called()
+
+    def test_list_servers_from_agent(self):
+        """
+        Test that entries served by the unlock agent skip opening the database.
+        """
+        cli = KeePassSSHCLI()
+        record = EntryRecord(uuid='1', title='Server1', username='user1', password='pass1',
+                             url='host1:2222', notes='notes1')
+
+        with patch('keepass_ssh.cli.AgentClient.get_entries', return_value=[record]), \
+             patch('keepass_ssh.cli.KeePassDatabase') as mock_db, \
+             patch('builtins.print'):
+            servers = cli.list_servers(db_path='Passwords.kdbx')
+
+        mock_db.assert_not_called()
+        assert servers[0].title == 'Server1'
+        assert servers[0].port == 2222
+
+    def test_list_servers_agent_fallback(self):
+        """
+        Test that the database is opened directly when no agent answers.
+        """
+        cli = KeePassSSHCLI()
+        entry = MagicMock(title='Server1', username='user1', password='pass1', url='host1', notes='')
+
+        with patch('keepass_ssh.cli.AgentClient.get_entries', return_value=None), \
+             patch('keepass_ssh.cli.KeePassDatabase') as mock_db, \
+             patch('builtins.print'):
+            mock_db.return_value.get_entries.return_value = [entry]
+            servers = cli.list_servers(db_path='Passwords.kdbx', key_path='key.keyx')
+
+        mock_db.assert_called_once_with('Passwords.kdbx', 'key.keyx', key_cache=None)
+        assert servers[0].hostname == 'host1'
+
+    def test_list_servers_stream(self):
+        """
+        Test that stream mode extracts the group without a full database load.
+        """
+        cli = KeePassSSHCLI()
+        cli.stream = True
+        record = EntryRecord(uuid='1', title='Server1', username='user1', password='pass1',
+                             url='host1', notes='', group='Servers')
+        stats = MagicMock(entries=1, elapsed=0.1, peak_memory=None)
+
+        with patch('keepass_ssh.cli.AgentClient.get_entries', return_value=None), \
+             patch('keepass_ssh.cli.stream_records', return_value=([record], stats)) as mock_stream, \
+             patch('keepass_ssh.cli.KeePassDatabase') as mock_db, \
+             patch('builtins.print'):
+            servers = cli.list_servers(db_path='Passwords.kdbx', group_path='Servers', key_path='key.keyx')
+
+        mock_stream.assert_called_once_with('Passwords.kdbx', 'key.keyx', 'Servers', key_cache=None)
+        mock_db.assert_not_called()
+        assert servers[0].password == 'pass1'
+
+    def test_connect_fetches_password_for_indexed_server(self, tmp_path):
+        """
+        Test that servers listed from the metadata index get their password before connecting.
+        """
+        cli = KeePassSSHCLI()
+        db_path = tmp_path / 'Passwords.kdbx'
+        db_path.touch()
+        record = EntryRecord(uuid='1', title='Server1', username='user1', password=None,
+                             url='host1', notes='', group='')
+
+        with patch('keepass_ssh.cli.MetadataIndex.get_entries', return_value=[record]), \
+             patch('keepass_ssh.cli.AgentClient.get_entry', return_value=None), \
+             patch('keepass_ssh.cli.KeePassDatabase') as mock_db, \
+             patch('keepass_ssh.cli.SSHConnector.connect') as mock_connect, \
+             patch('builtins.print'):
+            mock_db.return_value.find_entry.return_value = MagicMock(password='pass1')
+            cli.connect_to_server(db_path=str(db_path), server_filter='Server1')
+
+        mock_db.return_value.find_entry.assert_called_once_with('1')
+        assert mock_connect.call_args.args[0].password == 'pass1'
+
+    def test_connect_key_auth_server_opens_database_once(self, tmp_path):
+        """
+        Test that a server read from the database without password is not read again.
+        """
+        cli = KeePassSSHCLI()
+        db_path = tmp_path / 'Passwords.kdbx'
+        db_path.touch()
+        entry = MagicMock(title='Server1', username='user1', password=None, url='host1', notes='', uuid='1')
+
+        with patch('keepass_ssh.cli.MetadataIndex.get_entries', return_value=None), \
+             patch('keepass_ssh.cli.MetadataIndex.save'), \
+             patch('keepass_ssh.cli.AgentClient.get_entries', return_value=None), \
+             patch('keepass_ssh.cli.AgentClient.get_entry') as mock_get_entry, \
+             patch('keepass_ssh.cli.KeePassDatabase') as mock_db, \
+             patch('keepass_ssh.cli.SSHConnector.connect') as mock_connect, \
+             patch('builtins.print'):
+            mock_db.return_value.get_entries.return_value = [entry]
+            cli.connect_to_server(db_path=str(db_path), server_filter='Server1')
+
+        mock_db.assert_called_once()
+        mock_db.return_value.find_entry.assert_not_called()
+        mock_get_entry.assert_not_called()
+        assert mock_connect.call_args.args[0].password is None
+
+    def test_run_command_fetches_passwords_once(self, tmp_path):
+        """
+        Test that --exec fetches missing passwords with a single database open.
+        """
+        cli = KeePassSSHCLI()
+        db_path = tmp_path / 'Passwords.kdbx'
+        db_path.touch()
+        records = [
+            EntryRecord(uuid=str(i), title=f'Server{i}', username='user', password=None,
+                        url=f'host{i}', notes='', group='')
+            for i in range(3)
+        ]
+        
+        with patch('keepass_ssh.cli.MetadataIndex.get_entries', return_value=records), \
+             patch('keepass_ssh.cli.AgentClient.get_entry', return_value=None), \
+             patch('keepass_ssh.cli.KeePassDatabase') as mock_db, \
+             patch('keepass_ssh.batch.BatchExecutor.run', return_value=[]) as mock_run, \
+             patch('builtins.print'):
+            mock_db.return_value.find_entry.side_effect = lambda uuid: MagicMock(password=f'pass{uuid}')
+            cli.run_command('uptime', db_path=str(db_path), server_filter='Server')
+        
+        mock_db.assert_called_once()
+        servers, command = mock_run.call_args.args
+        assert command == 'uptime'
+        assert [server.password for server in servers] == ['pass0', 'pass1', 'pass2']
+
+    def test_export_ssh_config_incremental(self, tmp_path, monkeypatch):
+        """
+        Test that the ssh_config export skips servers with passwords and the database when unchanged.
+        """
+        monkeypatch.setenv('KEEPASS_SSH_CACHE_DIR', str(tmp_path / 'cache'))
+        cli = KeePassSSHCLI()
+        db_path = tmp_path / 'Passwords.kdbx'
+        db_path.write_bytes(b'content')
+        path = tmp_path / 'keepass-ssh.conf'
+        servers = [
+            ServerEntry(title='web1', username='user1', password='', hostname='host1', url='host1', port=22, description=''),
+            ServerEntry(title='web2', username='user2', password='pass2', hostname='host2', url='host2', port=22, description=''),
+        ]
+        
+        with patch.object(KeePassSSHCLI, '_load_targets', return_value=servers) as mock_targets, \
+             patch('builtins.print'):
+            assert cli.export_ssh_config(str(path), db_path=str(db_path))
+            assert not cli.export_ssh_config(str(path), db_path=str(db_path))
+        
+        mock_targets.assert_called_once()
+        text = path.read_text()
+        assert 'Host web1\n    HostName host1\n' in text
+        assert 'host2' not in text
+        assert path.stat().st_mode & 0o777 == 0o600
+
+    def test_main_list_ndjson(self, cli_instance, no_discovery_patch, capsysbinary):
+        """
+        Test that --format ndjson writes one record per matching server and messages to standard error.
+        """
+        servers = [
+            ServerEntry(title=f'web{i}', username='user', password='pass', hostname=f'host{i}', url=f'host{i}',
+                        port=22, description='')
+            for i in range(3)
+        ] + [ServerEntry(title='db1', username='user', password='pass', hostname='db1', url='db1', port=22, description='')]
+        
+        with patch('sys.argv', ['keepass-ssh-connect', '-l', '-s', 'web', '--format', 'ndjson', '-d', 'Passwords.kdbx']), \
+             patch.object(KeePassSSHCLI, '_load_servers', return_value=servers), \
+             patch('colorama.init') as mock_colorama, \
+             pytest.raises(SystemExit) as exc:
+            cli_instance.run()
+        
+        assert exc.value.code == 0
+        mock_colorama.assert_not_called()
+        records = [json.loads(line) for line in capsysbinary.readouterr().out.splitlines()]
+        assert [record['title'] for record in records] == ['web0', 'web1', 'web2']
+
+    def test_main_exec_exit_status(self, cli_instance, no_discovery_patch):
+        """
+        Test that --exec exits non-zero when any server fails.
+        """
+        with patch('sys.argv', ['keepass-ssh-connect', '--exec', 'uptime', '-d', 'Passwords.kdbx']), \
+             patch.object(KeePassSSHCLI, 'run_command', return_value=[MagicMock(ok=True), MagicMock(ok=False)]) as mock_run, \
+             pytest.raises(SystemExit) as exc:
+            cli_instance.run()
+        
+        assert exc.value.code == 1
+        assert mock_run.call_args.args == ('uptime',)
+
+    def test_main_put(self, cli_instance, no_discovery_patch, tmp_path):
+        """
+        Test that --put uploads to the matching servers and exits non-zero on failures.
+        """
+        source = tmp_path / 'app.conf'
+        source.write_text('setting = 1')
+        servers = [ServerEntry(title='web1', username='user1', password='pass1', hostname='host1', url='host1', port=22, description='')]
+        
+        with patch('sys.argv', ['keepass-ssh-connect', '--put', str(source), '/etc/app.conf', '-s', 'web', '--transfer-workers', '8']), \
+             patch.object(KeePassSSHCLI, '_load_targets', return_value=servers) as mock_targets, \
+             patch('keepass_ssh.transfer.FanoutTransfer.put', return_value=[MagicMock(ok=False, size=0)]) as mock_put, \
+             patch('builtins.print'), \
+             pytest.raises(SystemExit) as exc:
+            cli_instance.run()
+        
+        assert exc.value.code == 1
+        assert mock_targets.call_args.args[3] == 'web'
+        mock_put.assert_called_once_with(servers, str(source), '/etc/app.conf')
+
+    def test_main_timings(self, cli_instance, no_discovery_patch, tmp_path, capsys):
+        """
+        Test that --timings prints the phases and --timings-file appends them as a JSON line.
+        """
+        timings_file = tmp_path / 'timings.jsonl'
+        servers = [ServerEntry(title='web1', username='user1', password='pass1', hostname='host1', url='host1', port=22, description='')]
+        
+        with patch('sys.argv', ['keepass-ssh-connect', '-l', '--timings', '--timings-file', str(timings_file)]), \
+             patch.object(KeePassSSHCLI, '_load_servers', return_value=servers), \
+             pytest.raises(SystemExit) as exc:
+            cli_instance.run()
+        
+        assert exc.value.code == 0
+        assert 'render' in capsys.readouterr().err
+        record = json.loads(timings_file.read_text())
+        assert record['action'] == 'list'
+        assert [phase['name'] for phase in record['phases']] == ['environment', 'render']
+        assert timing.active() is None
+
+    def test_main_close_masters(self, cli_instance, no_discovery_patch):
+        """
+        Test that --masters close only closes masters matching --server.
+        """
+        from keepass_ssh.multiplex import Master
+        
+        masters = [
+            Master('/tmp/a', 'user@web1', 22, 'web-1', True),
+            Master('/tmp/b', 'user@db1', 22, 'db-1', True),
+            Master('/tmp/c', 'user@web2', 22, 'web-2', False)
+        ]
+        with patch('sys.argv', ['keepass-ssh-connect', '--masters', 'close', '-s', 'web']), \
+             patch('keepass_ssh.cli.ControlMasters.list', return_value=masters), \
+             patch('keepass_ssh.cli.ControlMasters.close', return_value=True) as mock_close, \
+             patch('builtins.print') as mock_print, \
+             pytest.raises(SystemExit) as exc:
+            cli_instance.run()
+        
+        assert exc.value.code == 0
+        mock_close.assert_called_once_with(masters[0])
+        mock_print.assert_called_once_with("web-1 | user@web1:22 | closed")
+
+    def test_connect_multiplexed(self, tmp_path):
+        """
+        Test that connections go through the control masters when enabled.
+        """
+        cli = KeePassSSHCLI()
+        cli.masters = MagicMock()
+        server = ServerEntry(title='Server1', username='user1', password='pass1', hostname='host1', url='host1', port=22, description='')
+        
+        with patch.object(KeePassSSHCLI, '_load_servers', return_value=[server]), \
+             patch('keepass_ssh.cli.SSHConnector.connect') as mock_connect, \
+             patch('builtins.print'):
+            cli.connect_to_server(db_path='Passwords.kdbx', server_filter='Server1')
+        
+        mock_connect.assert_called_once_with(server, cli.masters)
+
+    def test_show_servers_probe_sorted(self):
+        """
+        Test that probed servers are listed by latency.
+        """
+        from keepass_ssh.probe import ProbeResult
+        
+        cli = KeePassSSHCLI()
+        cli.probe = {'timeout': 1.0, 'concurrency': None, 'sort': True}
+        servers = [
+            ServerEntry(title='Server1', username='user1', password='pass1', hostname='host1', url='host1', port=22, description=''),
+            ServerEntry(title='Server2', username='user2', password='pass2', hostname='host2', url='host2', port=22, description='')
+        ]
+        probes = [ProbeResult('timeout'), ProbeResult('up', 0.01)]
+        
+        with patch('keepass_ssh.probe.probe_servers', return_value=probes) as mock_probe, \
+             patch('keepass_ssh.cli.ServerManager.list_servers') as mock_list:
+            shown = cli._show_servers(servers)
+        
+        mock_probe.assert_called_once_with(servers, timeout=1.0)
+        assert shown == [servers[1], servers[0]]
+        mock_list.assert_called_once_with(shown, [probes[1], probes[0]])
+
+    def test_connect_most_likely_server(self, tmp_path):
+        """
+        Test that an empty -s connects to the server with the highest frecency and records the session.
+        """
+        from keepass_ssh.history import History
+        
+        cli = KeePassSSHCLI()
+        cli.history = History(str(tmp_path / 'history'))
+        servers = [
+            ServerEntry(title=f'Server{i}', username='user', password='pass', hostname=f'host{i}', url=f'host{i}',
+                        port=22, description='', uuid=f'00000000-0000-0000-0000-00000000000{i}')
+            for i in range(3)
+        ]
+        cli.history.record(servers[1].uuid, 30.0)
+        
+        with patch.object(KeePassSSHCLI, '_load_servers', return_value=servers), \
+             patch('keepass_ssh.cli.SSHConnector.connect') as mock_connect, \
+             patch('builtins.input') as mock_input, \
+             patch('builtins.print'):
+            cli.connect_to_server(db_path='Passwords.kdbx', server_filter='')
+        
+        mock_connect.assert_called_once_with(servers[1])
+        mock_input.assert_not_called()
+        assert cli.history.scores()[servers[1].uuid] == pytest.approx(2, rel=1e-3)
+
+    def test_show_servers_ranked_by_history(self, tmp_path):
+        """
+        Test that listed servers are ordered by frecency and that ties in filtering are broken by it.
+        """
+        from keepass_ssh.history import History
+        
+        cli = KeePassSSHCLI()
+        cli.history = History(str(tmp_path / 'history'))
+        servers = [
+            ServerEntry(title=f'web-{i}', username='user', password='pass', hostname=f'host{i}', url=f'host{i}',
+                        port=22, description='', uuid=f'00000000-0000-0000-0000-00000000000{i}')
+            for i in range(3)
+        ]
+        cli.history.record(servers[2].uuid, 5.0)
+        
+        with patch('keepass_ssh.cli.ServerManager.list_servers') as mock_list:
+            shown = cli._show_servers(servers)
+        
+        assert shown == [servers[2], servers[0], servers[1]]
+        mock_list.assert_called_once_with(shown, None)
+        assert cli._filter_servers(servers, 'web') == [servers[2], servers[0], servers[1]]
+
+    def test_import_time_budget(self):
+        """
+        Test that importing the entry point stays within the cold start budget.
+        """
+        best = min(import_times('-c', 'import keepass_ssh.main')['keepass_ssh.main'] for _ in range(3))
+        assert best < IMPORT_BUDGET_US
+
+    def test_help_skips_heavy_imports(self):
+        """
+        Test that --help does not load the database, SSH or terminal libraries.
+        """
+        times = import_times('-m', 'keepass_ssh.main', '--help')
+        assert 'keepass_ssh.cli' in times
+        assert not [module for module in times if module.split('.')[0] in HEAVY_MODULES]
 
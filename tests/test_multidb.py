@@ -0,0 +1,65 @@
+"""Tests for multidb module."""
+import pytest
+from keepass_ssh import timing
+from keepass_ssh.multidb import DatabaseSource, load_databases, fetch_passwords, pool_size
+
+@pytest.fixture(scope="module")
+def sources(tmp_path_factory):
+    """Create two real databases with a cheap KDF, each with its own key file."""
+    from pykeepass import create_database
+    directory = tmp_path_factory.mktemp("databases")
+    sources = []
+    for team in ("team-a", "team-b"):
+        path, key_path = directory / f"{team}.kdbx", directory / f"{team}.keyx"
+        key_path.write_bytes(team.encode() * 8)
+        kp = create_database(str(path), keyfile=str(key_path))
+        kdf = kp.kdbx.header.value.dynamic_header.kdf_parameters.data.dict
+        kdf['I'].value, kdf['M'].value, kdf['P'].value = 1, 1 << 20, 1
+        servers = kp.add_group(kp.root_group, "Servers")
+        kp.add_entry(servers, f"{team} web", "web", f"{team}-pass", url=f"web.{team}.com")
+        kp.save()
+        sources.append(DatabaseSource(str(path), str(key_path)))
+    return sources
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep metadata indexes written by the loads in a temporary directory."""
+    monkeypatch.setenv('KEEPASS_SSH_CACHE_DIR', str(tmp_path))
+
+def test_load_databases(sources):
+    """Test loading several databases in worker processes, in source order."""
+    results = load_databases(sources, "Servers", workers=2)
+    assert [result.source for result in results] == sources
+    assert [[record.title for record in result.records] for result in results] == [["team-a web"], ["team-b web"]]
+    assert all(result.error is None for result in results)
+
+def test_load_databases_error(sources):
+    """Test that a database that cannot be opened does not fail the others."""
+    wrong_key = DatabaseSource(sources[1].path, sources[0].key_path)
+    results = load_databases([sources[0], wrong_key], "Servers", workers=2)
+    assert results[0].records[0].password == "team-a-pass"
+    assert results[1].records == [] and "Error opening KeePass database" in results[1].error
+
+def test_load_databases_timings(sources):
+    """Test that phases of worker processes are merged below the database name."""
+    timings = timing.enable()
+    try:
+        load_databases(sources, "Servers", workers=2)
+    finally:
+        timing.disable()
+    names = [phase.name for phase in timings.phases]
+    assert names[0] == "databases"
+    assert "databases/team-a" in names and "databases/team-b/open/kdf" in names
+
+def test_fetch_passwords(sources):
+    """Test fetching passwords by UUID from several databases."""
+    uuids = [[str(load_databases([source], "Servers")[0].records[0].uuid)] for source in sources]
+    passwords = fetch_passwords(list(zip(sources, uuids)), workers=2)
+    assert passwords == [{uuids[0][0]: "team-a-pass"}, {uuids[1][0]: "team-b-pass"}]
+
+def test_pool_size():
+    """Test that the pool never exceeds the number of jobs."""
+    assert pool_size(3, workers=8) == 3
+    assert pool_size(5, workers=2) == 2
+    assert pool_size(0, workers=2) == 1
+    assert 1 <= pool_size(64) <= 64
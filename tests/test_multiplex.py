@@ -0,0 +1,107 @@
+"""Tests for multiplex module."""
+import os
+import socket
+import pytest
+from unittest.mock import patch, MagicMock
+from subprocess import TimeoutExpired
+from keepass_ssh.server import ServerEntry
+from keepass_ssh.multiplex import ControlMasters, Master
+
+@pytest.fixture
+def server_entry():
+    """Create a test server entry."""
+    return ServerEntry(title="Test Server", username="test_user", password="test_pass",
+                       url="test.server.com:2222", hostname="test.server.com", port=2222,
+                       description="")
+
+@pytest.fixture
+def masters(tmp_path):
+    """Create control masters in a short temporary directory."""
+    return ControlMasters(directory=str(tmp_path), persist=60)
+
+def test_socket_path(masters, server_entry):
+    """Test that socket names are short and differ per port."""
+    path = masters.socket_path(server_entry)
+    assert os.path.dirname(path) == masters.directory
+    assert len(os.path.basename(path)) == 16
+    server_entry.port = 22
+    assert masters.socket_path(server_entry) != path
+    server_entry.jump = 'bastion-a'
+    behind_a = masters.socket_path(server_entry)
+    server_entry.jump = 'bastion-b'
+    assert len({path, behind_a, masters.socket_path(server_entry)}) == 3
+
+def test_options_escape_tokens(server_entry):
+    """Test that % in the cache directory is not expanded by ssh."""
+    masters = ControlMasters(directory='/tmp/100%', persist=60)
+    options = masters.options(server_entry)
+    assert options[:2] == ['-o', 'ControlMaster=auto']
+    assert options[3].startswith('ControlPath=/tmp/100%%/')
+    assert options[5] == 'ControlPersist=60'
+
+def test_list_alive_and_stale(masters, server_entry):
+    """Test listing a live master and forgetting an exited one."""
+    masters.register(server_entry)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(masters.socket_path(server_entry))
+    listener.listen(1)
+    try:
+        assert masters.list() == [Master(masters.socket_path(server_entry), 'test_user@test.server.com',
+                                         2222, 'Test Server', True)]
+    finally:
+        listener.close()
+
+    assert not masters.list()[0].alive
+    assert masters.list() == []
+    assert os.listdir(masters.directory) == []
+
+def test_close(masters, server_entry):
+    """Test asking a master to exit."""
+    masters.register(server_entry)
+    master = Master(masters.socket_path(server_entry), 'test_user@test.server.com', 2222, 'Test Server', True)
+    with patch('subprocess.run', return_value=MagicMock(returncode=0)) as mock_run:
+        assert masters.close(master)
+    command = mock_run.call_args.args[0]
+    assert command[:3] == ['ssh', '-O', 'exit']
+    assert command[-3:] == ['-p', '2222', 'test_user@test.server.com']
+    assert masters.list() == []
+
+def test_warm_password_in_environment(masters, server_entry):
+    """Test that warming passes the password through the environment."""
+    with patch('subprocess.run', return_value=MagicMock(returncode=0)) as mock_run:
+        assert masters.warm([server_entry]) == {'Test Server': None}
+    command = mock_run.call_args.args[0]
+    assert command[:5] == ['sshpass', '-e', 'ssh', '-f', '-N']
+    assert 'ControlMaster=yes' in command
+    assert 'test_pass' not in command
+    assert mock_run.call_args.kwargs['env']['SSHPASS'] == 'test_pass'
+
+def test_warm_errors(masters, server_entry):
+    """Test reporting servers whose master could not be opened."""
+    server_entry.password = None
+    with patch('subprocess.run', side_effect=TimeoutExpired('ssh', 5)) as mock_run:
+        assert masters.warm([server_entry], timeout=5) == {'Test Server': 'timed out after 5s'}
+    assert 'BatchMode=yes' in mock_run.call_args.args[0]
+
+    def fail(command, stderr, **kwargs):
+        stderr.write(b'debug\nPermission denied (publickey).\n')
+        return MagicMock(returncode=255)
+
+    with patch('subprocess.run', side_effect=fail):
+        assert masters.warm([server_entry]) == {'Test Server': 'Permission denied (publickey).'}
+
+def test_warm_skips_live_master(masters, server_entry):
+    """Test that running masters are reused."""
+    with patch.object(ControlMasters, 'is_alive', return_value=True), \
+         patch('subprocess.run') as mock_run:
+        assert masters.warm([server_entry]) == {'Test Server': None}
+    mock_run.assert_not_called()
+
+def test_warm_through_jump_host(masters, server_entry):
+    """Test that warming tunnels through the jump host without letting it prompt."""
+    server_entry.jump = 'admin@bastion'
+    with patch('subprocess.run', return_value=MagicMock(returncode=0)) as mock_run:
+        assert masters.warm([server_entry]) == {'Test Server': None}
+    command = mock_run.call_args.args[0]
+    assert 'ProxyCommand=ssh -o BatchMode=yes -p 22 -W %h:%p admin@bastion' in command
+    assert '-J' not in command
@@ -0,0 +1,67 @@
+"""Tests for output module."""
+import io
+import json
+import pytest
+from unittest.mock import Mock
+from keepass_ssh.batch import ExecResult
+from keepass_ssh.output import RecordWriter, ExecRecorder, server_record
+
+# Every field set, with characters TSV has to escape
+FIELDS = {'username': 'deploy', 'description': 'line one\nline two', 'tags': ['a', 'b']}
+
+def test_server_record(make_server):
+    """Test that records leave the password out and carry probe results."""
+    record = server_record(make_server('web\t1', 'host1', 2222, **FIELDS), Mock(status='up', latency=0.01234))
+    assert 'password' not in record and 'secret' not in json.dumps(record)
+    assert record['status'] == 'up' and record['latency_ms'] == 12.3
+
+@pytest.mark.parametrize('output_format', ['json', 'ndjson'])
+def test_json_formats(output_format, make_server):
+    """Test that JSON output parses back into the records."""
+    stream = io.BytesIO()
+    writer = RecordWriter(output_format, stream, buffer_size=100)
+    records = [server_record(make_server(f'web\t{i}', f'host{i}', 2222, **FIELDS)) for i in range(5)]
+    for record in records:
+        writer.write(record)
+    assert stream.getvalue()
+    writer.close()
+    
+    text = stream.getvalue().decode('utf-8')
+    if output_format == 'json':
+        assert json.loads(text) == records
+    else:
+        assert [json.loads(line) for line in text.splitlines()] == records
+
+def test_json_empty():
+    """Test that no records still make a JSON array."""
+    stream = io.BytesIO()
+    RecordWriter('json', stream).close()
+    assert json.loads(stream.getvalue()) == []
+
+def test_tsv_escapes(make_server):
+    """Test that TSV has a header and keeps every value in its column."""
+    stream = io.BytesIO()
+    writer = RecordWriter('tsv', stream)
+    writer.write(server_record(make_server('web\t1', 'host1', 2222, **FIELDS)))
+    writer.close()
+    
+    header, row = stream.getvalue().decode('utf-8').splitlines()
+    assert header.split('\t')[:6] == ['title', 'username', 'hostname', 'port', 'url', 'description']
+    assert row.split('\t') == ['web\\t1', 'deploy', 'host1', '2222', 'host1:2222', 'line one\\nline two', '', 'a,b', '', '']
+
+def test_exec_recorder(make_server):
+    """Test that output is written with the result of its server."""
+    stream = io.BytesIO()
+    writer = RecordWriter('ndjson', stream)
+    recorder = ExecRecorder(writer)
+    first, second = make_server('web\t1', 'host1', 2222, **FIELDS), make_server('web\t2', 'host2', 2222, **FIELDS)
+    recorder(first, 'up 3 days')
+    recorder(second, 'denied', is_stderr=True)
+    recorder(first, 'load 0.1')
+    recorder.finished(ExecResult(first, 0, 0.5))
+    recorder.finished(ExecResult(second, 1, 0.25))
+    writer.close()
+    
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records[0]['stdout'] == 'up 3 days\nload 0.1' and records[0]['ok']
+    assert records[1]['stderr'] == 'denied' and records[1]['exit_code'] == 1 and not records[1]['ok']
@@ -0,0 +1,264 @@
+"""Tests for pool module."""
+import socket
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+import paramiko
+from keepass_ssh.server import ServerManager
+from keepass_ssh.pool import SSHConnectionPool
+
+@pytest.fixture
+def clients():
+    """Patch SSHClient to create healthy mock clients, return the created clients."""
+    created = []
+
+    def make_client():
+        client = MagicMock()
+        client.get_transport.return_value.is_active.return_value = True
+        client.get_transport.return_value.is_authenticated.return_value = True
+        created.append(client)
+        return client
+
+    with patch('keepass_ssh.pool.paramiko.SSHClient', side_effect=make_client), \
+            patch.object(SSHConnectionPool, '_open_socket'):
+        yield created
+
+@pytest.fixture
+def pool():
+    """Create a pool without reading known_hosts."""
+    with SSHConnectionPool(max_connections=2, host_key_policy=paramiko.RejectPolicy()) as pool:
+        yield pool
+
+def test_open_socket_tries_addresses(make_server):
+    """Test that the next address is tried when a connect fails, with Nagle disabled."""
+    addresses = [
+        (socket.AF_INET6, socket.SOCK_STREAM, 6, '', ('::1', 22, 0, 0)),
+        (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 22)),
+    ]
+    refused, accepted = MagicMock(), MagicMock()
+    refused.connect.side_effect = ConnectionRefusedError()
+    pool = SSHConnectionPool(timeout=5, host_key_policy=paramiko.RejectPolicy())
+    with patch('keepass_ssh.pool.socket.getaddrinfo', return_value=addresses), \
+            patch('keepass_ssh.pool.socket.socket', side_effect=[refused, accepted]):
+        assert pool._open_socket(make_server()) is accepted
+
+    refused.close.assert_called_once()
+    accepted.settimeout.assert_called_once_with(5)
+    accepted.connect.assert_called_once_with(('127.0.0.1', 22))
+    accepted.setsockopt.assert_called_once_with(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+def test_open_socket_unreachable(make_server):
+    """Test that the last connect error is raised when no address accepts."""
+    addresses = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 22))]
+    sock = MagicMock()
+    sock.connect.side_effect = ConnectionRefusedError()
+    pool = SSHConnectionPool(host_key_policy=paramiko.RejectPolicy())
+    with patch('keepass_ssh.pool.socket.getaddrinfo', return_value=addresses), \
+            patch('keepass_ssh.pool.socket.socket', return_value=sock), \
+            pytest.raises(ConnectionRefusedError):
+        pool._open_socket(make_server())
+
+def test_open_socket_uses_resolver(make_server):
+    """Test that addresses come from the resolver when the pool has one."""
+    resolver = MagicMock()
+    resolver.getaddrinfo.return_value = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', 2222))]
+    sock = MagicMock()
+    pool = SSHConnectionPool(host_key_policy=paramiko.RejectPolicy(), resolver=resolver)
+    with patch('keepass_ssh.pool.socket.getaddrinfo') as mock_lookup, \
+            patch('keepass_ssh.pool.socket.socket', return_value=sock):
+        assert pool._open_socket(make_server(port=2222)) is sock
+
+    resolver.getaddrinfo.assert_called_once_with('host1', 2222)
+    mock_lookup.assert_not_called()
+    sock.connect.assert_called_once_with(('192.0.2.1', 2222))
+
+def test_reuses_transport(pool, clients, make_server):
+    """Test that sessions to the same server share one connection."""
+    for _ in range(3):
+        with pool.session(make_server()):
+            pass
+    with pool.session(make_server(username='other')):
+        pass
+
+    assert len(clients) == 2
+    assert clients[0].get_transport.return_value.open_session.call_count == 3
+    clients[0].set_missing_host_key_policy.assert_called_once_with(pool.host_key_policy)
+    clients[0].get_transport.return_value.set_keepalive.assert_called_once_with(pool.keepalive)
+    assert clients[0].connect.call_args.kwargs['password'] == 'secret'
+    assert clients[0].connect.call_args.kwargs['sock'] is pool._open_socket.return_value
+
+def test_lru_eviction(pool, clients, make_server):
+    """Test that the least recently used idle connection is closed above the limit."""
+    for hostname in ('host1', 'host2', 'host1', 'host3'):
+        with pool.session(make_server(hostname=hostname)):
+            pass
+
+    assert len(pool) == 2
+    assert [client.close.called for client in clients] == [False, True, False]
+
+def test_busy_connections_not_evicted(pool, clients, make_server):
+    """Test that connections with open sessions stay open above the limit."""
+    with pool.session(make_server(hostname='host1')), pool.session(make_server(hostname='host2')), \
+         pool.session(make_server(hostname='host3')):
+        assert len(pool) == 3
+        assert not any(client.close.called for client in clients)
+    assert len(pool) == 2
+
+def test_idle_eviction(pool, clients, make_server):
+    """Test that connections idle for too long are closed."""
+    with patch('keepass_ssh.pool.time.monotonic', return_value=1000.0):
+        with pool.session(make_server(hostname='host1')):
+            pass
+    with patch('keepass_ssh.pool.time.monotonic', return_value=1000.0 + pool.idle_timeout + 1):
+        with pool.session(make_server(hostname='host2')):
+            pass
+
+    assert clients[0].close.called
+    assert len(pool) == 1
+
+def test_unhealthy_connection_replaced(pool, clients, make_server):
+    """Test that a dropped transport is replaced by a new connection."""
+    with pool.session(make_server()):
+        pass
+    clients[0].get_transport.return_value.is_active.return_value = False
+    with pool.session(make_server()):
+        pass
+
+    assert len(clients) == 2
+    assert clients[0].close.called
+
+def test_reconnect_when_session_fails(pool, clients, make_server):
+    """Test that a pooled transport failing to open a channel is replaced once."""
+    with pool.session(make_server()):
+        pass
+    clients[0].get_transport.return_value.open_session.side_effect = EOFError()
+    with pool.session(make_server()) as channel:
+        assert channel is clients[1].get_transport.return_value.open_session.return_value
+
+def test_refused_channel_keeps_open_sessions(pool, clients, make_server):
+    """Test that a connection refusing more channels is replaced, closed once its sessions end."""
+    with pool.session(make_server()) as first:
+        clients[0].get_transport.return_value.open_session.side_effect = paramiko.ChannelException(1, 'refused')
+        with pool.session(make_server()) as second:
+            assert second is clients[1].get_transport.return_value.open_session.return_value
+            assert not clients[0].close.called
+        assert first is clients[0].get_transport.return_value.open_session.return_value
+        assert not clients[0].close.called
+    assert clients[0].close.called
+    assert not clients[1].close.called
+
+def test_new_connection_session_error(pool, make_server):
+    """Test that a new connection failing to open a channel is not retried."""
+    with patch('keepass_ssh.pool.paramiko.SSHClient') as mock_client, patch.object(pool, '_open_socket'):
+        mock_client.return_value.get_transport.return_value.open_session.side_effect = paramiko.SSHException('refused')
+        with pytest.raises(paramiko.SSHException):
+            pool.open_session(make_server())
+    assert mock_client.call_count == 1
+    assert len(pool) == 0
+
+def test_concurrent_connect_once(pool, clients, make_server):
+    """Test that threads connecting to the same server share one connection."""
+    barrier = threading.Barrier(8)
+
+    def use():
+        barrier.wait()
+        with pool.session(make_server()):
+            pass
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(clients) == 1
+
+def test_no_idle_connections_kept(clients, make_server):
+    """Test that a pool without capacity closes connections once idle."""
+    pool = SSHConnectionPool(max_connections=0, host_key_policy=paramiko.RejectPolicy())
+    with pool.session(make_server()):
+        assert len(pool) == 1
+    assert len(pool) == 0
+    assert clients[0].close.called
+
+def test_exec_command(pool, clients, make_server):
+    """Test collecting the output and status of a command."""
+    channel = MagicMock()
+    stdout, stderr = [b'out'], [b'err']
+    channel.recv_ready.side_effect = lambda: bool(stdout)
+    channel.recv.side_effect = lambda size: stdout.pop()
+    channel.recv_stderr_ready.side_effect = lambda: bool(stderr)
+    channel.recv_stderr.side_effect = lambda size: stderr.pop()
+    channel.exit_status_ready.return_value = True
+    channel.recv_exit_status.return_value = 2
+
+    with patch.object(SSHConnectionPool, 'open_session', return_value=(MagicMock(in_use=1), channel)):
+        assert pool.exec_command(make_server(), 'ls') == (2, b'out', b'err')
+    channel.exec_command.assert_called_once_with('ls')
+    channel.close.assert_called_once()
+
+def test_tunnels_through_one_jump_connection(pool, clients, make_server):
+    """Test that servers behind a bastion share one connection to it, kept while they are open."""
+    for hostname in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+        with pool.session(make_server(hostname=hostname, jump='admin@bastion:2222')):
+            pass
+
+    bastion = clients[0]
+    assert len(clients) == 4
+    assert bastion.connect.call_args.args == ('bastion',)
+    assert bastion.connect.call_args.kwargs['port'] == 2222
+    assert bastion.connect.call_args.kwargs['username'] == 'admin'
+    assert bastion.connect.call_args.kwargs['password'] is None
+    assert pool._open_socket.call_count == 1
+
+    open_channel = bastion.get_transport.return_value.open_channel
+    assert [call.args[1] for call in open_channel.call_args_list] == [('10.0.0.1', 22), ('10.0.0.2', 22), ('10.0.0.3', 22)]
+    assert clients[3].connect.call_args.kwargs['sock'] is open_channel.return_value
+
+    # The bastion is not counted against the limit and outlives the evicted servers
+    assert not bastion.close.called
+    assert [client.close.called for client in clients[1:]] == [True, False, False]
+    pool.close()
+    assert bastion.close.called
+
+def test_same_address_behind_different_jumps(pool, clients, make_server):
+    """Test that one private address behind two bastions gets a connection per bastion."""
+    with pool.session(make_server(hostname='10.0.0.5', jump='bastion-a')):
+        pass
+    with pool.session(make_server(hostname='10.0.0.5', jump='bastion-b')) as channel:
+        pass
+
+    assert [client.connect.call_args.args[0] for client in clients] == ['bastion-a', '10.0.0.5', 'bastion-b', '10.0.0.5']
+    assert channel is clients[3].get_transport.return_value.open_session.return_value
+    assert clients[3].connect.call_args.kwargs['sock'] is clients[2].get_transport.return_value.open_channel.return_value
+
+def test_jump_released_when_tunnel_fails(clients, make_server):
+    """Test that a bastion refusing the forward is released and closed once idle."""
+    pool = SSHConnectionPool(max_connections=0, idle_timeout=0, host_key_policy=paramiko.RejectPolicy())
+    make_client = paramiko.SSHClient.side_effect
+
+    def refusing_client():
+        client = make_client()
+        client.get_transport.return_value.open_channel.side_effect = paramiko.ChannelException(2, 'refused')
+        return client
+
+    with patch('keepass_ssh.pool.paramiko.SSHClient', side_effect=refusing_client), \
+            pytest.raises(paramiko.ChannelException):
+        pool.open_session(make_server(jump='bastion'))
+
+    assert len(clients) == 1
+    assert pool._connections[('', 'bastion', 22, '')].in_use == 0
+    pool.prune()
+    assert len(pool) == 0
+    assert clients[0].close.called
+
+def test_tunnel_releases_jump_connection(pool, clients, make_server):
+    """Test that a raw tunnel keeps the bastion in use only while it is open."""
+    target = make_server(hostname='10.0.0.5', jump='bastion')
+    pool.connect(ServerManager.jump_server(target))
+    with pool.tunnel(target) as channel:
+        bastion = pool._connections[('', 'bastion', 22, '')]
+        assert bastion.in_use == 1
+    assert bastion.in_use == 0
+    assert channel is clients[0].get_transport.return_value.open_channel.return_value
+    channel.close.assert_called_once()
+    assert len(clients) == 1
@@ -0,0 +1,107 @@
+"""Tests for probe module."""
+import socket
+import asyncio
+import threading
+import pytest
+import contextlib
+from unittest.mock import MagicMock, Mock, patch
+from keepass_ssh.pool import SSHConnectionPool
+from keepass_ssh.probe import ProbeResult, probe_host, probe_servers, sort_by_latency
+
+@pytest.fixture
+def listener():
+    """Run local servers sending an SSH banner and staying silent, return their ports."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    ports = {}
+
+    async def ssh(reader, writer):
+        writer.write(b'SSH-2.0-OpenSSH_9.6\r\n')
+        await writer.drain()
+
+    async def silent(reader, writer):
+        await reader.read()
+
+    async def start():
+        for name, handler in (('ssh', ssh), ('silent', silent)):
+            srv = await asyncio.start_server(handler, '127.0.0.1', 0)
+            ports[name] = srv.sockets[0].getsockname()[1]
+        ready.set()
+
+    thread = threading.Thread(target=lambda: (loop.run_until_complete(start()), loop.run_forever()), daemon=True)
+    thread.start()
+    ready.wait(5)
+    yield ports
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+def closed_port():
+    """Find a local port nobody listens on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_probe_host_up(listener):
+    """Test reading the SSH banner of a reachable server."""
+    result = asyncio.run(probe_host('127.0.0.1', listener['ssh'], timeout=2))
+    assert result.status == 'up'
+    assert result.banner == 'SSH-2.0-OpenSSH_9.6'
+    assert result.latency < 2
+
+def test_probe_host_no_banner(listener):
+    """Test servers accepting connections without sending an SSH banner."""
+    result = asyncio.run(probe_host('127.0.0.1', listener['silent'], timeout=0.2))
+    assert result.status == 'no-ssh'
+    assert result.reachable
+
+def test_probe_host_refused():
+    """Test closed ports."""
+    result = asyncio.run(probe_host('127.0.0.1', closed_port(), timeout=2))
+    assert result == ProbeResult('refused')
+    assert not result.reachable
+
+def test_probe_servers_dedupes_hosts(listener, make_server):
+    """Test that entries sharing a host and port are probed once."""
+    servers = [make_server('a', '127.0.0.1', listener['ssh']), make_server('b', '127.0.0.1', listener['ssh']),
+               make_server('c', '127.0.0.1', closed_port())]
+    with patch('keepass_ssh.probe.probe_host', wraps=probe_host) as mock_probe:
+        results = probe_servers(servers, timeout=2)
+    assert mock_probe.call_count == 2
+    assert [r.status for r in results] == ['up', 'up', 'refused']
+
+def test_probe_servers_uses_resolver(listener, make_server):
+    """Test that hosts are probed at their resolved address."""
+    resolver = Mock()
+    resolver.resolve_all.return_value = {'db.example': ['127.0.0.1'], 'gone.example': None}
+    servers = [make_server('a', 'db.example', listener['ssh']), make_server('b', 'gone.example', listener['ssh'])]
+    results = probe_servers(servers, timeout=2, resolver=resolver)
+    assert [r.status for r in results] == ['up', 'unresolved']
+
+def test_probe_through_jump_host(listener, make_server):
+    """Test that servers behind a jump host are probed through it, once per jump host connection."""
+    servers = [make_server('a', '10.0.0.1', 22), make_server('b', '10.0.0.2', 22), make_server('c', '10.0.0.3', 22),
+               make_server('direct', '127.0.0.1', listener['ssh'])]
+    servers[0].jump = servers[1].jump = 'bastion'
+    servers[2].jump = 'down.example'
+    pool = MagicMock(key=SSHConnectionPool.key)
+    def connect(jump):
+        if jump.hostname != 'bastion':
+            raise OSError('unreachable')
+    pool.connect.side_effect = connect
+    channel = MagicMock()
+    channel.recv.side_effect = lambda size: b'SSH-2.0-OpenSSH_9.6\r\n'
+    pool.tunnel.side_effect = lambda server: contextlib.nullcontext(channel)
+
+    results = probe_servers(servers, timeout=2, pool=pool)
+    assert [r.status for r in results] == ['up', 'up', 'unreachable', 'up']
+    assert results[0].banner == 'SSH-2.0-OpenSSH_9.6'
+    assert sorted(call.args[0].hostname for call in pool.connect.call_args_list) == ['bastion', 'down.example']
+    assert [call.args[0].title for call in pool.tunnel.call_args_list] == ['a', 'b']
+
+def test_sort_by_latency(make_server):
+    """Test ordering by latency with unreachable servers last."""
+    servers = [make_server('down'), make_server('slow'), make_server('web', port=80), make_server('fast')]
+    probes = [ProbeResult('timeout'), ProbeResult('up', 0.2), ProbeResult('no-ssh', 0.01), ProbeResult('up', 0.1)]
+    ordered, ordered_probes = sort_by_latency(servers, probes)
+    assert [s.title for s in ordered] == ['fast', 'slow', 'web', 'down']
+    assert ordered_probes[0] == ProbeResult('up', 0.1)
@@ -0,0 +1,92 @@
+"""Tests for resolver module."""
+import json
+import time
+import socket
+import threading
+import pytest
+from unittest.mock import patch
+from keepass_ssh.resolver import Resolver
+
+def addrinfo(*addresses):
+    """Create getaddrinfo results for IPv4 addresses."""
+    return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, 0)) for address in addresses]
+
+@pytest.fixture
+def resolver(tmp_path):
+    """Create a resolver with its cache in a temporary directory."""
+    return Resolver(str(tmp_path / "dns.json"), ttl=60, negative_ttl=10)
+
+def test_resolve_cached(resolver):
+    """Test that a hostname is looked up once, also by a later resolver."""
+    with patch.object(Resolver, '_numeric', return_value=False), \
+         patch('keepass_ssh.resolver.socket.getaddrinfo', return_value=addrinfo('192.0.2.1', '192.0.2.1', '192.0.2.2')) as mock_lookup:
+        assert resolver.resolve('web.example') == ['192.0.2.1', '192.0.2.2']
+        assert resolver.address('web.example') == '192.0.2.1'
+        resolver.close()
+        
+        again = Resolver(resolver.path)
+        assert again.resolve('web.example') == ['192.0.2.1', '192.0.2.2']
+    assert mock_lookup.call_count == 1
+
+def test_negative_cache(resolver):
+    """Test that names that do not exist are cached for the negative TTL."""
+    error = socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+    with patch.object(Resolver, '_numeric', return_value=False), \
+         patch('keepass_ssh.resolver.socket.getaddrinfo', side_effect=error) as mock_lookup:
+        for _ in range(2):
+            with pytest.raises(socket.gaierror):
+                resolver.resolve('gone.example')
+        assert resolver.address('gone.example') is None
+        assert mock_lookup.call_count == 1
+        
+        expired = time.time() + 11
+        with patch('keepass_ssh.resolver.time.time', return_value=expired):
+            with pytest.raises(socket.gaierror):
+                resolver.resolve('gone.example')
+        assert mock_lookup.call_count == 2
+
+def test_temporary_failure_not_cached(resolver):
+    """Test that failures other than missing names are retried."""
+    error = socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')
+    with patch.object(Resolver, '_numeric', return_value=False), \
+         patch('keepass_ssh.resolver.socket.getaddrinfo', side_effect=error) as mock_lookup:
+        assert resolver.resolve_all(['web.example']) == {'web.example': None}
+        assert resolver.address('web.example') is None
+    assert mock_lookup.call_count == 2
+
+def test_expired_entries_dropped(resolver):
+    """Test that expired entries of the cache file are looked up again and not kept."""
+    with open(resolver.path, 'w') as f:
+        json.dump({'version': 1, 'hosts': {
+            'old.example': {'expires': time.time() - 1, 'addresses': ['192.0.2.9']},
+            'db.example': {'expires': time.time() + 60, 'addresses': ['192.0.2.5']}
+        }}, f)
+    
+    with patch.object(Resolver, '_numeric', return_value=False), \
+         patch('keepass_ssh.resolver.socket.getaddrinfo', return_value=addrinfo('192.0.2.10')) as mock_lookup:
+        assert resolver.resolve('db.example') == ['192.0.2.5']
+        assert resolver.resolve('old.example') == ['192.0.2.10']
+    assert mock_lookup.call_count == 1
+
+def test_resolve_all_concurrent(resolver):
+    """Test that hostnames are looked up at the same time."""
+    barrier = threading.Barrier(3, timeout=5)
+    
+    def lookup(host, *args):
+        barrier.wait()
+        return addrinfo(f'192.0.2.{host[0]}')
+    
+    with patch.object(Resolver, '_numeric', side_effect=lambda host: host == '192.0.2.7'), \
+         patch('keepass_ssh.resolver.socket.getaddrinfo', side_effect=lookup):
+        results = resolver.resolve_all(['1.example', '2.example', '3.example', '1.example', '192.0.2.7'])
+    assert results == {
+        '1.example': ['192.0.2.1'], '2.example': ['192.0.2.2'], '3.example': ['192.0.2.3'],
+        '192.0.2.7': ['192.0.2.7']
+    }
+
+def test_getaddrinfo_numeric(resolver):
+    """Test that socket addresses are built from cached addresses and IP addresses are not cached."""
+    infos = resolver.getaddrinfo('127.0.0.1', 2222)
+    assert infos[0][4] == ('127.0.0.1', 2222)
+    resolver.save()
+    assert resolver._resolved == {}
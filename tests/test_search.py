@@ -0,0 +1,118 @@
+"""Tests for search module."""
+import pytest
+from keepass_ssh.search import SearchIndex, edit_distance, rank, scan, tokenize
+
+ROWS = [
+    ("web-production", "web1.example.com", "deploy", ["nginx"], "Frontend"),
+    ("db-production", "db1.example.com", "postgres", ["database"], "Primary web database"),
+    ("web-staging", "web2.example.com", "deploy", [], None),
+    ("Backup", "backup.example.com", "root", None, "Nightly"),
+]
+
+@pytest.fixture
+def index():
+    """Create a search index over test rows."""
+    return SearchIndex.build(ROWS)
+
+def test_tokenize():
+    """Test splitting text into lowercase tokens."""
+    assert tokenize("Web-Server_01.example.COM") == ["web", "server", "01", "example", "com"]
+
+def test_edit_distance():
+    """Test bounded edit distance with transpositions."""
+    assert edit_distance("production", "prodution", 2) == 1
+    assert edit_distance("production", "prodcution", 2) == 1
+    assert edit_distance("production", "staging", 2) == 3
+
+def test_search_ranks_title_first(index):
+    """Test that title matches rank above notes matches."""
+    assert index.search("web") == [0, 2, 1]
+
+def test_search_all_terms(index):
+    """Test that every query term must match."""
+    assert index.search("production web") == [0, 1]
+    assert index.search("web nginx") == [0]
+    assert index.search("web backup") == []
+
+def test_search_fields(index):
+    """Test matching hostname, username, tags and notes."""
+    assert index.search("db1") == [1]
+    assert index.search("deploy") == [0, 2]
+    assert index.search("databa") == [1]
+    assert index.search("nightly") == [3]
+
+def test_search_typos(index):
+    """Test typo tolerance for terms matching nothing as typed."""
+    assert index.search("prodution") == [0, 1]
+    assert index.search("stagign web") == [2]
+    assert index.search("qwerty") == []
+
+def test_search_limit(index):
+    """Test limiting the number of ranked results."""
+    assert index.search("web", limit=1) == [0]
+    assert index.search("", limit=2) == [0, 1]
+
+def test_exact(index):
+    """Test exact title lookup ignoring case."""
+    assert index.exact("BACKUP") == [3]
+    assert index.exact("web") == []
+
+def test_roundtrip():
+    """Test serializing the index to bytes and back."""
+    index = SearchIndex.build(ROWS, ["web", "db", "staging", "backup"])
+    loaded = SearchIndex.from_bytes(index.to_bytes())
+    for query in ("prodution web", "db1", "e", ""):
+        assert loaded.match(query) == index.match(query)
+    assert loaded.exact("backup") == ["backup"]
+
+def test_add_and_remove_match_rebuild(index):
+    """Test that patching an index gives the results of a fresh build."""
+    index.keys = ["web", "db", "staging", "backup"]
+    index.remove(["db", "missing"])
+    index.add([("db-production", "db2.example.com", "postgres", ["database"], "Replica")], ["db"])
+    rebuilt = SearchIndex.build([
+        ("web-production", "web1.example.com", "deploy", ["nginx"], "Frontend"),
+        ("web-staging", "web2.example.com", "deploy", [], None),
+        ("Backup", "backup.example.com", "root", None, "Nightly"),
+        ("db-production", "db2.example.com", "postgres", ["database"], "Replica"),
+    ], ["web", "staging", "backup", "db"])
+    assert index.removed == 1
+    for query in ("production", "db1", "db2", "replica", "prodution", "web", ""):
+        assert index.search(query) == rebuilt.search(query)
+    assert index.exact("DB-Production") == ["db"]
+    assert SearchIndex.from_bytes(index.to_bytes()).search("db") == ["db"]
+
+def test_patch_loaded_index():
+    """Test that an index loaded from bytes can be patched like a built one."""
+    built = SearchIndex.build(ROWS, ["web", "db", "staging", "backup"])
+    loaded = SearchIndex.from_bytes(built.to_bytes())
+    for index in (built, loaded):
+        index.search("production")
+        index.remove(["web"])
+        index.add([("web-canary", "web3.example.com", "deploy", ["nginx"], "Canary")], ["canary"])
+    for query in ("production", "web", "canary", "canery", "nginx", ""):
+        assert loaded.search(query) == built.search(query)
+    assert SearchIndex.from_bytes(loaded.to_bytes()).search("web") == built.search("web")
+
+def test_search_tiebreak(index):
+    """Test that equally scored entries are ordered by the tiebreak value."""
+    assert index.search("deploy") == [0, 2]
+    assert index.search("deploy", tiebreak=lambda key: key) == [2, 0]
+    assert index.search("web", tiebreak=lambda key: key) == [2, 0, 1]
+
+def test_match_flags_typos(index):
+    """Test that matches report when a term only matched with typos."""
+    assert not index.match("production").typos
+    assert index.match("prodution web").typos
+
+def test_scan_matches_index_without_typos(index):
+    """Test that scanning rows scores them like the index, terms matched as typed."""
+    for query in ("web", "production web", "db1", "databa", "deploy", "e", ""):
+        assert scan(ROWS, query) == index.match(query)
+    assert scan(ROWS, "prodution").scores == {}
+
+def test_rank(index):
+    """Test ordering scores best first with a tiebreak."""
+    scores = {"a": 0.5, "b": 1.0, "c": 0.5}
+    assert rank(scores) == ["b", "a", "c"]
+    assert rank(scores, limit=2, tiebreak=lambda key: key == "c") == ["b", "c"]
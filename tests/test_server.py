@@ -1,6 +1,7 @@
 """Tests for server module."""
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, PropertyMock, patch
+from lxml import etree
 from keepass_ssh.server import ServerManager, ServerEntry
 
 @pytest.fixture
@@ -28,6 +29,20 @@ def test_parse_server_url():
     assert hostname == "test.server.com"
     assert port == 22
 
+def test_jump_server():
+    """Test parsing the jump host a server is reached through."""
+    server = ServerEntry(title="db", username="dba", password=None, url="10.0.0.5",
+                         hostname="10.0.0.5", port=22, description="")
+    assert ServerManager.jump_server(server) is None
+    
+    server.jump = "ssh://outer.example.com, admin@bastion.example.com:2222"
+    jump = ServerManager.jump_server(server)
+    assert (jump.username, jump.hostname, jump.port) == ("admin", "bastion.example.com", 2222)
+    assert jump.jump == "ssh://outer.example.com"
+    
+    outer = ServerManager.jump_server(jump)
+    assert (outer.username, outer.hostname, outer.port, outer.jump) == (None, "outer.example.com", 22, None)
+
 def test_from_keepass_entry():
     """Test creating ServerEntry from KeePass entry."""
     entry = Mock()
@@ -47,6 +62,48 @@ def test_from_keepass_entry():
     assert server.port == 22
     assert server.description == entry.notes
 
+def test_lazy_entry_reads_password_on_access():
+    """Test that the lazy view only reads the password when it is accessed."""
+    entry = Mock(title="Test Server", url="test.server.com:2222", notes="")
+    password = PropertyMock(return_value="test_pass")
+    type(entry).password = password
+    
+    server = ServerManager.from_keepass_entry(entry)
+    assert server.hostname == "test.server.com"
+    assert server.port == 2222
+    password.assert_not_called()
+    assert server.password == "test_pass"
+    
+    server.password = "changed"
+    assert server.password == "changed"
+
+def test_from_keepass_entries_one_pass():
+    """Test bulk creation reading string fields from the entry XML."""
+    element = etree.fromstring(
+        "<Entry><UUID>EjRWeBI0VngSNFZ4EjRWeA==</UUID><Tags>web;prod</Tags>"
+        "<String><Key>Title</Key><Value>Web Server</Value></String>"
+        "<String><Key>UserName</Key><Value>web</Value></String>"
+        "<String><Key>Password</Key><Value>secret</Value></String>"
+        "<String><Key>URL</Key><Value>web.server.com:2222</Value></String>"
+        "<String><Key>Notes</Key><Value/></String>"
+        "<String><Key>ProxyJump</Key><Value>bastion</Value></String></Entry>"
+    )
+    entry = Mock(_element=element, password="secret")
+    
+    servers = ServerManager.from_keepass_entries([entry])
+    assert servers == [ServerEntry(
+        title="Web Server", username="web", password="secret", url="web.server.com:2222",
+        hostname="web.server.com", port=2222, description=None,
+        uuid="12345678-1234-5678-1234-567812345678", tags=["web", "prod"], jump="bastion"
+    )]
+    assert "secret" not in repr(servers[0])
+
+def test_from_keepass_entries_fallback():
+    """Test that entries without XML are created one by one."""
+    with patch('keepass_ssh.server.ServerManager.from_keepass_entry', return_value="server") as mock_from:
+        assert ServerManager.from_keepass_entries([Mock(), Mock()]) == ["server", "server"]
+    assert mock_from.call_count == 2
+
 def test_list_servers(capsys, server_entry):
     """Test server listing output."""
     # Create a list of server entries
@@ -65,6 +122,35 @@ def test_list_servers(capsys, server_entry):
     assert "test_user@test.server.com:22" in output_line
     assert "Test server description" in output_line
 
+def test_list_servers_with_probes(capsys, server_entry):
+    """Test server listing output with probe results."""
+    from keepass_ssh.probe import ProbeResult
+    
+    ServerManager.list_servers([server_entry, server_entry], [ProbeResult('up', 0.012), ProbeResult('timeout')])
+    
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert "up 12 ms" in lines[0]
+    assert "timeout" in lines[1]
+
+def test_format_servers_width(server_entry):
+    """Test that descriptions are cut to the terminal width and numbering starts where asked."""
+    from keepass_ssh.server import _ANSI
+    
+    server_entry.description = "A long description\nwith a second line"
+    lines = ServerManager.format_servers([server_entry], width=60, start=7)
+    
+    assert len(lines) == 1
+    text = _ANSI.sub('', lines[0])
+    assert text.startswith("7. Test Server | test_user@test.server.com:22 | A long")
+    assert len(text) == 60 and text.endswith('…')
+    assert 'second line' not in _ANSI.sub('', ServerManager.format_servers([server_entry], width=200)[0])
+
+def test_list_servers_single_write(server_entry):
+    """Test that the list is written at once."""
+    stream = Mock(isatty=Mock(return_value=False))
+    ServerManager.list_servers([server_entry] * 3, stream=stream)
+    assert stream.write.call_args_list[0].args[0].count('\n') == 2
+
 def test_select_server_valid(server_entry):
     """Test valid server selection."""
     servers = [server_entry]
@@ -5,6 +5,7 @@
 from subprocess import CalledProcessError
 from keepass_ssh.ssh import SSHConnector, SSHConnectionError
 from keepass_ssh.server import ServerEntry
+from keepass_ssh.multiplex import ControlMasters
 
 @pytest.fixture
 def server_entry():
@@ -80,3 +81,69 @@ def test_ssh_connect_process_error(server_entry):
     with patch('subprocess.run', side_effect=CalledProcessError(1, "ssh")):
         with pytest.raises(SSHConnectionError):
             SSHConnector.connect(server_entry)
+
+def test_ssh_connect_multiplexed(server_entry, monkeypatch, tmp_path):
+    """Test SSH connection through a control master."""
+    monkeypatch.setattr(os, 'name', 'posix')
+    masters = ControlMasters(directory=str(tmp_path / 'my masters'), persist=60)
+    
+    with patch('subprocess.run') as mock_run:
+        SSHConnector.connect(server_entry, masters)
+        command = mock_run.call_args.args[0]
+    
+    path = masters.socket_path(server_entry)
+    assert command.startswith(f'sshpass -p "{server_entry.password}" ssh -o ControlMaster=auto ')
+    assert f"'ControlPath={path}'" in command
+    assert command.endswith(f'-o ControlPersist=60 -p {server_entry.port} {server_entry.username}@{server_entry.hostname}')
+    assert os.path.exists(path + '.json')
+
+def test_ssh_connect_resolved_address(server_entry, monkeypatch):
+    """Test SSH connection to a resolved address keeping the host key alias."""
+    monkeypatch.setattr(os, 'name', 'posix')
+    
+    with patch('subprocess.run') as mock_run:
+        SSHConnector.connect(server_entry, address='192.0.2.10')
+        command = mock_run.call_args.args[0]
+    
+    assert f'ssh -o HostName=192.0.2.10 -o HostKeyAlias={server_entry.hostname} -p 22 ' in command
+    assert command.endswith(f'{server_entry.username}@{server_entry.hostname}')
+
+def test_ssh_connect_known_hosts(server_entry, monkeypatch):
+    """Test that a known_hosts file is read before the user's own."""
+    monkeypatch.setattr(os, 'name', 'posix')
+    
+    with patch('subprocess.run') as mock_run:
+        SSHConnector.connect(server_entry, known_hosts='/cache/known_hosts')
+        command = mock_run.call_args.args[0]
+    
+    assert "ssh -o 'UserKnownHostsFile=/cache/known_hosts ~/.ssh/known_hosts ~/.ssh/known_hosts2' -p 22 " in command
+
+def test_ssh_connect_jump(server_entry, monkeypatch):
+    """Test that jump hosts are passed to ssh and refused by Plink."""
+    server_entry.password = ''
+    server_entry.jump = 'admin@bastion:2222'
+    
+    with patch('subprocess.run') as mock_run:
+        monkeypatch.setattr(os, 'name', 'posix')
+        SSHConnector.connect(server_entry)
+        assert mock_run.call_args.args[0] == 'ssh -J admin@bastion:2222 -p 22 test_user@test.server.com'
+        
+        monkeypatch.setattr(os, 'name', 'nt')
+        with pytest.raises(SSHConnectionError):
+            SSHConnector.connect(server_entry)
+        assert mock_run.call_count == 1
+
+def test_ssh_connect_jump_with_password(server_entry, monkeypatch):
+    """Test that jump hosts of password entries cannot prompt, so sshpass only answers the target."""
+    server_entry.jump = 'outer, admin@bastion:2222'
+    monkeypatch.setattr(os, 'name', 'posix')
+    
+    with patch('subprocess.run') as mock_run:
+        SSHConnector.connect(server_entry)
+    command = mock_run.call_args.args[0]
+    assert '-J' not in command
+    assert command == (
+        'sshpass -p "test_pass" ssh -o \'ProxyCommand=ssh -o BatchMode=yes '
+        '-o \'"\'"\'ProxyCommand=ssh -o BatchMode=yes -p 22 -W %%h:%%p outer\'"\'"\' '
+        '-p 2222 -W %h:%p admin@bastion\' -p 22 test_user@test.server.com'
+    )
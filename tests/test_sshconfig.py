@@ -0,0 +1,48 @@
+"""Tests for sshconfig module."""
+import pytest
+from keepass_ssh.sshconfig import config_stamp, host_alias, read_stamp, render_config
+
+def test_host_alias():
+    """Test that titles become single word destinations."""
+    assert host_alias('Prod DB 1') == 'prod-db-1'
+    assert host_alias(' web*01, eu ') == 'web-01-eu'
+
+def test_render_config(tmp_path, make_server):
+    """Test Host blocks with multiplexing and unique aliases."""
+    servers = [make_server('Prod DB 1', 'db1.example.com', username='deploy'), make_server('prod db 1', '10.0.0.2', 2222, username=None, jump='bastion')]
+    text = render_config(servers, 'abc', '/home/me/cache 1/masters', 600, '/home/me/.cache/known_hosts')
+    blocks = text.split('\n\n')
+    
+    assert blocks[1].splitlines() == [
+        'Host prod-db-1',
+        '    HostName db1.example.com',
+        '    Port 22',
+        '    User deploy',
+        '    ControlMaster auto',
+        '    ControlPath "/home/me/cache 1/masters/%C"',
+        '    ControlPersist 600',
+        '    UserKnownHostsFile /home/me/.cache/known_hosts ~/.ssh/known_hosts ~/.ssh/known_hosts2',
+    ]
+    assert blocks[2].startswith('Host prod-db-1-2\n    HostName 10.0.0.2\n    Port 2222\n    ProxyJump bastion\n    ControlMaster auto')
+    
+    path = tmp_path / 'keepass-ssh.conf'
+    path.write_text(text)
+    assert read_stamp(str(path)) == 'abc'
+
+def test_read_stamp_foreign_file(tmp_path):
+    """Test that files not generated by the export have no stamp."""
+    path = tmp_path / 'config'
+    path.write_text('Host *\n    ServerAliveInterval 30\n')
+    assert read_stamp(str(path)) is None
+    assert read_stamp(str(tmp_path / 'missing')) is None
+
+def test_config_stamp_follows_content(tmp_path):
+    """Test that the stamp changes with the database content and the options only."""
+    db = tmp_path / 'Passwords.kdbx'
+    db.write_bytes(b'one')
+    stamp = config_stamp([str(db)], 'root', None, 600)
+    db.write_bytes(b'one')
+    assert config_stamp([str(db)], 'root', None, 600) == stamp
+    assert config_stamp([str(db)], 'root', None, 60) != stamp
+    db.write_bytes(b'two')
+    assert config_stamp([str(db)], 'root', None, 600) != stamp
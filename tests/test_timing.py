@@ -0,0 +1,91 @@
+"""Tests for timing module."""
+import io
+import json
+import threading
+from unittest.mock import patch
+from keepass_ssh import timing
+from keepass_ssh.timing import Timings
+
+def test_nested_spans():
+    """Test that spans nest and repeated phases accumulate."""
+    timings = Timings()
+    with patch('keepass_ssh.timing.time.perf_counter', side_effect=[1.0, 2.0, 5.0, 6.0, 7.0, 8.0]):
+        with timings.span('database'):
+            with timings.span('open'):
+                pass
+            with timings.span('open'):
+                pass
+
+    phases = [(phase.name, phase.elapsed, phase.count) for phase in timings.phases]
+    assert phases == [('database', 7.0, 1), ('database/open', 4.0, 2)]
+
+def test_worker_thread_spans():
+    """Test that spans of worker threads do not nest in spans of other threads."""
+    timings = Timings()
+
+    def work():
+        with timings.span('handshake'):
+            pass
+
+    with timings.span('exec'):
+        workers = [threading.Thread(target=work) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        with timings.span('render'):
+            pass
+
+    assert [(phase.name, phase.count) for phase in timings.phases] == [('exec', 1), ('handshake', 2), ('exec/render', 1)]
+
+def test_format():
+    """Test the indented breakdown with counts of repeated phases."""
+    timings = Timings()
+    with timings.span('database'):
+        with timings.span('kdf'):
+            pass
+    for _ in range(3):
+        with timings.span('handshake'):
+            pass
+    timings.stop()
+
+    lines = timings.format().splitlines()
+    assert lines[0] == 'Timings:'
+    assert lines[1].split()[0] == 'total'
+    assert lines[2].startswith('  database ') and lines[3].startswith('    kdf ')
+    assert lines[4].startswith('  handshake ') and lines[4].endswith('(3x)')
+
+def test_append(tmp_path):
+    """Test that every invocation appends one JSON line."""
+    path = tmp_path / 'timings' / 'timings.jsonl'
+    timings = Timings()
+    with timings.span('filter'):
+        pass
+    timings.append(str(path), 'connect')
+    timings.append(str(path), 'list')
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['action'] for record in records] == ['connect', 'list']
+    assert records[0]['phases'][0]['name'] == 'filter'
+    assert records[0]['phases'][0]['count'] == 1
+    assert records[0]['total'] >= records[0]['phases'][0]['elapsed']
+
+def test_module_spans():
+    """Test that spans are only recorded while timings are enabled."""
+    with timing.span('ignored'):
+        pass
+    timings = timing.enable()
+    try:
+        assert timing.active() is timings
+        with timing.span('recorded'):
+            pass
+    finally:
+        assert timing.disable() is timings
+    with timing.span('ignored'):
+        pass
+
+    assert timing.active() is None
+    assert [phase.name for phase in timings.phases] == ['recorded']
+    stream = io.StringIO()
+    timings.write(stream)
+    assert 'recorded' in stream.getvalue()
@@ -0,0 +1,144 @@
+"""Tests for transfer module."""
+import io
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+import paramiko
+from keepass_ssh.transfer import FanoutTransfer, ProgressPrinter, TransferResult, format_size, format_summary
+
+class FakeRemoteFile(io.BytesIO):
+    """Remote file collecting writes into a shared dict on close."""
+
+    def __init__(self, files, path, data=b''):
+        super().__init__(data)
+        self.files = files
+        self.path = path
+        self.mode = None
+        self.pipelined = False
+        self.prefetched = None
+
+    def set_pipelined(self, pipelined=True):
+        self.pipelined = pipelined
+
+    def chmod(self, mode):
+        self.mode = mode
+
+    def prefetch(self, size):
+        self.prefetched = size
+
+    def stat(self):
+        return MagicMock(st_size=len(self.getvalue()))
+
+    def close(self):
+        if self.path not in self.files:
+            self.files[self.path] = self
+        self.closed_value = self.getvalue()
+        super().close()
+
+@pytest.fixture
+def remote():
+    """Patch the SFTP client with an in-memory remote filesystem per server."""
+    files = {}
+
+    def make_client(channel):
+        client = MagicMock()
+
+        def open_file(path, mode='r', bufsize=-1):
+            if 'w' in mode:
+                return FakeRemoteFile(files, (channel.server, path))
+            if (channel.server, path) not in files:
+                raise IOError(2, 'No such file')
+            return FakeRemoteFile({}, path, files[(channel.server, path)])
+        client.open.side_effect = open_file
+        return client
+
+    with patch('keepass_ssh.transfer.paramiko.SFTPClient', side_effect=make_client):
+        yield files
+
+@pytest.fixture
+def transfer():
+    """Create a transfer on a mocked pool recording progress."""
+    pool = MagicMock()
+    pool.session.side_effect = lambda srv: MagicMock(__enter__=MagicMock(return_value=MagicMock(server=srv.title)))
+    progress = []
+    transfer = FanoutTransfer(workers=4, timeout=5, pool=pool,
+                              progress=lambda srv, done, total: progress.append((srv.title, done, total)))
+    transfer.events = progress
+    return transfer
+
+def test_put_shares_buffer(transfer, remote, tmp_path, make_server):
+    """Test uploading one file to several servers with pipelined writes."""
+    source = tmp_path / 'app.conf'
+    source.write_bytes(os.urandom(3 * (1 << 20) + 5))
+    os.chmod(source, 0o640)
+
+    results = transfer.put([make_server('web1'), make_server('web2')], str(source), '/etc/app/')
+
+    assert all(result.ok for result in results)
+    assert [result.path for result in results] == ['/etc/app/app.conf'] * 2
+    for title in ('web1', 'web2'):
+        uploaded = remote[(title, '/etc/app/app.conf')]
+        assert uploaded.closed_value == source.read_bytes()
+        assert uploaded.pipelined and uploaded.mode == 0o640
+    assert ('web1', 1 << 20, source.stat().st_size) in transfer.events
+    assert ('web1', source.stat().st_size, source.stat().st_size) in transfer.events
+
+def test_put_empty_file(transfer, remote, tmp_path, make_server):
+    """Test uploading an empty file."""
+    source = tmp_path / 'empty'
+    source.touch()
+    results = transfer.put([make_server('web1')], str(source), '/tmp/empty')
+    assert results[0].ok and results[0].size == 0
+    assert remote[('web1', '/tmp/empty')].closed_value == b''
+
+def test_get_per_server_directories(transfer, remote, tmp_path, make_server):
+    """Test downloading from several servers into a directory per title."""
+    remote[('web1', '/var/log/app.log')] = b'one'
+    remote[('web/2', '/var/log/app.log')] = b'two'
+
+    results = transfer.get([make_server('web1'), make_server('web/2'), make_server('web3')], '/var/log/app.log', str(tmp_path))
+
+    assert (tmp_path / 'web1' / 'app.log').read_bytes() == b'one'
+    assert (tmp_path / 'web_2' / 'app.log').read_bytes() == b'two'
+    assert not results[2].ok and not os.path.exists(results[2].path + '.part')
+    assert format_summary(results).startswith('2 succeeded, 1 failed, 6 B transferred')
+
+def test_get_unique_directories(transfer, remote, tmp_path, make_server):
+    """Test that shared, missing and dot titles get a directory of their own inside the destination."""
+    servers = [make_server('web'), make_server('Web', 'host2'), make_server(None, 'host3'), make_server('..', 'host4')]
+    paths = transfer.local_paths(servers, '/etc/hosts', str(tmp_path))
+    assert [os.path.relpath(path, tmp_path) for path in paths] == [
+        os.path.join('web', 'hosts'), os.path.join('Web-2', 'hosts'),
+        os.path.join('host3_22', 'hosts'), os.path.join('host4_22', 'hosts'),
+    ]
+
+def test_get_single_server(transfer, remote, tmp_path, make_server):
+    """Test downloading from one server to a file or directory."""
+    remote[('web1', '/etc/hosts')] = b'127.0.0.1 localhost\n'
+    transfer.get([make_server('web1')], '/etc/hosts', str(tmp_path / 'hosts.web1'))
+    transfer.get([make_server('web1')], '/etc/hosts', str(tmp_path))
+    assert (tmp_path / 'hosts.web1').read_bytes() == b'127.0.0.1 localhost\n'
+    assert (tmp_path / 'hosts').read_bytes() == b'127.0.0.1 localhost\n'
+
+def test_connection_error(transfer, tmp_path, make_server):
+    """Test that connection errors are reported per server."""
+    source = tmp_path / 'file'
+    source.write_bytes(b'data')
+    transfer.pool.session.side_effect = paramiko.AuthenticationException('denied')
+    result = transfer.put([make_server('web1')], str(source), '/tmp/file')[0]
+    assert result == TransferResult(result.server, '/tmp/file', 0, result.elapsed, 'denied')
+
+def test_format_size():
+    """Test human readable sizes."""
+    assert format_size(512) == '512 B'
+    assert format_size(1536) == '1.5 KiB'
+    assert format_size(3 << 30) == '3.0 GiB'
+
+def test_progress_printer(make_server):
+    """Test that finished hosts are printed without a status line off a terminal."""
+    stream = io.StringIO()
+    printer = ProgressPrinter(stream)
+    printer(make_server('web1'), 10, 20)
+    printer(make_server('web1'), 20, 20)
+    printer.close()
+    assert stream.getvalue() == '[web1] 20 B\n'
@@ -0,0 +1,72 @@
+"""Tests for watch module."""
+import os
+import time
+import pytest
+from unittest.mock import patch
+from keepass_ssh.watch import FileWatcher
+
+def replace(path, data):
+    """Replace a file by renaming a new version over it, as password managers save."""
+    tmp_path = path.parent / ".tmp"
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+@pytest.fixture
+def db_file(tmp_path):
+    """Create a watched file."""
+    path = tmp_path / "test.kdbx"
+    path.write_bytes(b"v1")
+    return path
+
+def test_watch_replaced_file(db_file):
+    """Test that a renamed replacement is reported once after the debounce delay."""
+    watcher = FileWatcher(str(db_file), debounce=0.05)
+    if watcher.fileno() is None:
+        pytest.skip("inotify unavailable")
+    (db_file.parent / "other").write_bytes(b"x")
+    assert not watcher.read_events()
+    replace(db_file, b"v2-longer")
+    assert watcher.read_events()
+    assert not watcher.changed()
+    assert 0 < watcher.timeout() <= 0.05
+    time.sleep(0.06)
+    assert watcher.changed()
+    assert not watcher.changed()
+    assert watcher.timeout() is None
+    watcher.close()
+
+def test_watch_debounces_writes(db_file):
+    """Test that writes within the debounce delay postpone the report."""
+    watcher = FileWatcher(str(db_file), debounce=0.2)
+    if watcher.fileno() is None:
+        pytest.skip("inotify unavailable")
+    replace(db_file, b"v2")
+    watcher.read_events()
+    time.sleep(0.1)
+    replace(db_file, b"v3-longer")
+    watcher.read_events()
+    time.sleep(0.1)
+    assert not watcher.changed()
+    time.sleep(0.15)
+    assert watcher.changed()
+    watcher.close()
+
+def test_watch_polling(db_file):
+    """Test polling where inotify is unavailable."""
+    with patch('keepass_ssh.watch._inotify_watch', return_value=None):
+        watcher = FileWatcher(str(db_file), debounce=0, poll_interval=0)
+    assert watcher.fileno() is None
+    assert not watcher.changed()
+    replace(db_file, b"v2-longer")
+    assert watcher.changed()
+    assert not watcher.changed()
+
+def test_watch_ignores_missing_file(db_file):
+    """Test that a deleted file is not reported until it reappears."""
+    with patch('keepass_ssh.watch._inotify_watch', return_value=None):
+        watcher = FileWatcher(str(db_file), debounce=0, poll_interval=0)
+    db_file.unlink()
+    assert not watcher.changed()
+    assert not watcher.changed()
+    db_file.write_bytes(b"v2-longer")
+    assert watcher.changed()